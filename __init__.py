@@ -34,21 +34,67 @@ from . nw_panel             import NW_Panel
 from . nw_node_importer_op  import NW_NodeImporter
 from . nw_preview_helper    import NW_PreviewHelper
 from . nw_properties        import NW_Properties
+from . nw_texture_watcher   import NW_TextureWatcher
+from . nw_batch_op          import NW_BatchGenerateOperator
+from . nw_node_utils        import NW_NodeUtils
+from . nw_node_spec         import NW_SpecCompiler
+from . nw_preferences       import NW_Preferences
+from . nw_profiler          import NW_Profiler, NW_ProfileSummaryOperator
+from . nw_gc                import NW_GarbageCollectOperator
+from . nw_ingest            import NW_FolderIngest
+from . nw_render_cost       import NW_RenderCostOperator
+from . nw_baker             import NW_Baker, NW_BakeMaskOperator
+from . nw_flatten           import NW_FlattenOperator
+from . nw_group_registry    import NW_MergeGroupsOperator
+from . nw_normal_check      import NW_FixDirectXNormalsOperator
+from . nw_cache             import NW_CacheMaintenanceOperator
+from . nw_decal_atlas       import NW_DecalAtlasOperator
+from . nw_variants          import NW_ObjectVariantsOperator, NW_MergeVariantsOperator
+from . nw_staging           import NW_Staging, NW_RewritePathsOperator
 
 ops = [
     NW_GenerateOperator,
+    NW_BatchGenerateOperator,
+    NW_DecalAtlasOperator,
     NW_NormalScalerOperator,
     NW_DX2OGLConverterOperator,
+    NW_FixDirectXNormalsOperator,
     NW_GenerateTwoLayerTextureBasedSetupOperator,
     NW_GenerateTwoLayerShaderBasedSetupOperator,
+    NW_GenerateLayerStackOperator,
     NW_GenerateDistortionOperator,
     NW_GenerateBlurOperator,
+    NW_ObjectVariantsOperator,
+    NW_MergeVariantsOperator,
+    NW_GarbageCollectOperator,
+    NW_MergeGroupsOperator,
+    NW_CacheMaintenanceOperator,
+    NW_RewritePathsOperator,
+    NW_ProfileSummaryOperator,
+    NW_RenderCostOperator,
+    NW_BakeMaskOperator,
+    NW_FlattenOperator,
     NW_Panel,
     NW_NodeImporter,
-    NW_Properties
+    NW_Properties,
+    NW_Preferences
+]
+
+# Hot helpers measured by the profiler (inside of operators or on their own).
+profiled_helpers = [
+    (NW_NodeUtils, "create_image_node", "create_image_node"),
+    (NW_NodeUtils, "create_group_input", "create_group_input"),
+    (NW_NodeUtils, "create_group", "create_group"),
+    (NW_NodeUtils, "create_group_tree", "create_group_tree"),
+    (NW_SpecCompiler, "compile", "spec.compile"),
+    (NW_Baker, "bake_socket", "object.bake"),
+    (NW_NodeImporter, "import_group", "libraries.load"),
+    (NW_PreviewHelper, "scanCollection", "libraries.load")
 ]
 
 def register():
+    NW_Profiler.instrument(ops, profiled_helpers)
+
     for op in ops:
         bpy.utils.register_class(op)
 
@@ -57,8 +103,13 @@ def register():
     NW_PreviewHelper.addCollection(home, "materials")
 
     NW_Properties.initialize()
+    NW_FolderIngest.enable(True)
+    NW_Staging.enable(True)
     
 def unregister():
+    NW_TextureWatcher.enable(False)
+    NW_FolderIngest.enable(False)
+    NW_Staging.enable(False)
     NW_Properties.cleanup()
 
     NW_PreviewHelper.removeAllCollections()
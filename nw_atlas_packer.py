@@ -0,0 +1,84 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+# No bpy in here, the layout is computed before any image is loaded.
+
+class NW_AtlasPacker:
+    """
+    Packs rectangles (decal sizes in pixels) into square atlas pages of a fixed
+    size, shelf by shelf, tallest first. Every rectangle keeps a border of
+    padding pixels, filled with its edge pixels by the compositing worker, so
+    filtering and mip maps don't pick up the neighbours.
+    """
+
+    @staticmethod
+    def fit(width, height, size, padding):
+        """
+        Size of a rectangle scaled down (aspect kept) to fit a page, if too large.
+        """
+        room = size - 2 * padding
+        factor = min(1.0, room / float(width), room / float(height))
+        return max(1, int(width * factor)), max(1, int(height * factor))
+
+    @staticmethod
+    def pack(sizes, size, padding):
+        """
+        Pack sizes (list of (width, height)), returns (page count, list of
+        (page, x, y, width, height) in the order of sizes). x, y is the lower
+        left corner without padding, rows run bottom up like Blender image pixels.
+        """
+        rects = [ NW_AtlasPacker.fit(w, h, size, padding) for w, h in sizes ]
+        order = sorted(range(len(rects)), key=lambda i: (-rects[i][1], -rects[i][0]))
+
+        # Per page the list of shelves [ y, height, used width ] and the used height.
+        pages, placed = [], [ None ] * len(rects)
+        for i in order:
+            w, h = rects[i][0] + 2 * padding, rects[i][1] + 2 * padding
+            spot = None
+            for index, (shelves, top) in enumerate(pages):
+                # First shelf with room, otherwise a new shelf on this page ..
+                for shelf in shelves:
+                    if shelf[1] >= h and size - shelf[2] >= w:
+                        spot = (index, shelf)
+                        break
+                if spot:
+                    break
+                if size - top >= h:
+                    shelf = [ top, h, 0 ]
+                    shelves.append(shelf)
+                    pages[index][1] = top + h
+                    spot = (index, shelf)
+                    break
+            # .. or a new page.
+            if not spot:
+                shelf = [ 0, h, 0 ]
+                pages.append([ [ shelf ], h ])
+                spot = (len(pages) - 1, shelf)
+
+            index, shelf = spot
+            placed[i] = (index, shelf[2] + padding, shelf[0] + padding, rects[i][0], rects[i][1])
+            shelf[2] += w
+
+        return len(pages), placed
+
+    @staticmethod
+    def transform(placement, size):
+        """
+        Texture mapping inputs (see NW_MaterialBuilder.create_texture_mapping())
+        mapping the decal's 0..1 UV range to its place in the atlas.
+        """
+        _, x, y, w, h = placement
+        return { "Scale": w / float(size), "Aspect": h / float(w), "Offset X": x / float(size), "Offset Y": y / float(size) }
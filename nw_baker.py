@@ -0,0 +1,216 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy
+from bpy.types import Operator
+from bpy.props import EnumProperty, IntProperty
+
+from . nw_node_utils import NW_NodeUtils
+
+bake_targets = [
+    ("IMAGE", "Image", "Bake into an image texture (UV mapped, one object per material)"),
+    ("ATTRIBUTE", "Color Attribute", "Bake into a color attribute (per face corner, any number of objects)")
+]
+
+class NW_Baker(NW_NodeUtils):
+    """
+    Bakes shader sockets of a material per object with Cycles on the CPU, into
+    an image or a color attribute. The material and scene are restored afterwards.
+    """
+    # Bundled mask groups (nodes.blend) worth baking, the edge masks shoot rays on every sample.
+    masks = [ "NW_Edges_AO", "NW_Edges_Bevel", "NW_Edges_Pointiness", "NW_Top", "NW_Bottom" ]
+
+    # Pixels the bake is extended beyond UV islands.
+    margin = 16
+
+    @staticmethod
+    def is_mask(node):
+        return node.type == "GROUP" and node.node_tree and node.node_tree.name in NW_Baker.masks
+
+    @staticmethod
+    def can_bake_attributes():
+        return bpy.app.version >= (2, 92, 0)
+
+    @staticmethod
+    def run_bake(context, obj, **args):
+        """
+        Run the bake operator for obj only (works in background mode too).
+        """
+        override = { "scene": context.scene, "active_object": obj, "object": obj,
+            "selected_objects": [ obj ], "selected_editable_objects": [ obj ] }
+        if hasattr(context, "temp_override"):
+            with context.temp_override(**override):
+                bpy.ops.object.bake(**args)
+        else:
+            bpy.ops.object.bake(override, **args)
+
+    def bake_socket(self, context, obj, material, socket, samples, image = None, attribute = None, type = "EMIT"):
+        """
+        Bake socket (an output in the material tree) of obj into image or the
+        color attribute (created if missing). With type "EMIT" the socket is
+        shown by a temporary emission shader, other bake types (e.g. "NORMAL")
+        use the shader connected to socket as is.
+        """
+        scene = context.scene
+        tree = material.node_tree
+        materials = set(s.material for s in obj.material_slots if s.material and s.material.use_nodes)
+
+        # Temporary output, the others are deactivated ..
+        outputs = { n: n.is_active_output for n in tree.nodes if n.type == "OUTPUT_MATERIAL" }
+        temp = [ self.at(tree.nodes.new("ShaderNodeOutputMaterial"), -4, 4) ]
+        if type == "EMIT":
+            emission = self.at(tree.nodes.new("ShaderNodeEmission"), -6, 4)
+            tree.links.new(socket, emission.inputs["Color"])
+            tree.links.new(emission.outputs["Emission"], temp[0].inputs["Surface"])
+            temp.append(emission)
+        else:
+            tree.links.new(socket, temp[0].inputs["Surface"])
+        for n in outputs:
+            n.is_active_output = False
+        temp[0].is_active_output = True
+
+        # .. image bakes need the target image as active node in every material of the object.
+        actives, images = {}, []
+        if image:
+            for m in materials:
+                node = m.node_tree.nodes.new("ShaderNodeTexImage")
+                node.image = image
+                actives[m] = m.node_tree.nodes.active
+                m.node_tree.nodes.active = node
+                images.append((m, node))
+        else:
+            colors = getattr(obj.data, "color_attributes", None)
+            if colors is not None:
+                layer = colors.get(attribute) or colors.new(attribute, "BYTE_COLOR", "CORNER")
+                colors.active_color = layer
+            else:
+                layer = obj.data.vertex_colors.get(attribute) or obj.data.vertex_colors.new(name=attribute)
+                obj.data.vertex_colors.active = layer
+
+        settings = (scene.render.engine, scene.cycles.device, scene.cycles.samples)
+        try:
+            scene.render.engine = "CYCLES"
+            scene.cycles.device = "CPU"
+            scene.cycles.samples = samples
+            args = { "type": type, "margin": NW_Baker.margin, "use_clear": True }
+            if NW_Baker.can_bake_attributes():
+                args["target"] = "IMAGE_TEXTURES" if image else "VERTEX_COLORS"
+            NW_Baker.run_bake(context, obj, **args)
+        finally:
+            scene.render.engine, scene.cycles.device, scene.cycles.samples = settings
+            for m, node in images:
+                m.node_tree.nodes.remove(node)
+                m.node_tree.nodes.active = actives[m]
+            for n in temp:
+                tree.nodes.remove(n)
+            for n, active in outputs.items():
+                n.is_active_output = active
+
+    def lookups(self, tree, mask):
+        """
+        Lookup nodes of an already baked mask, dict output name -> node.
+        """
+        return { n["nw_bake_output"]: n for n in tree.nodes if n.get("nw_bake_of") == mask.name }
+
+    def bake_mask(self, context, obj, material, mask, target, resolution, samples):
+        """
+        Bake all used outputs of mask for obj and replace them by lookups (image
+        or attribute node), the mask stays muted for re-baking. Baking again
+        updates the existing lookups. Returns the number of baked outputs.
+        """
+        tree = material.node_tree
+        lookups = self.lookups(tree, mask)
+        mask.mute = False
+        baked = 0
+        for index, socket in enumerate(mask.outputs):
+            lookup = lookups.get(socket.name)
+            users = [ l.to_socket for l in (lookup.outputs[0].links if lookup else socket.links) ]
+            if not users:
+                continue
+            name = "%s_%s" % (bpy.path.clean_name(mask.name), bpy.path.clean_name(socket.name))
+
+            if target == "IMAGE":
+                if lookup and lookup.type == "TEX_IMAGE" and lookup.image and tuple(lookup.image.size) == (resolution, resolution):
+                    image = lookup.image
+                else:
+                    image = bpy.data.images.new("%s_%s" % (obj.name, name), resolution, resolution)
+                    image.colorspace_settings.name = "Non-Color"
+                    self.tag(image)
+                self.bake_socket(context, obj, material, socket, samples, image = image)
+                image.pack()
+                node = lookup if lookup and lookup.type == "TEX_IMAGE" else tree.nodes.new("ShaderNodeTexImage")
+                node.image = image
+            else:
+                self.bake_socket(context, obj, material, socket, samples, attribute = "nw_" + name)
+                node = lookup if lookup and lookup.type == "ATTRIBUTE" else tree.nodes.new("ShaderNodeAttribute")
+                node.attribute_name = "nw_" + name
+
+            # Switched target, the old lookup goes ..
+            if lookup and lookup != node:
+                tree.nodes.remove(lookup)
+            node.location = (mask.location.x, mask.location.y - 200 * (index + 1))
+            node.label = "%s (baked)" % socket.name
+            node["nw_bake_of"] = mask.name
+            node["nw_bake_output"] = socket.name
+            for s in users:
+                tree.links.new(node.outputs["Color"], s)
+            baked += 1
+
+        mask.mute = True
+        return baked
+
+class NW_BakeMaskOperator(Operator, NW_Baker):
+    bl_idname = "material.nw_bake_mask_op"
+    bl_label = "Bake Selected Masks"
+    bl_description = "Bake the selected mask groups (e.g. NW_Edges_AO) for the active object (or all selected objects using the material for color attributes), replace them by a lookup and keep them muted for re-baking"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    target: EnumProperty(name="Target", items=bake_targets)
+    resolution: IntProperty(name="Resolution", default=1024, min=64, max=16384)
+    samples: IntProperty(name="Samples", default=16, min=1, max=4096)
+
+    def execute(self, context):
+        obj = context.active_object
+        material = obj.active_material if obj else None
+        if not material or not material.use_nodes or context.space_data.edit_tree != material.node_tree:
+            self.report({"ERROR"}, "Select mask groups at the top level of the active object's material.")
+            return{'CANCELLED'}
+
+        masks = [ n for n in material.node_tree.nodes if n.select and n.type == "GROUP" ]
+        if not masks:
+            self.report({"ERROR"}, "No group node selected.")
+            return{'CANCELLED'}
+
+        if self.target == "IMAGE":
+            if not obj.data.uv_layers:
+                self.report({"ERROR"}, "%s has no UV map." % obj.name)
+                return{'CANCELLED'}
+            objects = [ obj ]
+            if material.users > 1:
+                self.report({"WARNING"}, "%s is used by other objects as well, the image only fits %s." % (material.name, obj.name))
+        else:
+            if not NW_Baker.can_bake_attributes():
+                self.report({"ERROR"}, "Baking to color attributes requires Blender 2.92.")
+                return{'CANCELLED'}
+            objects = [ o for o in context.selected_objects if o.type == "MESH" and material in [ s.material for s in o.material_slots ] ]
+            objects = objects or [ obj ]
+
+        baked = 0
+        for o in objects:
+            for mask in masks:
+                baked += self.bake_mask(context, o, material, mask, self.target, self.resolution, self.samples)
+        self.report({"INFO"}, "%d mask outputs baked for %d object(s)." % (baked, len(objects)))
+        return{'FINISHED'}
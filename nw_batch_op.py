@@ -0,0 +1,338 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, time, threading
+from bpy.types import Operator
+from bpy.props import StringProperty, BoolProperty, FloatProperty
+
+from . nw_texture_mapper import NW_TextureMapper
+from . nw_map_classifier import NW_MapClassifier
+from . nw_material_builder import NW_MaterialBuilder
+from . nw_texture_watcher import NW_TextureWatcher
+from . nw_preflight import NW_Preflight
+from . nw_transcode import NW_Transcoder
+from . nw_cache import NW_Cache
+from . nw_preferences import NW_Preferences
+from . nw_staging import NW_Staging
+from . nw_group_registry import NW_GroupRegistry
+
+class NW_BatchProgress:
+    """
+    Progress of the running batch job (only one at a time), drawn by the panel.
+    """
+    label = None
+    done = 0
+    total = 0
+    started = 0.0
+
+    @staticmethod
+    def begin(label):
+        NW_BatchProgress.label = label
+        NW_BatchProgress.done = NW_BatchProgress.total = 0
+        NW_BatchProgress.started = time.perf_counter()
+
+    @staticmethod
+    def end():
+        NW_BatchProgress.label = None
+
+    @staticmethod
+    def text():
+        p = NW_BatchProgress
+        if p.total == 0:
+            return "%s: preparing .." % p.label
+        elapsed = time.perf_counter() - p.started
+        eta = elapsed / p.done * (p.total - p.done) if p.done else 0.0
+        return "%s: %d/%d (%d%%), ETA %ds" % (p.label, p.done, p.total, 100 * p.done // p.total, eta)
+
+class NW_BatchOperator(Operator):
+    """
+    Base for long running jobs. prepare() runs in a worker thread and must not
+    touch bpy (file system scans, hashing), it returns the work items and sees
+    a copy of the preferences. Cache eviction waits for the main thread.
+    process() is called for each item on the main thread, in time slices driven
+    by a modal timer, so the UI stays responsive. Esc cancels and removes the
+    data blocks and nodes process() created so far.
+    """
+    # Seconds of main thread work per timer event.
+    time_slice = 0.05
+
+    def prepare(self):
+        """
+        Worker thread: collect the work items, check self.cancelled regularly.
+        """
+        return []
+
+    def process(self, context, item):
+        """
+        Main thread: apply one work item.
+        """
+        pass
+
+    def finish(self, context):
+        """
+        Main thread: called after the last item was processed.
+        """
+        self.report({"INFO"}, "%s: %d items done." % (self.bl_label, len(self.items)))
+
+    def run_prepare(self):
+        try:
+            self.items = self.prepare()
+        except Exception as e:
+            self.error = str(e)
+
+    def pointers(self):
+        """
+        Pointers of the data blocks and nodes (of the edited tree) a job may create.
+        """
+        data = { name: set(i.as_pointer() for i in getattr(bpy.data, name)) for name in [ "node_groups", "images", "materials" ] }
+        data["nodes"] = set(n.as_pointer() for n in self.tree.nodes) if self.tree else set()
+        return data
+
+    def track(self, before):
+        """
+        Add everything created since before (see pointers()) to the job's data.
+        """
+        for name, pointers in self.pointers().items():
+            self.created[name] |= pointers - before[name]
+
+    def snapshot(self, context):
+        """
+        Start tracking, only data created by process() is removed on cancel
+        (not what the user creates meanwhile).
+        """
+        space = getattr(context, "space_data", None)
+        self.tree = getattr(space, "edit_tree", None)
+        self.created = { name: set() for name in [ "node_groups", "images", "materials", "nodes" ] }
+
+    def rollback(self):
+        if self.tree:
+            for n in list(self.tree.nodes):
+                if n.as_pointer() in self.created["nodes"]:
+                    self.tree.nodes.remove(n)
+        for name in [ "materials", "node_groups", "images" ]:
+            collection = getattr(bpy.data, name)
+            for i in list(collection):
+                if i.as_pointer() in self.created[name]:
+                    collection.remove(i)
+
+    def start(self, context):
+        """
+        Start the job, to be called from execute().
+        """
+        if NW_BatchProgress.label:
+            self.report({"ERROR"}, "Another batch job is running.")
+            return {'CANCELLED'}
+
+        self.items = None
+        self.error = None
+        self.index = 0
+        self.cancelled = False
+        self.snapshot(context)
+
+        NW_BatchProgress.begin(self.bl_label)
+        NW_Preferences.snapshot()
+        self.worker = threading.Thread(target=self.run_prepare, daemon=True)
+        self.worker.start()
+
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.02, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def stop(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+        NW_BatchProgress.end()
+        NW_Cache.evict_pending()
+        self.redraw(context)
+
+    def redraw(self, context):
+        for area in context.screen.areas if context.screen else []:
+            if area.type == "NODE_EDITOR":
+                area.tag_redraw()
+
+    def modal(self, context, event):
+        # The worker stops at its next check, its processes are killed (see NW_Transcoder.run_jobs()).
+        if event.type == "ESC" and not self.cancelled:
+            self.cancelled = True
+            NW_BatchProgress.label = "%s (cancelling)" % self.bl_label
+            self.redraw(context)
+            return {'RUNNING_MODAL'}
+
+        if event.type != "TIMER":
+            return {'PASS_THROUGH'}
+
+        # Still scanning (or cancelling) ..
+        if self.worker.is_alive():
+            return {'PASS_THROUGH'}
+
+        if self.cancelled:
+            self.rollback()
+            self.stop(context)
+            self.report({"WARNING"}, "%s cancelled, partial work removed." % self.bl_label)
+            return {'CANCELLED'}
+
+        if self.error or self.items is None:
+            self.stop(context)
+            self.report({"ERROR"}, "%s failed: %s" % (self.bl_label, self.error))
+            return {'CANCELLED'}
+
+        NW_BatchProgress.total = len(self.items)
+        start = time.perf_counter()
+        before = self.pointers()
+        try:
+            while self.index < len(self.items) and time.perf_counter() - start < self.time_slice:
+                self.process(context, self.items[self.index])
+                self.index += 1
+                NW_BatchProgress.done = self.index
+        except Exception as e:
+            self.track(before)
+            self.rollback()
+            self.stop(context)
+            self.report({"ERROR"}, "%s failed, partial work removed: %s" % (self.bl_label, e))
+            return {'CANCELLED'}
+        self.track(before)
+
+        self.redraw(context)
+        if self.index < len(self.items):
+            return {'PASS_THROUGH'}
+
+        self.finish(context)
+        self.stop(context)
+        return {'FINISHED'}
+
+    def cancel(self, context):
+        """
+        Called by Blender, if the operator is terminated (e.g. file load).
+        """
+        self.cancelled = True
+        self.stop(context)
+
+class NW_BatchGenerateOperator(NW_BatchOperator, NW_MaterialBuilder):
+    bl_idname = "material.nw_batch_generate_op"
+    bl_label = "Batch PBR Setup"
+    bl_description = "Generate PBR setups for all texture sets found in a folder (and sub folders), Esc cancels"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    add_hslbc: BoolProperty()
+    add_uv: BoolProperty()
+    decal: BoolProperty()
+    height_normal: BoolProperty()
+    normal_strength: FloatProperty(default=1.0)
+    remote: BoolProperty(description="Generate the sets of the HTTP library (preferences) instead of a local folder")
+
+    # Required for folder browser.
+    directory: StringProperty(name="Directory", subtype="DIR_PATH", default="", description="Folder to search in for texture sets")
+
+    def prepare(self):
+        files = []
+        if self.source:
+            files = self.source.walk(self.directory)
+        else:
+            for root, _, names in os.walk(self.directory):
+                if self.cancelled:
+                    return []
+                files += [ os.path.join(root, n) for n in names ]
+        mappers = NW_TextureMapper.scanSets(files)
+
+        # Sets the file names don't tell are guessed by content.
+        self.guessed = [] if self.cancelled else NW_MapClassifier.sets(files)
+        mappers += self.guessed
+
+        # Remote sets: only their maps are downloaded (to the cache folder, see execute()).
+        if self.source and not self.cancelled:
+            NW_TextureMapper.localize(mappers)
+            NW_Cache.added()
+            mappers = [ m for m in mappers if m.valid ]
+
+        # Broken sets are skipped (and reported), before anything is created.
+        self.skipped = []
+        valid = []
+        for mapper, issues in zip(mappers, NW_Preflight.check_sets([ m.files() for m in mappers ])):
+            errors = [ message for level, message in issues if level == "ERROR" ]
+            if errors:
+                self.skipped.append("%s: %s" % (mapper.baseName, "; ".join(errors)))
+            else:
+                valid.append(mapper)
+
+        # Sets generated before with the same options are just instanced.
+        options = NW_GroupRegistry.options(self.add_hslbc, self.add_uv, self.decal, self.normal_strength if self.height_normal else None)
+        self.fingerprints = { m: NW_GroupRegistry.fingerprint(m.maps(), "PBR", options) for m in valid }
+        new = [ m for m in valid if self.fingerprints[m] not in self.known ]
+
+        # Local copies of all new sets at once (bounded parallel copies).
+        if not self.cancelled:
+            NW_Staging.stage([ f for m in new for f in m.maps().values() ], cancelled = lambda: self.cancelled)
+
+        self.saved = 0
+        for mapper in new:
+            if self.cancelled:
+                return []
+            self.saved += NW_Transcoder.transcode(mapper.maps(), lambda: self.cancelled)[1]
+
+        # Sets without normal map get one derived from the height map (all at once).
+        self.normals = {}
+        if self.height_normal and not self.cancelled:
+            self.normals = NW_Transcoder.derive_normals([ m.height for m in new if m.normal == None and m.height != None ],
+                self.normal_strength, not self.decal, lambda: self.cancelled)
+        return valid
+
+    def process(self, context, mapper):
+        tree = self.tree
+        group = self.reuse_group(tree, self.fingerprints[mapper], self.add_uv)
+        if group:
+            self.at(group, 0, -4 * self.index)
+            return
+        group, input, output = self.create_group(tree, mapper.baseName, 12)
+        self.at(group, 0, -4 * self.index)
+        vector = self.create_texture_mapping(group, input, output, self.add_uv, tree)
+        self.create_pbr_setup(group, input, output, mapper, vector, self.add_hslbc, self.decal,
+            self.normals.get(mapper.height) if mapper.normal == None else None)
+        NW_TextureWatcher.record(group.node_tree, mapper.maps(), "PBR", self.decal)
+        NW_GroupRegistry.register(group.node_tree, self.fingerprints[mapper])
+
+    def finish(self, context):
+        for message in self.skipped:
+            self.report({"WARNING"}, "Skipped %s" % message)
+        self.report({"INFO"}, "%s: %d sets done (%d guessed by content), %d skipped, %.1f MB image memory saved by transcoding." % (
+            self.bl_label, len(self.items), len([ m for m in self.guessed if m in self.items ]), len(self.skipped),
+            self.saved / (1024.0 * 1024.0)))
+
+    def execute(self, context):
+        if not getattr(context.space_data, "edit_tree", None):
+            self.report({"ERROR"}, "No node tree to generate into.")
+            return {'CANCELLED'}
+        self.source = NW_Staging.configure() if self.remote else None
+        if self.remote:
+            if not self.source:
+                self.report({"ERROR"}, "No HTTP library set in the preferences.")
+                return {'CANCELLED'}
+            self.directory = self.source.url
+        # Looked up here, prepare() runs in the worker thread (process() reuses the trees).
+        self.known = NW_GroupRegistry.known()
+        return self.start(context)
+
+    def invoke(self, context, event):
+        """
+        Opens the folder selection file browser (not for the HTTP library).
+        """
+        if self.remote:
+            return self.execute(context)
+        if len(self.directory) == 0:
+            self.directory = context.preferences.filepaths.texture_directory
+
+        context.window_manager.fileselect_add(self)
+
+        return {'RUNNING_MODAL'}
@@ -0,0 +1,292 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, json, time, hashlib, tempfile, threading
+from bpy.types import Operator
+from bpy.props import BoolProperty
+
+from . nw_preferences import NW_Preferences
+from . nw_preflight import NW_Preflight
+
+class NW_Cache:
+    """
+    Folder of derived files (transcoded maps, ..), keyed by the hash of the
+    source content. Source hashes are remembered per (path, size, mtime), so
+    unchanged sources are not read again. Image nodes load the derived file
+    instead of the source, if one was registered (see resolve()).
+
+    Files are written under a per process temp name and renamed (workers may
+    write the same file concurrently). The folder is capped in size, least
+    recently used files (by mtime, touched on every hit) are evicted first.
+    """
+    # Canonical source file -> derived file loaded instead.
+    substitutes = {}
+
+    # Derived file -> how it was made (dict kind, source, ..), stored on the images
+    # loading it, so it can be made again (see NW_Staging.recover()).
+    recipes = {}
+
+    # (path, size, mtime) -> content hash, persisted in the cache folder.
+    hashes = None
+    lock = threading.Lock()
+
+    # Files were added by a worker thread, eviction is left to the main thread (see added()).
+    pending = False
+
+    # Lookups of this session.
+    stats = { "hits": 0, "misses": 0, "evicted": 0, "evicted_bytes": 0 }
+
+    # Default size cap in GB, temp files older than this (seconds) are leftovers of crashed writers.
+    default_size = 10.0
+    stale_temp = 3600
+
+    @staticmethod
+    def directory():
+        prefs = NW_Preferences.get()
+        directory = os.environ.get("NW_CACHE_DIR") or (prefs and bpy.path.abspath(prefs.cache_directory)) or os.path.join(tempfile.gettempdir(), "nw_cache")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @staticmethod
+    def index_file():
+        return os.path.join(NW_Cache.directory(), "hashes.json")
+
+    @staticmethod
+    def load_hashes():
+        if NW_Cache.hashes is None:
+            try:
+                with open(NW_Cache.index_file()) as f:
+                    NW_Cache.hashes = json.load(f)
+            except (OSError, ValueError):
+                NW_Cache.hashes = {}
+        return NW_Cache.hashes
+
+    @staticmethod
+    def temp_path(fileName):
+        return "%s.%d.%d.tmp" % (fileName, os.getpid(), threading.get_ident())
+
+    @staticmethod
+    def save_hashes():
+        with NW_Cache.lock:
+            # Merge with entries written by other processes meanwhile ..
+            hashes = NW_Cache.load_hashes()
+            try:
+                with open(NW_Cache.index_file()) as f:
+                    hashes.update({ k: v for k, v in json.load(f).items() if k not in hashes })
+            except (OSError, ValueError):
+                pass
+            temp = NW_Cache.temp_path(NW_Cache.index_file())
+            with open(temp, "w") as f:
+                json.dump(hashes, f)
+            os.replace(temp, NW_Cache.index_file())
+
+    @staticmethod
+    def source_hash(fileName):
+        """
+        Content hash of a source file, cached by path, size and mtime.
+        """
+        st = os.stat(fileName)
+        key = "%s|%d|%d" % (os.path.abspath(fileName), st.st_size, st.st_mtime_ns)
+        hashes = NW_Cache.load_hashes()
+        if key not in hashes:
+            h = hashlib.sha1()
+            with open(fileName, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+            with NW_Cache.lock:
+                hashes[key] = h.hexdigest()
+        return hashes[key]
+
+    @staticmethod
+    def path(key, suffix):
+        """
+        Cache file for key (source hash + variant), sharded by the first two hash digits.
+        """
+        folder = os.path.join(NW_Cache.directory(), key[:2])
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, key + suffix)
+
+    @staticmethod
+    def touch(fileName):
+        try:
+            os.utime(fileName, None)
+        except OSError:
+            pass
+
+    @staticmethod
+    def lookup(key, suffix):
+        """
+        Cache file for key and whether it exists (counted as hit/miss, hits are touched).
+        """
+        fileName = NW_Cache.path(key, suffix)
+        hit = os.path.exists(fileName)
+        NW_Cache.stats["hits" if hit else "misses"] += 1
+        if hit:
+            NW_Cache.touch(fileName)
+        return fileName, hit
+
+    @staticmethod
+    def capacity():
+        prefs = NW_Preferences.get()
+        return (prefs.cache_size if prefs else NW_Cache.default_size) * 1024 ** 3
+
+    @staticmethod
+    def entries():
+        """
+        List of (file, size, mtime) of all cache files, temp files, staged
+        copies and downloads (see NW_Staging) included.
+        """
+        entries = []
+        root = NW_Cache.directory()
+        folders = [ os.path.join(root, shard) for shard in os.listdir(root) if len(shard) == 2 ]
+        for sub in [ "staged", "remote" ]:
+            folders += [ path for path, _, _ in os.walk(os.path.join(root, sub)) ]
+        for folder in folders:
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                try:
+                    fileName = os.path.join(folder, name)
+                    if os.path.isfile(fileName):
+                        st = os.stat(fileName)
+                        entries.append((fileName, st.st_size, st.st_mtime))
+                except OSError:
+                    pass # Removed meanwhile.
+        return entries
+
+    @staticmethod
+    def in_use():
+        """
+        Cache files currently loaded or registered as substitute, never evicted.
+        """
+        files = set(os.path.abspath(f) for f in NW_Cache.substitutes.values())
+        files.update(os.path.abspath(bpy.path.abspath(i.filepath)) for i in bpy.data.images if i.filepath)
+        return files
+
+    @staticmethod
+    def remove(fileName, size):
+        try:
+            os.remove(fileName)
+            return size
+        except OSError:
+            return 0
+
+    @staticmethod
+    def enforce(capacity = None):
+        """
+        Evict least recently used files until the cache fits capacity (bytes,
+        default from the preferences), returns (files, bytes) evicted.
+        """
+        capacity = NW_Cache.capacity() if capacity is None else capacity
+        entries = [ e for e in NW_Cache.entries() if not e[0].endswith(".tmp") ]
+        total = sum(size for _, size, _ in entries)
+        if total <= capacity:
+            return 0, 0
+
+        used = NW_Cache.in_use()
+        count = freed = 0
+        for fileName, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total - freed <= capacity:
+                break
+            if os.path.abspath(fileName) not in used:
+                removed = NW_Cache.remove(fileName, size)
+                freed += removed
+                count += 1 if removed else 0
+        NW_Cache.stats["evicted"] += count
+        NW_Cache.stats["evicted_bytes"] += freed
+        return count, freed
+
+    @staticmethod
+    def added():
+        """
+        New files may exceed the size limit. Evicted right away on the main
+        thread, worker threads leave it to evict_pending() (in_use() reads bpy.data).
+        """
+        if threading.current_thread() is threading.main_thread():
+            NW_Cache.enforce()
+        else:
+            NW_Cache.pending = True
+
+    @staticmethod
+    def evict_pending():
+        """
+        Main thread: evict after files were added by a worker thread.
+        """
+        if NW_Cache.pending:
+            NW_Cache.pending = False
+            NW_Cache.enforce()
+
+    @staticmethod
+    def verify():
+        """
+        Remove broken cache files (unreadable image headers, invalid JSON) and
+        stale temp files, returns (files checked, list of removed files).
+        """
+        removed = []
+        now = time.time()
+        entries = NW_Cache.entries()
+        for fileName, size, mtime in entries:
+            if fileName.endswith(".tmp"):
+                broken = now - mtime > NW_Cache.stale_temp
+            elif fileName.endswith(".json"):
+                try:
+                    with open(fileName) as f:
+                        json.load(f)
+                    broken = False
+                except (OSError, ValueError):
+                    broken = True
+            else:
+                broken = NW_Preflight.read_info(fileName).error is not None
+            if broken and NW_Cache.remove(fileName, size):
+                removed.append(fileName)
+        return len(entries), removed
+
+    @staticmethod
+    def text():
+        s = NW_Cache.stats
+        return "Cache: %d hits, %d misses, %d evicted (%.1f MB)" % (s["hits"], s["misses"], s["evicted"], s["evicted_bytes"] / (1024.0 * 1024.0))
+
+    @staticmethod
+    def substitute(source, derived):
+        NW_Cache.substitutes[source] = derived
+
+    @staticmethod
+    def resolve(fileName):
+        """
+        Return the file to load for a canonical source file.
+        """
+        derived = NW_Cache.substitutes.get(fileName)
+        if derived and os.path.exists(derived):
+            NW_Cache.touch(derived)
+            return derived
+        return fileName
+
+class NW_CacheMaintenanceOperator(Operator):
+    bl_idname = "material.nw_cache_maintenance_op"
+    bl_label = "Prune Texture Cache"
+    bl_description = "Evict least recently used files until the texture cache fits its size limit"
+
+    verify: BoolProperty(name="Verify", description="Remove broken and stale files first")
+
+    def execute(self, context):
+        if self.verify:
+            checked, removed = NW_Cache.verify()
+            self.report({"INFO"}, "%d cache files checked, %d broken removed." % (checked, len(removed)))
+        count, freed = NW_Cache.enforce()
+        entries = NW_Cache.entries()
+        self.report({"INFO"}, "%d files evicted (%.1f MB), cache holds %d files (%.1f of %.1f GB)." % (count, freed / 1024.0 ** 2,
+            len(entries), sum(e[1] for e in entries) / 1024.0 ** 3, NW_Cache.capacity() / 1024.0 ** 3))
+        return{'FINISHED'}
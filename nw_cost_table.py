@@ -0,0 +1,94 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+# No bpy in here, used by tools/nw_cost_calibrate.py as well.
+import json
+
+class NW_CostTable:
+    """
+    Cost per evaluated node category (see NW_RenderCost.category()), plus cost
+    per megapixel of looked up images. The built-in values are relative units,
+    a table fitted to measured renders (fit()) gives seconds per frame of the
+    benchmark scene instead.
+    """
+    defaults = {
+        "image": 1.0,
+        "image_megapixel": 0.25,
+        "noise": 2.0,
+        "musgrave": 4.0,
+        "voronoi": 3.0,
+        "procedural": 1.5,
+        "principled": 4.0,
+        "bsdf": 1.5,
+        "bump": 1.0,
+        "mix_shader": 0.5,
+        "other": 0.1
+    }
+
+    def __init__(self, costs = None):
+        self.costs = dict(NW_CostTable.defaults)
+        self.costs.update(costs or {})
+        self.unit = "units"
+
+    @staticmethod
+    def load(fileName):
+        with open(fileName) as f:
+            data = json.load(f)
+        table = NW_CostTable(data["costs"])
+        table.unit = data.get("unit", table.unit)
+        return table
+
+    def save(self, fileName):
+        with open(fileName, "w") as f:
+            json.dump({ "unit": self.unit, "costs": self.costs }, f, indent=2)
+
+    def score(self, counts):
+        return sum(self.costs.get(key, self.costs["other"]) * value for key, value in counts.items())
+
+    @staticmethod
+    def fit(samples, iterations = 5000):
+        """
+        Fit costs to measured samples (list of (counts dict, seconds)), non-negative
+        least squares by coordinate descent, plus a constant scene cost ("base",
+        not used for scoring). Categories not covered by any sample keep their
+        default, scaled like the fitted ones. Returns the table.
+        """
+        keys = sorted(set(k for counts, _ in samples for k, v in counts.items() if v)) + [ "base" ]
+        rows = [ [ counts.get(k, 0.0) for k in keys[:-1] ] + [ 1.0 ] for counts, _ in samples ]
+        values = [ seconds for _, seconds in samples ]
+        norms = [ sum(row[j] ** 2 for row in rows) for j in range(len(keys)) ]
+
+        x = [ 0.0 ] * len(keys)
+        residuals = list(values)
+        for _ in range(iterations):
+            for j in range(len(keys)):
+                if not norms[j]:
+                    continue
+                step = sum(row[j] * r for row, r in zip(rows, residuals)) / norms[j]
+                new = max(0.0, x[j] + step)
+                if new != x[j]:
+                    delta = new - x[j]
+                    residuals = [ r - row[j] * delta for row, r in zip(rows, residuals) ]
+                    x[j] = new
+
+        fitted = dict(zip(keys, x))
+        ratios = sorted(fitted[k] / NW_CostTable.defaults[k] for k in keys if k in NW_CostTable.defaults and fitted[k] > 0.0)
+        scale = ratios[len(ratios) // 2] if ratios else 1.0
+        costs = { k: v * scale for k, v in NW_CostTable.defaults.items() }
+        costs.update(fitted)
+        table = NW_CostTable(costs)
+        table.unit = "s"
+        return table
@@ -0,0 +1,224 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, json, hashlib
+from types import SimpleNamespace
+from bpy.types import Operator
+from bpy.props import IntProperty
+
+from . nw_node_utils import DummyGroup
+from . nw_material_builder import NW_MaterialBuilder
+from . nw_texture_mapper import NW_TextureMapper
+from . nw_texture_watcher import NW_TextureWatcher
+from . nw_atlas_packer import NW_AtlasPacker
+from . nw_preflight import NW_Preflight
+from . nw_transcode import NW_Transcoder
+from . nw_cache import NW_Cache
+
+class NW_DecalAtlas(NW_MaterialBuilder):
+    """
+    Replaces generated decal groups (PBR setups with the decal option) by
+    groups sampling shared atlas images. All decals of an atlas page share one
+    tree, every instance maps its 0..1 UV range to its region by the Scale,
+    Aspect and Offset inputs and is clipped outside of it (Alpha output).
+    """
+    # Atlas per map type and its fill color (pixels not covered by a decal having the map).
+    fills = {
+        "diffuse": [ 0.0, 0.0, 0.0, 0.0 ],
+        "metal": [ 0.0, 0.0, 0.0, 1.0 ],
+        "specular": [ 0.5, 0.5, 0.5, 1.0 ],
+        "roughness": [ 0.5, 0.5, 0.5, 1.0 ],
+        "normal": [ 0.5, 0.5, 1.0, 1.0 ]
+    }
+
+    @staticmethod
+    def decals(nodes):
+        """
+        Dict decal tree -> maps (dict map type -> file) of the group nodes
+        generated as PBR decals (UDIM sets aren't packed).
+        """
+        decals = {}
+        for node in nodes:
+            tree = node.node_tree if node.type == "GROUP" else None
+            sources = NW_TextureWatcher.sources(tree) if tree else None
+            if not sources or sources.get("mode") != "PBR" or not sources.get("decal"):
+                continue
+            maps = { key: s["path"] for key, s in sources["maps"].items() }
+            if "diffuse" in maps and not any(NW_TextureMapper.udim_token in f for f in maps.values()):
+                decals[tree] = maps
+        return decals
+
+    @staticmethod
+    def layers(maps, normals):
+        """
+        Atlas items of a decal, dict atlas map type -> (file, invert). Gloss goes
+        inverted into the roughness atlas, height as derived normal map (normals).
+        """
+        layers = { key: (maps[key], False) for key in NW_DecalAtlas.fills if key in maps }
+        if "roughness" not in maps and "gloss" in maps:
+            layers["roughness"] = (maps["gloss"], True)
+        if "normal" not in maps and maps.get("height") in normals:
+            layers["normal"] = (normals[maps["height"]], False)
+        return layers
+
+    @staticmethod
+    def composite(pages, size, padding):
+        """
+        Composite the atlas pages (list of lists of (layers, placement)) by the
+        background workers, cached by content. Returns per page dict map type ->
+        atlas file (failed atlases are missing).
+        """
+        jobs, atlases = [], []
+        for index, decals in enumerate(pages):
+            atlases.append({})
+            for key, fill in NW_DecalAtlas.fills.items():
+                items = [ { "source": NW_Cache.resolve(layers[key][0]), "invert": layers[key][1],
+                    "x": p[1], "y": p[2], "w": p[3], "h": p[4] } for layers, p in decals if key in layers ]
+                if not items:
+                    continue
+                data = [ size, padding, fill, [ [ NW_Cache.source_hash(i["source"]), i["invert"], i["x"], i["y"], i["w"], i["h"] ] for i in items ] ]
+                key_hash = hashlib.sha1(json.dumps(data).encode("utf-8")).hexdigest()
+                target, hit = NW_Cache.lookup("%s_atlas" % key_hash, ".png")
+                if not hit:
+                    jobs.append({ "kind": "atlas", "source": "atlas %d (%s)" % (index + 1, key), "target": target,
+                        "size": size, "padding": padding, "fill": fill, "items": items })
+                atlases[-1][key] = target
+        NW_Cache.save_hashes()
+
+        if jobs:
+            NW_Transcoder.run_jobs(jobs)
+        return [ { key: f for key, f in files.items() if os.path.exists(f) } for files in atlases ]
+
+    def clip(self, group, output):
+        """
+        Multiply the Alpha output by a mask, 1 inside the 0..1 UV range of the decal only.
+        """
+        tree = group.node_tree
+        separate = [ n for n in tree.nodes if n.bl_idname == "ShaderNodeSeparateXYZ" ][0]
+        alpha = [ l for l in tree.links if l.to_node == output and l.to_socket.name == "Alpha" ][0]
+
+        inside = []
+        for index, axis in enumerate([ "X", "Y" ]):
+            above = self.at(self.create_math_node(tree, "GREATER_THAN", def1 = 0.0), 3, 5 - index)
+            below = self.at(self.create_math_node(tree, "LESS_THAN", def1 = 1.0), 3, 4.5 - index)
+            both = self.at(self.create_math_node(tree, "MULTIPLY"), 4, 5 - index)
+            tree.links.new(separate.outputs[axis], above.inputs[0])
+            tree.links.new(separate.outputs[axis], below.inputs[0])
+            tree.links.new(above.outputs["Value"], both.inputs[0])
+            tree.links.new(below.outputs["Value"], both.inputs[1])
+            inside.append(both)
+
+        mask = self.at(self.create_math_node(tree, "MULTIPLY"), 5, 5)
+        clipped = self.at(self.create_math_node(tree, "MULTIPLY"), 9, 5)
+        tree.links.new(inside[0].outputs["Value"], mask.inputs[0])
+        tree.links.new(inside[1].outputs["Value"], mask.inputs[1])
+        tree.links.new(alpha.from_socket, clipped.inputs[0])
+        tree.links.new(mask.outputs["Value"], clipped.inputs[1])
+        tree.links.new(clipped.outputs["Value"], alpha.to_socket)
+
+    def build_page(self, name, atlases, hslbc, vectorInput):
+        """
+        Create the shared tree of an atlas page (atlases: dict map type -> file).
+        """
+        tree, input, output = self.create_group_tree(name, 12)
+        group = DummyGroup(tree)
+        mapper = SimpleNamespace(diffuse = atlases["diffuse"], metal = atlases.get("metal"), specular = atlases.get("specular"),
+            roughness = atlases.get("roughness"), gloss = None, normal = atlases.get("normal"), height = None)
+        vector = self.create_texture_mapping(group, input, output, vectorInput, None, aspect = True)
+        self.create_pbr_setup(group, input, output, mapper, vector, hslbc, True)
+        self.clip(group, output)
+        return tree
+
+    def pack(self, nodes, size, padding):
+        """
+        Pack the decals of the selected group nodes into atlas pages and switch
+        the nodes to the page trees. Returns (packed decals, pages, images
+        before, images after) or None, if there are no decals.
+        """
+        decals = self.decals(nodes)
+        infos = NW_Preflight.read_all(maps["diffuse"] for maps in decals.values())
+        decals = { tree: maps for tree, maps in decals.items()
+            if not infos[maps["diffuse"]].error and infos[maps["diffuse"]].width > 0 }
+        if not decals:
+            return None
+
+        # Height only decals get a derived normal map (no bump on an atlas) ..
+        trees = sorted(decals, key=lambda t: t.name)
+        heights = [ decals[t]["height"] for t in trees if "height" in decals[t] and "normal" not in decals[t] ]
+        normals = NW_Transcoder.derive_normals(heights, 1.0, False) if heights else {}
+
+        # .. and all map types of a decal share its region.
+        count, placements = NW_AtlasPacker.pack([ (infos[decals[t]["diffuse"]].width, infos[decals[t]["diffuse"]].height) for t in trees ], size, padding)
+        pages = [ [] for _ in range(count) ]
+        for t, p in zip(trees, placements):
+            pages[p[0]].append((self.layers(decals[t], normals), p))
+        atlases = self.composite(pages, size, padding)
+
+        packed, images, replaced = 0, 0, []
+        for index, files in enumerate(atlases):
+            members = [ t for t, p in zip(trees, placements) if p[0] == index ]
+            if "diffuse" not in files:
+                print("Node Wizard: atlas page %d failed, decals kept" % (index + 1))
+                continue
+            hslbc = any(t.inputs.find("Hue") != -1 for t in members)
+            vectorInput = any(t.inputs.find("Vector") != -1 for t in members)
+            page = self.build_page("Decal_Atlas_%d" % (index + 1), files, hslbc, vectorInput)
+            page["nw_atlas"] = json.dumps({ t.name: decals[t] for t in members })
+            images += len(files)
+
+            for t, p in zip(trees, placements):
+                if p[0] != index:
+                    continue
+                for node in nodes:
+                    if node.node_tree == t:
+                        node.node_tree = page
+                        node.label = t.name
+                        for name, value in NW_AtlasPacker.transform(p, size).items():
+                            node.inputs[name].default_value = value
+                packed += 1
+                replaced.append(t)
+
+        before = sum(len(decals[t]) for t in replaced)
+
+        # Decal trees used elsewhere stay.
+        for t in replaced:
+            if t.users == 0:
+                bpy.data.node_groups.remove(t)
+        return packed, count, before, images
+
+class NW_DecalAtlasOperator(Operator, NW_DecalAtlas):
+    bl_idname = "material.nw_decal_atlas_op"
+    bl_label = "Pack Decals into Atlas"
+    bl_description = "Pack the textures of the selected decal groups (PBR setups with Clip Texture/Decal) into shared atlas images, all decals of an atlas share one group"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    size: IntProperty(name="Atlas Size", default=4096, min=256, max=16384)
+    padding: IntProperty(name="Padding", description="Pixels around every decal repeating its border", default=8, min=0, max=256)
+
+    def execute(self, context):
+        if not bpy.app.binary_path:
+            self.report({"ERROR"}, "Atlases are composited by background Blender processes, which aren't available.")
+            return{'CANCELLED'}
+
+        nodes = [ n for n in context.space_data.edit_tree.nodes if n.select and n.type == "GROUP" ]
+        result = self.pack(nodes, self.size, self.padding)
+        if not result:
+            self.report({"ERROR"}, "No generated decal group selected (PBR setup with Clip Texture/Decal).")
+            return{'CANCELLED'}
+
+        packed, pages, before, after = result
+        self.report({"INFO"}, "%d decals packed into %d atlas page(s), %d images instead of %d (Remove Unused frees the old ones)." % (packed, pages, after, before))
+        return{'FINISHED'}
@@ -0,0 +1,184 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os
+from bpy.types import Operator
+from bpy.props import BoolProperty, IntProperty, StringProperty
+
+from . nw_baker import NW_Baker
+
+class NW_Flattener(NW_Baker):
+    """
+    Replaces PBR groups by their baked outputs for final renders and exports:
+    the outputs are baked per object with Cycles on the CPU and feed a plain
+    Principled BSDF. The group controls (HSL/BC, wet factor, tiling, ..) are
+    frozen into the images.
+    """
+    # Group output, image color space, bake type (normals are baked from the group's shader).
+    channels = [
+        ("Base Color", "sRGB", "EMIT"),
+        ("Roughness", "Non-Color", "EMIT"),
+        ("Metallic", "Non-Color", "EMIT"),
+        ("Specular", "Non-Color", "EMIT"),
+        ("Normal", "Non-Color", "NORMAL"),
+        ("Alpha", "Non-Color", "EMIT")
+    ]
+
+    # Principled inputs of a channel, the first one found is used (renamed in Blender 4.0).
+    inputs = { "Specular": [ "Specular", "Specular IOR Level" ] }
+
+    @staticmethod
+    def shader_input(shader, name):
+        """
+        Input of the Principled BSDF shader for channel name, None if missing.
+        """
+        for n in NW_Flattener.inputs.get(name, [ name ]):
+            if shader.inputs.get(n):
+                return shader.inputs[n]
+        return None
+
+    @staticmethod
+    def file_name(directory, name):
+        """
+        PNG file for image name in directory, numbered if taken (other materials
+        or .blend files may be flattened into the same directory).
+        """
+        fileName, number = os.path.join(directory, name + ".png"), 1
+        while os.path.exists(fileName):
+            fileName = os.path.join(directory, "%s_%d.png" % (name, number))
+            number += 1
+        return fileName
+
+    @staticmethod
+    def can_flatten(node):
+        return node.type == "GROUP" and node.node_tree != None and node.outputs.get("Shader") != None and node.outputs.get("Base Color") != None
+
+    @staticmethod
+    def work(objects):
+        """
+        List of (object, material, group nodes) for all materials of objects
+        with UV map, each material once (an image only fits one object).
+        """
+        work, done = [], set()
+        for obj in objects:
+            if obj.type != "MESH" or not obj.data.uv_layers:
+                continue
+            for material in [ s.material for s in obj.material_slots if s.material and s.material.use_nodes ]:
+                if material in done:
+                    continue
+                done.add(material)
+                nodes = [ n for n in material.node_tree.nodes if NW_Flattener.can_flatten(n) ]
+                if nodes:
+                    work.append((obj, material, nodes))
+        return work
+
+    def flatten(self, context, obj, material, node, resolution, samples, directory = None):
+        """
+        Bake the outputs of the group node for obj and replace the node by image
+        nodes feeding a Principled BSDF (users of the group outputs are linked
+        to the images). Outputs the group lacks keep the shader defaults, outputs
+        the shader lacks (Alpha) are only baked if used. Images are saved as PNG
+        to directory (packed without). Returns the number of baked images.
+        """
+        tree = material.node_tree
+        users = { s.name: [ l.to_socket for l in s.links ] for s in node.outputs }
+        x, y = node.location.x, node.location.y
+        shader = tree.nodes.new("ShaderNodeBsdfPrincipled")
+        shader.location = (x, y)
+
+        images = []
+        for name, colorSpace, type in NW_Flattener.channels:
+            socket = node.outputs.get(name)
+            target = NW_Flattener.shader_input(shader, name) if name != "Alpha" else None
+            if not socket or not (target or users[name]):
+                continue
+            image = bpy.data.images.new(bpy.path.clean_name("%s_%s_%s" % (material.name, node.node_tree.name, name)), resolution, resolution)
+            image.colorspace_settings.name = colorSpace
+            self.tag(image)
+            self.bake_socket(context, obj, material, node.outputs["Shader"] if type == "NORMAL" else socket, samples, image = image, type = type)
+            if directory:
+                image.filepath_raw = NW_Flattener.file_name(bpy.path.abspath(directory), image.name)
+                image.file_format = "PNG"
+                image.save()
+            else:
+                image.pack()
+            images.append((name, image, target))
+
+        # Replace the group ..
+        for s in users["Shader"]:
+            tree.links.new(shader.outputs["BSDF"], s)
+
+        for index, (name, image, target) in enumerate(images):
+            texture = tree.nodes.new("ShaderNodeTexImage")
+            texture.image = image
+            texture.label = "%s (baked)" % name
+            texture.location = (x - 600, y - 300 * index)
+            socket = texture.outputs["Color"]
+            if name == "Normal":
+                normal = tree.nodes.new("ShaderNodeNormalMap")
+                normal.location = (x - 300, y - 300 * index)
+                tree.links.new(socket, normal.inputs["Color"])
+                socket = normal.outputs["Normal"]
+            if target:
+                tree.links.new(socket, target)
+            for s in users.get(name, []):
+                tree.links.new(socket, s)
+
+        # .. the tree is left to "Clean Up" (other materials may still use it).
+        tree.nodes.remove(node)
+        return len(images)
+
+class NW_FlattenOperator(Operator, NW_Flattener):
+    bl_idname = "material.nw_flatten_op"
+    bl_label = "Flatten to Textures"
+    bl_description = "Bake the selected PBR groups of the active object's material (or the PBR groups of all materials of the selected objects) into images and replace them by a plain Principled BSDF"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    all_materials: BoolProperty(name="All Materials", description="Flatten the PBR groups of all materials of the selected objects")
+    resolution: IntProperty(name="Resolution", default=2048, min=64, max=16384)
+    samples: IntProperty(name="Samples", default=16, min=1, max=4096)
+    directory: StringProperty(name="Directory", subtype="DIR_PATH", description="Save the images as PNG files in here (packed if empty)")
+
+    def execute(self, context):
+        if self.all_materials:
+            work = NW_Flattener.work(context.selected_objects)
+            if not work:
+                self.report({"ERROR"}, "No PBR groups in the materials of the selected objects with UV map.")
+                return{'CANCELLED'}
+        else:
+            obj = context.active_object
+            material = obj.active_material if obj else None
+            if not material or not material.use_nodes or context.space_data.edit_tree != material.node_tree:
+                self.report({"ERROR"}, "Select PBR groups at the top level of the active object's material.")
+                return{'CANCELLED'}
+            nodes = [ n for n in material.node_tree.nodes if n.select and NW_Flattener.can_flatten(n) ]
+            if not nodes:
+                self.report({"ERROR"}, "No PBR group selected.")
+                return{'CANCELLED'}
+            if not obj.data.uv_layers:
+                self.report({"ERROR"}, "%s has no UV map." % obj.name)
+                return{'CANCELLED'}
+            work = [ (obj, material, nodes) ]
+
+        groups = baked = 0
+        for obj, material, nodes in work:
+            if material.users > 1:
+                self.report({"WARNING"}, "%s is used by other objects as well, the images only fit %s." % (material.name, obj.name))
+            for node in nodes:
+                baked += self.flatten(context, obj, material, node, self.resolution, self.samples, self.directory)
+                groups += 1
+        self.report({"INFO"}, "%d groups flattened into %d images (%d materials)." % (groups, baked, len(work)))
+        return{'FINISHED'}
@@ -0,0 +1,150 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy
+from bpy.types import Operator
+from bpy.props import BoolProperty
+
+class NW_GarbageCollector:
+    """
+    Finds node groups and images created by Node Wizard, which are no longer
+    reachable from any material, world, light, scene or foreign node group.
+    """
+    # Custom properties marking generated data (older versions only set the latter ones).
+    tags = [ "nw_generated", "nw_spec_hash", "nw_sources", "nw_source" ]
+
+    # Data blocks with node trees, these trees are always alive.
+    owners = [ "materials", "worlds", "lights", "scenes", "linestyles", "textures" ]
+
+    @staticmethod
+    def is_generated(id):
+        return any(tag in id for tag in NW_GarbageCollector.tags)
+
+    @staticmethod
+    def visit(trees, groups, images):
+        """
+        Add all groups and images used (nested) by trees to groups/images (as_pointer() keys).
+        """
+        stack = list(trees)
+        while stack:
+            tree = stack.pop()
+            for node in tree.nodes:
+                sub = getattr(node, "node_tree", None)
+                if sub and sub.as_pointer() not in groups:
+                    groups.add(sub.as_pointer())
+                    stack.append(sub)
+                image = getattr(node, "image", None)
+                if image:
+                    images.add(image.as_pointer())
+
+    @staticmethod
+    def references(trees):
+        """
+        Number of nodes in trees using each group/image.
+        """
+        count = {}
+        for tree in trees:
+            for node in tree.nodes:
+                for id in [ getattr(node, "node_tree", None), getattr(node, "image", None) ]:
+                    if id:
+                        count[id.as_pointer()] = count.get(id.as_pointer(), 0) + 1
+        return count
+
+    @staticmethod
+    def find():
+        """
+        Return (groups, images) which are generated and unused.
+        """
+        roots = []
+        for name in NW_GarbageCollector.owners:
+            for owner in getattr(bpy.data, name, []):
+                if getattr(owner, "node_tree", None):
+                    roots.append(owner.node_tree)
+        roots += [ g for g in bpy.data.node_groups if not NW_GarbageCollector.is_generated(g) ]
+
+        groups, images = set(), set()
+        NW_GarbageCollector.visit(roots, groups, images)
+
+        # Unreachable data may still have other users (fake user, modifiers, ..),
+        # those are kept alive including everything they use.
+        while True:
+            orphanGroups = [ g for g in bpy.data.node_groups if NW_GarbageCollector.is_generated(g) and g.as_pointer() not in groups ]
+            orphanImages = [ i for i in bpy.data.images if NW_GarbageCollector.is_generated(i) and i.as_pointer() not in images ]
+            count = NW_GarbageCollector.references(orphanGroups)
+
+            alive = [ g for g in orphanGroups if g.users - count.get(g.as_pointer(), 0) > 0 ]
+            if not alive:
+                break
+            groups.update(g.as_pointer() for g in alive)
+            NW_GarbageCollector.visit(alive, groups, images)
+
+        orphanImages = [ i for i in orphanImages if i.users - count.get(i.as_pointer(), 0) <= 0 ]
+        return orphanGroups, orphanImages
+
+    @staticmethod
+    def image_bytes(image):
+        """
+        Return (bytes stored in the .blend, bytes of the loaded pixel buffer).
+        """
+        packed = image.packed_file.size if image.packed_file else 0
+        pixels = image.size[0] * image.size[1] * image.depth // 8 if image.has_data else 0
+        return packed, pixels
+
+    @staticmethod
+    def collect(purge):
+        """
+        Find (and remove if purge) unused generated data, returns a summary dict.
+        """
+        groups, images = NW_GarbageCollector.find()
+        summary = {
+            "groups": [ g.name for g in groups ],
+            "images": [ i.name for i in images ],
+            "nodes": sum(len(g.nodes) for g in groups),
+            "packed_bytes": 0,
+            "memory_bytes": 0
+        }
+        for i in images:
+            packed, pixels = NW_GarbageCollector.image_bytes(i)
+            summary["packed_bytes"] += packed
+            summary["memory_bytes"] += pixels
+
+        if purge:
+            for g in groups:
+                bpy.data.node_groups.remove(g)
+            for i in images:
+                bpy.data.images.remove(i)
+        return summary
+
+    @staticmethod
+    def text(summary, purge):
+        mb = 1024.0 * 1024.0
+        return "%s %d groups (%d nodes), %d images, %.1f MB packed, %.1f MB image memory" % (
+            "Removed" if purge else "Unused:",
+            len(summary["groups"]), summary["nodes"], len(summary["images"]),
+            summary["packed_bytes"] / mb, summary["memory_bytes"] / mb)
+
+class NW_GarbageCollectOperator(Operator):
+    bl_idname = "material.nw_garbage_collect_op"
+    bl_label = "Clean Up Unused"
+    bl_description = "Report (dry run) or remove Node Wizard groups and images which are no longer used"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    dry_run: BoolProperty(name="Dry Run", default=True)
+
+    def execute(self, context):
+        summary = NW_GarbageCollector.collect(not self.dry_run)
+        self.report({"INFO"}, NW_GarbageCollector.text(summary, not self.dry_run))
+        return{'FINISHED'}
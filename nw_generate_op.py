@@ -16,12 +16,18 @@
 
 import bpy, os
 from bpy.types import Operator
-from bpy.props import StringProperty, BoolProperty
+from bpy.props import StringProperty, BoolProperty, FloatProperty
 
 from . nw_texture_mapper import NW_TextureMapper
-from . nw_node_utils import NW_NodeUtils
+from . nw_map_classifier import NW_MapClassifier
+from . nw_material_builder import NW_MaterialBuilder
+from . nw_texture_watcher import NW_TextureWatcher
+from . nw_preflight import NW_Preflight
+from . nw_transcode import NW_Transcoder
+from . nw_group_registry import NW_GroupRegistry
+from . nw_staging import NW_Staging
  
-class NW_GenerateOperator(Operator, NW_NodeUtils):
+class NW_GenerateOperator(Operator, NW_MaterialBuilder):
     bl_idname = "material.nw_generate_op"
     bl_label = "Generate Material Nodes from Textures"
     bl_description = "Generate specific node mapping for existing textures" 
@@ -32,201 +38,53 @@ class NW_GenerateOperator(Operator, NW_NodeUtils):
     add_hslbc: BoolProperty()
     add_uv: BoolProperty()
     decal: BoolProperty()
+    height_normal: BoolProperty()
+    normal_strength: FloatProperty(default=1.0)
 
     # Required for texture browser.
     filepath: StringProperty(subtype="FILE_PATH") 
     directory: StringProperty(name="Directory", subtype="DIR_PATH", default="", description="Folder to search in for image files")
 
-    def create_texture_mapping(self, group, input, output, vectorInput, parentTree):
+    def preflight(self, maps):
         """
-        Create the texture mapping setup.
+        Report header problems of the maps, returns False on errors.
         """
-        tree = group.node_tree
+        issues = NW_Preflight.check_sets([ maps ])[0]
+        for level, message in issues:
+            self.report({level}, message)
+        return not any(level == "ERROR" for level, _ in issues)
 
-        if not vectorInput:
-            texCoord = self.at(tree.nodes.new("ShaderNodeTexCoord"), 0, 2)
+    def options(self):
+        return NW_GroupRegistry.options(self.add_hslbc, self.add_uv, self.decal, self.normal_strength if self.height_normal else None)
 
-        separate = self.at(tree.nodes.new("ShaderNodeSeparateXYZ"), 2, 1)
-        scaleX = self.at(self.create_math_node(tree, "MULTIPLY", def1 = 1.0), 3, 1)
-        scaleY = self.at(self.create_math_node(tree, "MULTIPLY", def1 = 1.0), 3, 0)
-        offsetX = self.at(self.create_math_node(tree, "ADD", def1 = 0.0), 4, 1)
-        offsetY = self.at(self.create_math_node(tree, "ADD", def1 = 0.0), 4, 0)
-        combine = self.at(tree.nodes.new("ShaderNodeCombineXYZ"), 5, 0)
-
-        if not vectorInput:
-            tree.links.new(texCoord.outputs["UV"], separate.inputs["Vector"])
-        else:
-            tree.links.new(self.create_group_input(group, input, "Vector", "Vector"), separate.inputs["Vector"])
-            ptx = parentTree.nodes.new("ShaderNodeTexCoord")
-            ptx.location.x = group.location.x - 3 * self.gridSizeX
-            pm = parentTree.nodes.new("ShaderNodeMapping")
-            pm.location.x = group.location.x - 2 * self.gridSizeX
-            parentTree.links.new(ptx.outputs["UV"], pm.inputs["Vector"])
-            parentTree.links.new(pm.outputs["Vector"], group.inputs["Vector"])
-
-        tree.links.new(separate.outputs["X"], scaleX.inputs[0])
-        tree.links.new(separate.outputs["Y"], scaleY.inputs[0])
-        tree.links.new(scaleX.outputs["Value"], offsetX.inputs[0])
-        tree.links.new(scaleY.outputs["Value"], offsetY.inputs[0])
-        tree.links.new(offsetX.outputs["Value"], combine.inputs["X"])
-        tree.links.new(offsetY.outputs["Value"], combine.inputs["Y"])
-
-        scale = self.create_group_input(group, input, "Float", "Scale", 1.0)
-        tree.links.new(scale, scaleX.inputs[1])
-        tree.links.new(scale, scaleY.inputs[1])
-        tree.links.new(self.create_group_input(group, input, "Float", "Offset X", 0.0), offsetX.inputs[1])
-        tree.links.new(self.create_group_input(group, input, "Float", "Offset Y", 0.0), offsetY.inputs[1])
-
-        return combine
-
-    def create_hslbc(self, group, input, output, gridX, gridY, colorSocket, outputSockets):
+    def reuse(self, tree, fingerprint):
         """
-        Plugs a HSL and Brightness/Contrast-Node between colorSocket and outputSockets.
+        Instance an identical group generated before, returns True if there was one.
         """
-        tree = group.node_tree
-        hsl = self.at(tree.nodes.new("ShaderNodeHueSaturation"), gridX, gridY)
-        bc = self.at(tree.nodes.new("ShaderNodeBrightContrast"), gridX + 0.5, gridY - 0.5)
-
-        tree.links.new(self.create_group_input(group, input, "Float", "Hue", 0.5), hsl.inputs["Hue"])
-        tree.links.new(self.create_group_input(group, input, "Float", "Saturation", 1.0), hsl.inputs["Saturation"])
-        tree.links.new(self.create_group_input(group, input, "Float", "HSL-Value", 1.0), hsl.inputs["Value"])
-
-        tree.links.new(self.create_group_input(group, input, "Float", "Brightness", 0.0), bc.inputs["Bright"])
-        tree.links.new(self.create_group_input(group, input, "Float", "Contrast", 0.0), bc.inputs["Contrast"])
+        group = self.reuse_group(tree, fingerprint, self.add_uv)
+        if group:
+            self.report({"INFO"}, "Reused %s (same sources and options)" % group.node_tree.name)
+        return group != None
 
-        tree.links.new(colorSocket, hsl.inputs["Color"])
-        tree.links.new(hsl.outputs["Color"], bc.inputs["Color"])
-        for s in outputSockets:
-            tree.links.new(bc.outputs["Color"], s)
-
-    def create_pbr_setup(self, group, input, output, mapper, vector, hslbc, decal):
+    def stage(self, maps):
         """
-        Create the texture / shader setup.
+        Copy maps (dict map type -> file) from network storage to the cache folder, if enabled.
         """
-        tree = group.node_tree
-
-        shader = self.at(tree.nodes.new("ShaderNodeBsdfPrincipled"), 10, 1)
-        tree.links.new(shader.outputs["BSDF"], self.create_group_output(group, output, "Shader", "Shader"))
-
-        gridPos = 3
-
-        # Diffuse in any case ..
-        diffuse = self.at(self.create_image_node(tree, mapper.diffuse, False, decal), 6, gridPos)
-        tree.links.new(vector.outputs["Vector"], diffuse.inputs["Vector"])
-        if hslbc:
-            self.create_hslbc(group, input, output, 8, gridPos, diffuse.outputs["Color"], [
-                shader.inputs["Base Color"],
-                self.create_group_output(group, output, "Color", "Base Color")
-            ])
-        else:
-            tree.links.new(diffuse.outputs["Color"], shader.inputs["Base Color"])
-            tree.links.new(diffuse.outputs["Color"], self.create_group_output(group, output, "Color", "Base Color"))
-        tree.links.new(diffuse.outputs["Alpha"], self.create_group_output(group, output, "Float", "Alpha"))
-        gridPos -= 2
-
-        # Metallic if available.
-        if mapper.metal != None:
-            metal = self.at(self.create_image_node(tree, mapper.metal, clip = decal), 6, gridPos)
-            tree.links.new(vector.outputs["Vector"], metal.inputs["Vector"])
-            tree.links.new(metal.outputs["Color"], shader.inputs["Metallic"])
-            tree.links.new(metal.outputs["Color"], self.create_group_output(group, output, "Float", "Metallic"))
-            gridPos -= 2
-
-        # Specular if available.
-        if mapper.specular != None:
-            specular = self.at(self.create_image_node(tree, mapper.specular, clip = decal), 6, gridPos)
-            tree.links.new(vector.outputs["Vector"], specular.inputs["Vector"])
-            tree.links.new(specular.outputs["Color"], shader.inputs["Specular"])
-            tree.links.new(specular.outputs["Color"], self.create_group_output(group, output, "Float", "Specular"))
-            gridPos -= 2
+        staged, copied = NW_Staging.stage(maps.values())
+        if copied:
+            self.report({"INFO"}, NW_Staging.text(staged, copied))
 
-        # Create the wet factor to the roughness.
-        wet = self.at(self.create_math_node(tree, "SUBTRACT", True, def1 = 0.0), 9, gridPos)
-        tree.links.new(wet.outputs["Value"], shader.inputs["Roughness"])
-        tree.links.new(wet.outputs["Value"], self.create_group_output(group, output, "Float", "Roughness"))
-        tree.links.new(self.create_group_input(group, input, "Float", "Wet Intensity", 0.0), wet.inputs[1])
-
-        # Prefer roughness if available, otherwise try gloss.
-        if mapper.roughness != None:
-            roughness = self.at(self.create_image_node(tree, mapper.roughness, clip = decal), 6, gridPos)
-            tree.links.new(vector.outputs["Vector"], roughness.inputs["Vector"])
-            tree.links.new(roughness.outputs["Color"], wet.inputs[0])
-        elif mapper.gloss != None:
-            gloss = self.at(self.create_image_node(tree, mapper.gloss, clip = decal), 6, gridPos)
-            tree.links.new(vector.outputs["Vector"], gloss.inputs["Vector"])
-            roughness = self.at(self.create_math_node(tree, "SUBTRACT", def0 = 1.0), 8, gridPos)
-            tree.links.new(gloss.outputs["Color"], roughness.inputs[1])
-            tree.links.new(roughness.outputs["Value"], wet.inputs[0])
-        gridPos -= 2
-
-        # Normal or height if available.
-        if mapper.normal != None:
-            normal = self.at(self.create_image_node(tree, mapper.normal, clip = decal), 6, gridPos)
-            tree.links.new(vector.outputs["Vector"], normal.inputs["Vector"])
-            nvector = self.at(tree.nodes.new("ShaderNodeNormalMap"), 8, gridPos)
-            tree.links.new(normal.outputs["Color"], nvector.inputs["Color"])
-            tree.links.new(nvector.outputs["Normal"], shader.inputs["Normal"])
-            tree.links.new(nvector.outputs["Normal"], self.create_group_output(group, output, "Vector", "Normal"))
-        elif mapper.height != None:
-            height = self.at(self.create_image_node(tree, mapper.height, clip = decal), 6, gridPos)
-            tree.links.new(vector.outputs["Vector"], height.inputs["Vector"])
-            nvector = self.at(tree.nodes.new("ShaderNodeBump"), 8, gridPos)
-            tree.links.new(height.outputs["Color"], nvector.inputs["Height"])
-            tree.links.new(self.create_group_input(group, input, "Float", "Bump Strength", 1.0), nvector.inputs["Strength"])
-            tree.links.new(nvector.outputs["Normal"], shader.inputs["Normal"])
-            tree.links.new(nvector.outputs["Normal"], self.create_group_output(group, output, "Vector", "Normal"))
-        gridPos -= 2
-
-    def create_image_setup(self, group, input, output, texture, vector, hslbc, decal):
+    def derive_normal(self, height):
         """
-        Create the texture / shader setup.
+        Normal map derived from the height map, None if disabled or failed (bump is used then).
         """
-        tree = group.node_tree
-
-        shader = self.at(tree.nodes.new("ShaderNodeBsdfPrincipled"), 15, 1)
-        tree.links.new(shader.outputs["BSDF"], self.create_group_output(group, output, "Shader", "Shader"))
-
-        gridPos = 3
-
-        # Diffuse is set to non-color (for better processing the other maps) and 
-        # a gamma=2.2 node is used to do non-color -> color transformation.
-        diffuse = self.at(self.create_image_node(tree, texture, clip = decal), 6, gridPos)
-        tree.links.new(vector.outputs["Vector"], diffuse.inputs["Vector"])
-        gamma = self.at(tree.nodes.new("ShaderNodeGamma"), 8, gridPos)
-        gamma.inputs["Gamma"].default_value = 2.2 
-        tree.links.new(diffuse.outputs["Color"], gamma.inputs["Color"])
-        if hslbc:
-            self.create_hslbc(group, input, output, 10, gridPos, gamma.outputs["Color"], [
-                shader.inputs["Base Color"],
-                self.create_group_output(group, output, "Color", "Base Color")
-            ])
-        else:
-            tree.links.new(gamma.outputs["Color"], shader.inputs["Base Color"])
-            tree.links.new(gamma.outputs["Color"], self.create_group_output(group, output, "Color", "Base Color"))
-        tree.links.new(diffuse.outputs["Alpha"], self.create_group_output(group, output, "Float", "Alpha"))
-        gridPos -= 2
+        if not self.height_normal or height == None:
+            return None
+        derived = NW_Transcoder.derive_normals([ height ], self.normal_strength, not self.decal).get(height)
+        if not derived:
+            self.report({"WARNING"}, "Can't derive a normal map from %s, using bump instead" % os.path.basename(height))
+        return derived
 
-        # Create the wet factor to the roughness.
-        wet = self.at(self.create_math_node(tree, "SUBTRACT", True, def1 = 0.0), 13, gridPos - 2.5)
-        tree.links.new(wet.outputs["Value"], shader.inputs["Roughness"])
-        tree.links.new(wet.outputs["Value"], self.create_group_output(group, output, "Float", "Roughness"))
-        tree.links.new(self.create_group_input(group, input, "Float", "Wet Intensity", 0.0), wet.inputs[1])
-
-        rouIn, rouOut = self.create_range_selector(group, input, 8, gridPos, "Roughness")
-        tree.links.new(diffuse.outputs["Color"], rouIn)
-        tree.links.new(rouOut, wet.inputs[0])
-        gridPos -= 2
-
-        heiIn, heiOut = self.create_range_selector(group, input, 8, gridPos, "Normal")
-        tree.links.new(diffuse.outputs["Color"], heiIn)
-        tree.links.new(heiOut, self.create_group_output(group, output, "Float", "Height"))
-        bump = self.at(tree.nodes.new("ShaderNodeBump"), 13, gridPos - 2.5)
-        tree.links.new(heiOut, bump.inputs["Height"])
-        tree.links.new(self.create_group_input(group, input, "Float", "Bump Strength", 0.25), bump.inputs["Strength"])
-        tree.links.new(bump.outputs["Normal"], shader.inputs["Normal"])
-        tree.links.new(bump.outputs["Normal"], self.create_group_output(group, output, "Vector", "Normal"))
-        gridPos -= 2
-             
     def execute(self, context):
         """ 
         Called after the user has choosen a texture file, the setup is created in here.
@@ -238,21 +96,53 @@ class NW_GenerateOperator(Operator, NW_NodeUtils):
         if self.mode == "PBR":
             # Automatically map texture names ...
             mapper = NW_TextureMapper(self.filepath)
+            if not mapper.valid:
+                # .. or guess them by content.
+                mapper = NW_MapClassifier.mapper(self.filepath) or mapper
+                if mapper.valid:
+                    self.report({"INFO"}, NW_MapClassifier.text(mapper))
             if not mapper.valid:
                 self.report({"ERROR"}, "Can't find any valid diffuse texture, try to modify valid extensions (nw_texture_mapper.py) ...")
                 return {'CANCELLED'} 
 
+            # Same set and options as before, the group exists already.
+            fingerprint = NW_GroupRegistry.fingerprint(mapper.maps(), self.mode, self.options())
+            if self.reuse(tree, fingerprint):
+                return {'FINISHED'}
+
+            # Validate headers before any data block is created.
+            if not self.preflight(mapper.files()):
+                return {'CANCELLED'}
+
+            # Local copies first, scalar maps with unneeded precision are loaded from 8 bit copies.
+            self.stage(mapper.maps())
+            converted, saved = NW_Transcoder.transcode(mapper.maps())
+            if converted:
+                self.report({"INFO"}, NW_Transcoder.text(converted, saved))
+            heightNormal = self.derive_normal(mapper.height) if mapper.normal == None else None
+
             # Create and fill the group.
             group, input, output = self.create_group(tree, mapper.baseName, 12)
             vector = self.create_texture_mapping(group, input, output, self.add_uv, tree)
-            self.create_pbr_setup(group, input, output, mapper, vector, self.add_hslbc, self.decal)
+            self.create_pbr_setup(group, input, output, mapper, vector, self.add_hslbc, self.decal, heightNormal)
+            NW_TextureWatcher.record(group.node_tree, mapper.maps(), self.mode, self.decal)
+            NW_GroupRegistry.register(group.node_tree, fingerprint)
         elif self.mode == "Image":
             baseName = os.path.splitext(os.path.split(self.filepath)[1])[0]
+            fingerprint = NW_GroupRegistry.fingerprint({ "diffuse": self.filepath }, self.mode, self.options())
+            if self.reuse(tree, fingerprint):
+                return {'FINISHED'}
+            if not self.preflight({ "diffuse": [ self.filepath ] }):
+                return {'CANCELLED'}
+            self.stage({ "diffuse": self.filepath })
+            heightNormal = self.derive_normal(self.filepath)
 
             # Create and fill the group.
             group, input, output = self.create_group(tree, baseName, 17)
             vector = self.create_texture_mapping(group, input, output, self.add_uv, tree)
-            self.create_image_setup(group, input, output, self.filepath, vector, self.add_hslbc, self.decal)
+            self.create_image_setup(group, input, output, self.filepath, vector, self.add_hslbc, self.decal, heightNormal)
+            NW_TextureWatcher.record(group.node_tree, { "diffuse": self.filepath }, self.mode, self.decal)
+            NW_GroupRegistry.register(group.node_tree, fingerprint)
 
         return {'FINISHED'}
         
@@ -0,0 +1,168 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, sys, json, hashlib
+from bpy.types import Operator
+
+from . nw_gc import NW_GarbageCollector
+from . nw_texture_mapper import NW_TextureMapper
+from . nw_transcode import NW_Transcoder
+
+class NW_GroupRegistry:
+    """
+    Generated groups are content addressed: the fingerprint of (source files
+    with size and mtime, mode, options, add-on version) is stored on the tree,
+    generating the same set again instances the existing tree. Duplicates left
+    by older runs are found by their structure.
+    """
+    # Fingerprint -> tree name, rebuilt from the trees when stale.
+    groups = {}
+
+    @staticmethod
+    def version():
+        return list(sys.modules[__package__].bl_info["version"])
+
+    @staticmethod
+    def options(hslbc, uv, decal, normalStrength):
+        """
+        Options a texture setup depends on (normalStrength None without derived normal maps).
+        """
+        return { "add_hslbc": hslbc, "add_uv": uv, "decal": decal, "normal_strength": normalStrength,
+            "transcode": NW_Transcoder.enabled() }
+
+    @staticmethod
+    def fingerprint(maps, mode, options):
+        """
+        Fingerprint of a setup built from maps (dict map type -> file) with options (dict).
+        """
+        sources = []
+        for key, fileName in sorted(maps.items()):
+            for tile, f in sorted(NW_TextureMapper.tileFiles(fileName).items(), key=lambda t: t[0] or 0):
+                try:
+                    st = os.stat(f)
+                    sources.append([ key, os.path.abspath(f), st.st_size, st.st_mtime_ns ])
+                except OSError:
+                    sources.append([ key, os.path.abspath(f), None, None ])
+        data = { "sources": sources, "mode": mode, "options": options, "version": NW_GroupRegistry.version() }
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def find(fingerprint):
+        """
+        Tree generated with the fingerprint or None.
+        """
+        tree = bpy.data.node_groups.get(NW_GroupRegistry.groups.get(fingerprint, ""))
+        if tree and tree.get("nw_fingerprint") == fingerprint:
+            return tree
+
+        # Renamed, removed or loaded with a file ..
+        NW_GroupRegistry.groups = { t["nw_fingerprint"]: t.name for t in bpy.data.node_groups if "nw_fingerprint" in t }
+        return bpy.data.node_groups.get(NW_GroupRegistry.groups.get(fingerprint, ""))
+
+    @staticmethod
+    def known():
+        """
+        Main thread: fingerprints of all generated trees, for worker threads
+        (which must not call find()).
+        """
+        NW_GroupRegistry.groups = { t["nw_fingerprint"]: t.name for t in bpy.data.node_groups if "nw_fingerprint" in t }
+        return set(NW_GroupRegistry.groups)
+
+    @staticmethod
+    def register(tree, fingerprint):
+        tree["nw_fingerprint"] = fingerprint
+        NW_GroupRegistry.groups[fingerprint] = tree.name
+
+    @staticmethod
+    def value(v):
+        if isinstance(v, float):
+            return round(v, 5)
+        try:
+            return [ round(x, 5) for x in v ]
+        except TypeError:
+            return v
+
+    @staticmethod
+    def structure_hash(tree, memo, skip = ()):
+        """
+        Hash of interface, nodes, settings and links of a tree, for groups without
+        fingerprint (nested groups count by their own structure, not by name).
+        Values of group node inputs named in skip are left out (top level only).
+        """
+        if tree in memo and not skip:
+            return memo[tree]
+        value = NW_GroupRegistry.value
+        nodes, links = [], []
+        for n in tree.nodes:
+            image = n.image.get("nw_source", n.image.filepath) if getattr(n, "image", None) else None
+            group = NW_GroupRegistry.structure_hash(n.node_tree, memo) if getattr(n, "node_tree", None) else None
+            defaults = [ value(getattr(s, "default_value", None)) for s in n.inputs if not s.links and not (group and s.name in skip) ]
+            nodes.append([ n.name, n.bl_idname, image, group, getattr(n, "operation", None), getattr(n, "blend_type", None), n.mute, defaults ])
+        for l in tree.links:
+            links.append([ l.from_node.name, l.from_socket.identifier, l.to_node.name, l.to_socket.identifier ])
+        data = {
+            "inputs": [ [ s.bl_socket_idname, s.name, value(getattr(s, "default_value", None)) ] for s in tree.inputs ],
+            "outputs": [ [ s.bl_socket_idname, s.name ] for s in tree.outputs ],
+            "nodes": sorted(nodes, key=str),
+            "links": sorted(links)
+        }
+        digest = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        if not skip:
+            memo[tree] = digest
+        return digest
+
+    @staticmethod
+    def duplicates():
+        """
+        Generated trees with the same structure (groups generated with the same
+        fingerprint, or before fingerprints existed, from the same sources and
+        options), list of lists, the tree to keep first. Groups patched by the
+        texture watcher differ in structure and aren't merged.
+        """
+        memo, sets = {}, {}
+        for tree in bpy.data.node_groups:
+            if NW_GarbageCollector.is_generated(tree):
+                sets.setdefault(NW_GroupRegistry.structure_hash(tree, memo), []).append(tree)
+        # Keep the original name (no .001), then the most used one.
+        return [ sorted(trees, key=lambda t: (len(t.name), -t.users, t.name)) for trees in sets.values() if len(trees) > 1 ]
+
+    @staticmethod
+    def merge():
+        """
+        Remap all users of duplicates to the tree kept and remove the duplicates,
+        returns the number of removed trees.
+        """
+        removed = 0
+        for keep, *others in NW_GroupRegistry.duplicates():
+            for tree in others:
+                if "nw_fingerprint" in tree and "nw_fingerprint" not in keep:
+                    keep["nw_fingerprint"] = tree["nw_fingerprint"]
+                tree.user_remap(keep)
+                bpy.data.node_groups.remove(tree)
+                removed += 1
+        NW_GroupRegistry.groups = {}
+        return removed
+
+class NW_MergeGroupsOperator(Operator):
+    bl_idname = "material.nw_merge_groups_op"
+    bl_label = "Merge Duplicate Groups"
+    bl_description = "Replace identical generated groups (same sources and options) by a single group"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        removed = NW_GroupRegistry.merge()
+        self.report({"INFO"}, "%d duplicate groups merged." % removed)
+        return{'FINISHED'}
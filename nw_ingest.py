@@ -0,0 +1,262 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, time
+
+from . nw_texture_mapper import NW_TextureMapper
+from . nw_map_classifier import NW_MapClassifier
+from . nw_material_builder import NW_MaterialBuilder
+from . nw_node_utils import DummyGroup
+from . nw_texture_watcher import NW_TextureWatcher
+from . nw_preferences import NW_Preferences
+from . nw_preflight import NW_Preflight
+
+class NW_FolderSnapshot:
+    """
+    Incremental view of a directory tree. Only folders whose mtime changed are
+    listed again (os.scandir), unchanged folders cost a single stat.
+    """
+    def __init__(self, root):
+        self.root = root
+        # Folder -> (mtime, { file name: (size, mtime) }, [ sub folders ]).
+        self.folders = {}
+
+    def scan_folder(self, folder):
+        files, subFolders = {}, []
+        with os.scandir(folder) as entries:
+            for e in entries:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        subFolders.append(e.path)
+                    elif e.is_file():
+                        st = e.stat()
+                        files[e.name] = (st.st_size, st.st_mtime)
+                except OSError:
+                    pass # Vanished while scanning.
+        return files, subFolders
+
+    def update(self):
+        """
+        Refresh the snapshot, returns the set of added or modified files (full paths).
+        Files modified in place don't touch the folder mtime, see stat_files().
+        """
+        changed = set()
+        seen = set()
+        stack = [ self.root ]
+        while stack:
+            folder = stack.pop()
+            seen.add(folder)
+            try:
+                mtime = os.stat(folder).st_mtime
+            except OSError:
+                continue
+
+            old = self.folders.get(folder)
+            if old and old[0] == mtime:
+                stack += old[2]
+                continue
+
+            try:
+                files, subFolders = self.scan_folder(folder)
+            except OSError:
+                continue
+            oldFiles = old[1] if old else {}
+            for name, st in files.items():
+                if oldFiles.get(name) != st:
+                    changed.add(os.path.join(folder, name))
+            self.folders[folder] = (mtime, files, subFolders)
+            stack += subFolders
+
+        for folder in set(self.folders) - seen:
+            del self.folders[folder]
+        return changed
+
+    def stat_files(self, fileNames):
+        """
+        Stat single files (e.g. still being copied), updates the snapshot and
+        returns the modified ones.
+        """
+        changed = set()
+        for fileName in fileNames:
+            folder, name = os.path.split(fileName)
+            entry = self.folders.get(folder)
+            try:
+                st = os.stat(fileName)
+                st = (st.st_size, st.st_mtime)
+            except OSError:
+                st = None
+            if entry and entry[1].get(name) != st:
+                if st:
+                    entry[1][name] = st
+                else:
+                    entry[1].pop(name, None)
+                changed.add(fileName)
+        return changed
+
+    def files(self, folder):
+        entry = self.folders.get(folder)
+        return [ os.path.join(folder, n) for n in entry[1] ] if entry else []
+
+class NW_FolderIngest(NW_MaterialBuilder):
+    """
+    Watches a drop folder and generates PBR groups for new texture sets. Each
+    set is written to its own .blend in the library folder, so adding a set
+    costs the same, no matter how large the library already is. Sets are
+    ingested once none of their files changed for the settle time (copies
+    in progress).
+    """
+    interval = 2.0
+
+    # Seconds of ingesting per timer call (at least one set) and the interval
+    # while due sets are left, so a large backlog doesn't block the UI.
+    time_slice = 0.1
+    busy_interval = 0.1
+
+    # The running instance (one drop folder at a time).
+    active = None
+
+    def __init__(self, directory, library, settle):
+        NW_MaterialBuilder.__init__(self)
+        self.snapshot = NW_FolderSnapshot(directory)
+        self.library = library
+        self.settle = settle
+        # (folder, mapper baseName) -> time of the last change seen.
+        self.pending = {}
+        self.ingested = 0
+        self.errors = 0
+
+    def library_file(self, folder, baseName):
+        """
+        Library .blend of a set, sub folders of the drop folder are mirrored
+        (same named sets in different folders don't overwrite each other).
+        """
+        relative = os.path.relpath(folder, self.snapshot.root)
+        return os.path.normpath(os.path.join(self.library, relative, bpy.path.clean_name(baseName) + ".blend"))
+
+    def track(self, changed):
+        now = time.time()
+        for fileName in changed:
+            if os.path.splitext(fileName)[1].lower() not in NW_TextureMapper.image_ext:
+                continue
+            # Files without known ending may belong to a set guessed by content.
+            match = NW_TextureMapper.classify(fileName)
+            baseName = match[0].strip("_") if match else NW_MapClassifier.name(fileName)
+            self.pending[(os.path.dirname(fileName), baseName)] = now
+
+    def tick(self):
+        """
+        One poll, proportional to changed folders and pending sets. Due sets
+        are ingested (oldest first) for time_slice, returns True if due sets
+        are left.
+        """
+        pendingFiles = []
+        for folder, baseName in self.pending:
+            pendingFiles += [ f for f in self.snapshot.files(folder) if os.path.basename(f).startswith(baseName) ]
+        self.track(self.snapshot.update() | self.snapshot.stat_files(pendingFiles))
+
+        now = time.time()
+        start = time.perf_counter()
+        for key, changed in sorted(self.pending.items(), key=lambda p: p[1]):
+            if now - changed < self.settle:
+                continue
+            if time.perf_counter() - start > self.time_slice:
+                return True
+            del self.pending[key]
+
+            folder, baseName = key
+            files = self.snapshot.files(folder)
+            mappers = [ m for m in NW_TextureMapper.scanSets(files) if m.baseName == baseName ]
+            if not mappers:
+                groups = NW_MapClassifier.groups(files)
+                mappers = NW_MapClassifier.build({ key: groups[key] }) if key in groups else []
+            for mapper in mappers:
+                self.ingest(mapper)
+        return False
+
+    def ingest(self, mapper):
+        """
+        Generate the group and write it (with its images) to the library.
+        """
+        errors = [ message for level, message in NW_Preflight.check_sets([ mapper.files() ])[0] if level == "ERROR" ]
+        if errors:
+            print("Node Wizard: can't ingest %s: %s" % (mapper.baseName, "; ".join(errors)))
+            self.errors += 1
+            return
+
+        # Any failure (image not loadable, UDIM tiles gone, ..) only fails this
+        # set, the tree is never left in the open file and the timer keeps running.
+        tree = None
+        try:
+            tree, input, output = self.create_group_tree(mapper.baseName, 12)
+            group = DummyGroup(tree)
+            vector = self.create_texture_mapping(group, input, output, False, None)
+            self.create_pbr_setup(group, input, output, mapper, vector, False, False)
+            NW_TextureWatcher.record(tree, mapper.maps(), "PBR", False)
+
+            # Images are written along with the tree (dependencies), Blender
+            # replaces existing files only after writing completed.
+            fileName = self.library_file(mapper.path, mapper.baseName)
+            os.makedirs(os.path.dirname(fileName), exist_ok=True)
+            bpy.data.libraries.write(fileName, { tree }, fake_user=True, path_remap="ABSOLUTE")
+            self.ingested += 1
+        except Exception as e:
+            print("Node Wizard: can't ingest %s: %s" % (mapper.baseName, e))
+            self.errors += 1
+        finally:
+            if tree:
+                images = set(n.image for n in tree.nodes if getattr(n, "image", None))
+                bpy.data.node_groups.remove(tree)
+                for image in images:
+                    bpy.data.images.remove(image)
+
+    def status(self):
+        return "Ingest: %d sets written, %d pending, %d failed" % (self.ingested, len(self.pending), self.errors)
+
+    @staticmethod
+    def poll():
+        """
+        Timer callback, follows the preferences (drop folder, library, on/off).
+        """
+        prefs = NW_Preferences.get()
+        if not prefs or not prefs.ingest_enabled or not prefs.ingest_directory or not prefs.ingest_library:
+            NW_FolderIngest.active = None
+            return NW_FolderIngest.interval
+
+        directory = bpy.path.abspath(prefs.ingest_directory)
+        library = bpy.path.abspath(prefs.ingest_library)
+        active = NW_FolderIngest.active
+        if not active or active.snapshot.root != directory or active.library != library:
+            active = NW_FolderIngest.active = NW_FolderIngest(directory, library, prefs.ingest_settle)
+            # Sets already in the library are not generated again (sets to
+            # guess by content only by name, they are classified when due).
+            active.snapshot.update()
+            files = [ f for folder in active.snapshot.folders for f in active.snapshot.files(folder) ]
+            keys = [ (m.path, m.baseName) for m in NW_TextureMapper.scanSets(files) ] + list(NW_MapClassifier.groups(files))
+            for folder, baseName in keys:
+                if not os.path.exists(active.library_file(folder, baseName)):
+                    active.pending[(folder, baseName)] = 0.0
+
+        active.settle = prefs.ingest_settle
+        return NW_FolderIngest.busy_interval if active.tick() else NW_FolderIngest.interval
+
+    @staticmethod
+    def enable(state):
+        registered = bpy.app.timers.is_registered(NW_FolderIngest.poll)
+        if state and not registered:
+            bpy.app.timers.register(NW_FolderIngest.poll, first_interval=NW_FolderIngest.interval, persistent=True)
+        elif not state and registered:
+            bpy.app.timers.unregister(NW_FolderIngest.poll)
+            NW_FolderIngest.active = None
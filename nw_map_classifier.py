@@ -0,0 +1,200 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, json
+
+from . nw_cache import NW_Cache
+from . nw_preflight import NW_Preflight
+from . nw_texture_mapper import NW_TextureMapper
+from . nw_transcode import NW_Transcoder
+
+class NW_MapClassifier:
+    """
+    Fallback for texture sets whose file names don't tell the map types: the
+    types are guessed from pixel statistics (see map_stats() in
+    nw_transcode_worker.py), computed by the background Blender workers and
+    cached by file content. Gloss and specular maps can't be told from
+    roughness and metal maps by content, they aren't guessed.
+    """
+    # Longest side of the downsampled copy the statistics are computed on.
+    size = 64
+
+    # Lower scores are no match (a diffuse map is always picked).
+    min_score = 0.2
+
+    # Characters between set name and the rest of the file name (e.g. Bricks_A.png).
+    separators = "_-. "
+
+    @staticmethod
+    def name(fileName):
+        """
+        Set name of a file without known ending: the core name up to the last
+        separator, the folder name if there is none.
+        """
+        baseName = NW_TextureMapper.splitTile(fileName)[0]
+        cut = max(baseName.rfind(c) for c in NW_MapClassifier.separators)
+        name = baseName[:cut].strip(NW_MapClassifier.separators) if cut > 0 else ""
+        return name or os.path.basename(os.path.dirname(fileName))
+
+    @staticmethod
+    def groups(files, minimum = 2):
+        """
+        Group the image files the names don't classify to candidate sets, dict
+        (folder, set name) -> list of files (tiles as <UDIM> file). Groups with
+        less than minimum files or the name of a name matched set are left out.
+        """
+        groups, matched = {}, set()
+        for fileName in files:
+            if os.path.splitext(fileName)[1].lower() not in NW_TextureMapper.image_ext:
+                continue
+            folder = os.path.dirname(fileName)
+            match = NW_TextureMapper.classify(fileName)
+            if match:
+                matched.add((folder, match[0].strip(NW_MapClassifier.separators)))
+                continue
+            group = groups.setdefault((folder, NW_MapClassifier.name(fileName)), [])
+            fileName = NW_TextureMapper.splitTile(fileName)[1]
+            if fileName not in group:
+                group.append(fileName)
+        return { key: sorted(group) for key, group in groups.items() if key not in matched and len(group) >= minimum }
+
+    @staticmethod
+    def stats(files):
+        """
+        Statistics of local files (all at once in the worker processes), dict
+        file -> dict, failed files are missing.
+        """
+        targets, jobs = {}, []
+        for fileName in files:
+            target, hit = NW_Cache.lookup("%s_mstats%d" % (NW_Cache.source_hash(fileName), NW_MapClassifier.size), ".json")
+            if not hit and target not in [ j["target"] for j in jobs ]:
+                jobs.append({ "kind": "stats", "source": NW_Cache.resolve(fileName), "target": target, "size": NW_MapClassifier.size })
+            targets[fileName] = target
+        NW_Cache.save_hashes()
+        if jobs and bpy.app.binary_path:
+            NW_Transcoder.run_jobs(jobs)
+
+        results = {}
+        for fileName, target in targets.items():
+            try:
+                with open(target) as f:
+                    results[fileName] = json.load(f)
+            except (OSError, ValueError):
+                pass
+        return results
+
+    @staticmethod
+    def scores(stats, bitDepth):
+        """
+        Score (0..1) per map type for the statistics of a file. Normal maps
+        average to (0.5, 0.5, >0.5) and decode to unit vectors, metal maps are
+        gray and mostly black or white, roughness and height maps gray with
+        intermediate values (more than 8 bits per channel hint a height map).
+        """
+        clamp = lambda v: min(1.0, max(0.0, v))
+        r, g, b = stats["mean"]
+        normal = clamp(1.0 - 4.0 * (abs(r - 0.5) + abs(g - 0.5))) * clamp(3.0 * (b - 0.5)) * clamp(1.0 - 4.0 * stats["normal"])
+        gray = 1.0 - clamp(20.0 * stats["color"])
+        scalar = gray * (1.0 - stats["binary"])
+        deep = bitDepth > 8
+        return {
+            "diffuse": clamp(10.0 * stats["color"]) * (1.0 - normal),
+            "normal": normal,
+            "metal": gray * clamp(5.0 * (stats["binary"] - 0.8)),
+            "roughness": scalar * (0.5 if deep else 1.0),
+            "height": scalar * (1.0 if deep else 0.5)
+        }
+
+    @staticmethod
+    def assign(scored):
+        """
+        Assign map types to files (dict file -> scores), best scores first, each
+        file and type once. Returns dict map type -> file.
+        """
+        pairs = sorted(((s, key, f) for f, scores in scored.items() for key, s in scores.items()), reverse=True)
+        maps, used = {}, set()
+        for score, key, fileName in pairs:
+            if score >= NW_MapClassifier.min_score and key not in maps and fileName not in used:
+                maps[key] = fileName
+                used.add(fileName)
+
+        # Check if a diffuse map was found, else the best candidate left (or taken from scalar maps, e.g. gray stone).
+        if "diffuse" not in maps:
+            left = [ f for f in scored if f not in used ] or [ f for f in scored if f != maps.get("normal") ]
+            if left:
+                fileName = max(left, key=lambda f: (scored[f]["diffuse"], -scored[f]["normal"]))
+                maps = { key: f for key, f in maps.items() if f != fileName }
+                maps["diffuse"] = fileName
+        return maps
+
+    @staticmethod
+    def build(groups):
+        """
+        Guess the maps of all groups (see groups()) at once, returns mappers of
+        the valid sets. Remote files (see NW_TextureMapper.sources) are
+        downloaded for the statistics, the mappers keep their URLs.
+        """
+        first = { f: next(iter(NW_TextureMapper.tileFiles(f).values()), f) for group in groups.values() for f in group }
+        remote = {}
+        for f in first.values():
+            s = NW_TextureMapper.source(f)
+            if s:
+                remote.setdefault(s, set()).add(f)
+        local = {}
+        for s, files in remote.items():
+            local.update(s.fetch(files))
+        first = { f: local.get(t, t) for f, t in first.items() if not NW_TextureMapper.source(local.get(t, t)) }
+
+        stats = NW_MapClassifier.stats(set(first.values()))
+        infos = NW_Preflight.read_all(stats.keys())
+        mappers = []
+        for (folder, name), group in sorted(groups.items()):
+            scored = { f: NW_MapClassifier.scores(stats[first[f]], infos[first[f]].bitDepth) for f in group if first.get(f) in stats }
+            mapper = NW_TextureMapper.fromMaps(folder, name, NW_MapClassifier.assign(scored))
+            if mapper.valid:
+                mappers.append(mapper)
+        return mappers
+
+    @staticmethod
+    def sets(files):
+        """
+        Mappers of the sets scanSets() doesn't find in files, guessed by content.
+        """
+        groups = NW_MapClassifier.groups(files)
+        return NW_MapClassifier.build(groups) if groups else []
+
+    @staticmethod
+    def mapper(fileName):
+        """
+        Mapper of the set the selected file belongs to, guessed by content: the
+        files with the same set name, all unmatched images of the folder if there
+        is no other. None if there is no set.
+        """
+        folder = os.path.dirname(fileName)
+        try:
+            files = [ NW_TextureMapper.join(folder, f) for f in NW_TextureMapper.listdir(folder) ]
+        except OSError:
+            return None
+        groups = NW_MapClassifier.groups(files, 1)
+        key = (folder, NW_MapClassifier.name(fileName))
+        if len(groups.get(key, [])) < 2:
+            groups = { key: sorted(f for group in groups.values() for f in group) }
+        mappers = NW_MapClassifier.build(groups)
+        return mappers[0] if mappers else None
+
+    @staticmethod
+    def text(mapper):
+        return "Map types guessed by content: %s" % ", ".join("%s %s" % (key, os.path.basename(f)) for key, f in sorted(mapper.maps().items()))
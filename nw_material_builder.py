@@ -0,0 +1,346 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy
+
+from . nw_node_utils import NW_NodeUtils, DummyGroup
+from . nw_group_registry import NW_GroupRegistry
+
+class NW_MaterialBuilder(NW_NodeUtils):
+    """
+    Builds the texture based material setups. Kept apart from the operator,
+    so the setups can be created (and patched) from outside of an operator call.
+    """
+
+    def create_texture_mapping(self, group, input, output, vectorInput, parentTree, aspect = False):
+        """
+        Create the texture mapping setup, aspect adds an "Aspect" input scaling Y
+        relative to X (atlas regions aren't square). Without parentTree (tree only,
+        no instance) the vector input is left unconnected.
+        """
+        tree = group.node_tree
+
+        if not vectorInput:
+            texCoord = self.at(tree.nodes.new("ShaderNodeTexCoord"), 0, 2)
+
+        separate = self.at(tree.nodes.new("ShaderNodeSeparateXYZ"), 2, 1)
+        scaleX = self.at(self.create_math_node(tree, "MULTIPLY", def1 = 1.0), 3, 1)
+        scaleY = self.at(self.create_math_node(tree, "MULTIPLY", def1 = 1.0), 3, 0)
+        offsetX = self.at(self.create_math_node(tree, "ADD", def1 = 0.0), 4, 1)
+        offsetY = self.at(self.create_math_node(tree, "ADD", def1 = 0.0), 4, 0)
+        combine = self.at(tree.nodes.new("ShaderNodeCombineXYZ"), 5, 0)
+
+        if not vectorInput:
+            tree.links.new(texCoord.outputs["UV"], separate.inputs["Vector"])
+        else:
+            tree.links.new(self.create_group_input(group, input, "Vector", "Vector"), separate.inputs["Vector"])
+            if parentTree:
+                self.create_parent_mapping(group, parentTree)
+
+        tree.links.new(separate.outputs["X"], scaleX.inputs[0])
+        tree.links.new(separate.outputs["Y"], scaleY.inputs[0])
+        tree.links.new(scaleX.outputs["Value"], offsetX.inputs[0])
+        tree.links.new(scaleY.outputs["Value"], offsetY.inputs[0])
+        tree.links.new(offsetX.outputs["Value"], combine.inputs["X"])
+        tree.links.new(offsetY.outputs["Value"], combine.inputs["Y"])
+
+        scale = self.create_group_input(group, input, "Float", "Scale", 1.0)
+        tree.links.new(scale, scaleX.inputs[1])
+        tree.links.new(self.create_group_input(group, input, "Float", "Offset X", 0.0), offsetX.inputs[1])
+        tree.links.new(self.create_group_input(group, input, "Float", "Offset Y", 0.0), offsetY.inputs[1])
+        if aspect:
+            ratio = self.at(self.create_math_node(tree, "MULTIPLY", def1 = 1.0), 2, -0.5)
+            tree.links.new(scale, ratio.inputs[0])
+            tree.links.new(self.create_group_input(group, input, "Float", "Aspect", 1.0), ratio.inputs[1])
+            tree.links.new(ratio.outputs["Value"], scaleY.inputs[1])
+        else:
+            tree.links.new(scale, scaleY.inputs[1])
+
+        return combine
+
+    def create_parent_mapping(self, group, parentTree):
+        """
+        Feed the vector input of group by UV coordinates and a mapping node in parentTree.
+        """
+        ptx = parentTree.nodes.new("ShaderNodeTexCoord")
+        ptx.location.x = group.location.x - 3 * self.gridSizeX
+        pm = parentTree.nodes.new("ShaderNodeMapping")
+        pm.location.x = group.location.x - 2 * self.gridSizeX
+        parentTree.links.new(ptx.outputs["UV"], pm.inputs["Vector"])
+        parentTree.links.new(pm.outputs["Vector"], group.inputs["Vector"])
+
+    def reuse_group(self, tree, fingerprint, vectorInput):
+        """
+        Instance the group generated before with the same fingerprint, returns the group node or None.
+        """
+        existing = NW_GroupRegistry.find(fingerprint)
+        if not existing:
+            return None
+        group = tree.nodes.new("ShaderNodeGroup")
+        group.node_tree = existing
+        if vectorInput:
+            self.create_parent_mapping(group, tree)
+        return group
+
+    def create_hslbc(self, group, input, output, gridX, gridY, colorSocket, outputSockets):
+        """
+        Plugs a HSL and Brightness/Contrast-Node between colorSocket and outputSockets.
+        """
+        tree = group.node_tree
+        hsl = self.at(tree.nodes.new("ShaderNodeHueSaturation"), gridX, gridY)
+        bc = self.at(tree.nodes.new("ShaderNodeBrightContrast"), gridX + 0.5, gridY - 0.5)
+
+        tree.links.new(self.create_group_input(group, input, "Float", "Hue", 0.5), hsl.inputs["Hue"])
+        tree.links.new(self.create_group_input(group, input, "Float", "Saturation", 1.0), hsl.inputs["Saturation"])
+        tree.links.new(self.create_group_input(group, input, "Float", "HSL-Value", 1.0), hsl.inputs["Value"])
+
+        tree.links.new(self.create_group_input(group, input, "Float", "Brightness", 0.0), bc.inputs["Bright"])
+        tree.links.new(self.create_group_input(group, input, "Float", "Contrast", 0.0), bc.inputs["Contrast"])
+
+        tree.links.new(colorSocket, hsl.inputs["Color"])
+        tree.links.new(hsl.outputs["Color"], bc.inputs["Color"])
+        for s in outputSockets:
+            tree.links.new(bc.outputs["Color"], s)
+
+    def create_pbr_setup(self, group, input, output, mapper, vector, hslbc, decal, heightNormal = None):
+        """
+        Create the texture / shader setup, heightNormal is a normal map derived
+        from the height map (used instead of a bump node).
+        """
+        tree = group.node_tree
+
+        shader = self.at(tree.nodes.new("ShaderNodeBsdfPrincipled"), 10, 1)
+        tree.links.new(shader.outputs["BSDF"], self.create_group_output(group, output, "Shader", "Shader"))
+
+        gridPos = 3
+
+        # Diffuse in any case ..
+        diffuse = self.at(self.create_image_node(tree, mapper.diffuse, False, decal), 6, gridPos)
+        tree.links.new(vector.outputs["Vector"], diffuse.inputs["Vector"])
+        if hslbc:
+            self.create_hslbc(group, input, output, 8, gridPos, diffuse.outputs["Color"], [
+                shader.inputs["Base Color"],
+                self.create_group_output(group, output, "Color", "Base Color")
+            ])
+        else:
+            tree.links.new(diffuse.outputs["Color"], shader.inputs["Base Color"])
+            tree.links.new(diffuse.outputs["Color"], self.create_group_output(group, output, "Color", "Base Color"))
+        tree.links.new(diffuse.outputs["Alpha"], self.create_group_output(group, output, "Float", "Alpha"))
+        gridPos -= 2
+
+        # Metallic if available.
+        if mapper.metal != None:
+            self.create_channel_map(group, output, shader, vector, mapper.metal, "Metallic", gridPos, decal)
+            gridPos -= 2
+
+        # Specular if available.
+        if mapper.specular != None:
+            self.create_channel_map(group, output, shader, vector, mapper.specular, "Specular", gridPos, decal)
+            gridPos -= 2
+
+        # Create the wet factor to the roughness.
+        wet = self.at(self.create_math_node(tree, "SUBTRACT", True, def1 = 0.0), 9, gridPos)
+        tree.links.new(wet.outputs["Value"], shader.inputs["Roughness"])
+        tree.links.new(wet.outputs["Value"], self.create_group_output(group, output, "Float", "Roughness"))
+        tree.links.new(self.create_group_input(group, input, "Float", "Wet Intensity", 0.0), wet.inputs[1])
+
+        self.create_roughness_map(group, wet, vector, mapper, gridPos, decal)
+        gridPos -= 2
+
+        # Normal or height if available.
+        self.create_normal_map(group, input, output, shader, vector, mapper, gridPos, decal, heightNormal)
+        gridPos -= 2
+
+    def create_channel_map(self, group, output, shader, vector, fileName, name, gridY, decal):
+        """
+        Create a image node for a scalar map and plug it to the shader input and
+        a group output, both named as given.
+        """
+        tree = group.node_tree
+        node = self.at(self.create_image_node(tree, fileName, clip = decal), 6, gridY)
+        tree.links.new(vector.outputs["Vector"], node.inputs["Vector"])
+        tree.links.new(node.outputs["Color"], shader.inputs[name])
+        tree.links.new(node.outputs["Color"], self.create_group_output(group, output, "Float", name))
+        return node
+
+    def create_roughness_map(self, group, wet, vector, mapper, gridY, decal):
+        """
+        Plug roughness (or inverted gloss) map to the wet factor, returns the image node if any.
+        """
+        tree = group.node_tree
+
+        # Prefer roughness if available, otherwise try gloss.
+        if mapper.roughness != None:
+            roughness = self.at(self.create_image_node(tree, mapper.roughness, clip = decal), 6, gridY)
+            tree.links.new(vector.outputs["Vector"], roughness.inputs["Vector"])
+            tree.links.new(roughness.outputs["Color"], wet.inputs[0])
+            return roughness
+        elif mapper.gloss != None:
+            gloss = self.at(self.create_image_node(tree, mapper.gloss, clip = decal), 6, gridY)
+            tree.links.new(vector.outputs["Vector"], gloss.inputs["Vector"])
+            roughness = self.at(self.create_math_node(tree, "SUBTRACT", def0 = 1.0), 8, gridY)
+            tree.links.new(gloss.outputs["Color"], roughness.inputs[1])
+            tree.links.new(roughness.outputs["Value"], wet.inputs[0])
+            return gloss
+        return None
+
+    def create_normal_map(self, group, input, output, shader, vector, mapper, gridY, decal, heightNormal = None):
+        """
+        Create normal map setup (or bump setup if only a height map is available,
+        normal map setup again if it was derived from the height map as heightNormal),
+        returns the image node if any.
+        """
+        tree = group.node_tree
+
+        if mapper.normal != None:
+            normal = self.at(self.create_image_node(tree, mapper.normal, clip = decal), 6, gridY)
+            tree.links.new(vector.outputs["Vector"], normal.inputs["Vector"])
+            nvector = self.at(tree.nodes.new("ShaderNodeNormalMap"), 8, gridY)
+            tree.links.new(normal.outputs["Color"], nvector.inputs["Color"])
+            tree.links.new(nvector.outputs["Normal"], shader.inputs["Normal"])
+            tree.links.new(nvector.outputs["Normal"], self.create_group_output(group, output, "Vector", "Normal"))
+            return normal
+        elif mapper.height != None and heightNormal:
+            normal = self.at(self.create_image_node(tree, heightNormal, clip = decal), 6, gridY)
+            tree.links.new(vector.outputs["Vector"], normal.inputs["Vector"])
+            nvector = self.at(tree.nodes.new("ShaderNodeNormalMap"), 8, gridY)
+            tree.links.new(normal.outputs["Color"], nvector.inputs["Color"])
+            tree.links.new(self.create_group_input(group, input, "Float", "Normal Strength", 1.0), nvector.inputs["Strength"])
+            tree.links.new(nvector.outputs["Normal"], shader.inputs["Normal"])
+            tree.links.new(nvector.outputs["Normal"], self.create_group_output(group, output, "Vector", "Normal"))
+            return normal
+        elif mapper.height != None:
+            height = self.at(self.create_image_node(tree, mapper.height, clip = decal), 6, gridY)
+            tree.links.new(vector.outputs["Vector"], height.inputs["Vector"])
+            nvector = self.at(tree.nodes.new("ShaderNodeBump"), 8, gridY)
+            tree.links.new(height.outputs["Color"], nvector.inputs["Height"])
+            tree.links.new(self.create_group_input(group, input, "Float", "Bump Strength", 1.0), nvector.inputs["Strength"])
+            tree.links.new(nvector.outputs["Normal"], shader.inputs["Normal"])
+            tree.links.new(nvector.outputs["Normal"], self.create_group_output(group, output, "Vector", "Normal"))
+            return height
+        return None
+
+    def patch_pbr_setup(self, tree, mapper, known, decal):
+        """
+        Add map types found by mapper, but not part of known (the map types the
+        tree was generated with), to an existing PBR setup without rebuilding it.
+        Returns the list of added map types.
+        """
+        shaders = [ n for n in tree.nodes if n.type == "BSDF_PRINCIPLED" ]
+        inputs = [ n for n in tree.nodes if n.type == "GROUP_INPUT" ]
+        outputs = [ n for n in tree.nodes if n.type == "GROUP_OUTPUT" ]
+        if not shaders or not inputs or not outputs:
+            return []
+        shader, input, output = shaders[0], inputs[0], outputs[0]
+        group = DummyGroup(tree)
+
+        # All image nodes share the same texture mapping.
+        vector = None
+        for n in tree.nodes:
+            if n.type == "TEX_IMAGE" and n.inputs["Vector"].links:
+                vector = n.inputs["Vector"].links[0].from_node
+                break
+        if not vector:
+            return []
+
+        # New nodes are appended below the existing ones.
+        self.baseY = min(n.location.y for n in tree.nodes) - self.gridSizeY
+        gridPos = 0
+        added = []
+
+        for name, key in [ ("Metallic", "metal"), ("Specular", "specular") ]:
+            if getattr(mapper, key) != None and key not in known:
+                self.create_channel_map(group, output, shader, vector, getattr(mapper, key), name, gridPos, decal)
+                added.append(key)
+                gridPos -= 2
+
+        # Roughness and normal slots are only filled, if nothing is connected yet.
+        wet = shader.inputs["Roughness"].links[0].from_node if shader.inputs["Roughness"].links else None
+        if wet and not wet.inputs[0].links:
+            node = self.create_roughness_map(group, wet, vector, mapper, gridPos, decal)
+            if node:
+                added.append("roughness" if mapper.roughness != None else "gloss")
+                gridPos -= 2
+
+        if not shader.inputs["Normal"].links:
+            node = self.create_normal_map(group, input, output, shader, vector, mapper, gridPos, decal)
+            if node:
+                added.append("normal" if mapper.normal != None else "height")
+                gridPos -= 2
+
+        self.baseY = 0
+        return added
+
+    def create_image_setup(self, group, input, output, texture, vector, hslbc, decal, heightNormal = None):
+        """
+        Create the texture / shader setup, heightNormal is a normal map derived
+        from the texture (used instead of a bump node).
+        """
+        tree = group.node_tree
+
+        shader = self.at(tree.nodes.new("ShaderNodeBsdfPrincipled"), 15, 1)
+        tree.links.new(shader.outputs["BSDF"], self.create_group_output(group, output, "Shader", "Shader"))
+
+        gridPos = 3
+
+        # Diffuse is set to non-color (for better processing the other maps) and 
+        # a gamma=2.2 node is used to do non-color -> color transformation.
+        diffuse = self.at(self.create_image_node(tree, texture, clip = decal), 6, gridPos)
+        tree.links.new(vector.outputs["Vector"], diffuse.inputs["Vector"])
+        gamma = self.at(tree.nodes.new("ShaderNodeGamma"), 8, gridPos)
+        gamma.inputs["Gamma"].default_value = 2.2 
+        tree.links.new(diffuse.outputs["Color"], gamma.inputs["Color"])
+        if hslbc:
+            self.create_hslbc(group, input, output, 10, gridPos, gamma.outputs["Color"], [
+                shader.inputs["Base Color"],
+                self.create_group_output(group, output, "Color", "Base Color")
+            ])
+        else:
+            tree.links.new(gamma.outputs["Color"], shader.inputs["Base Color"])
+            tree.links.new(gamma.outputs["Color"], self.create_group_output(group, output, "Color", "Base Color"))
+        tree.links.new(diffuse.outputs["Alpha"], self.create_group_output(group, output, "Float", "Alpha"))
+        gridPos -= 2
+
+        # Create the wet factor to the roughness.
+        wet = self.at(self.create_math_node(tree, "SUBTRACT", True, def1 = 0.0), 13, gridPos - 2.5)
+        tree.links.new(wet.outputs["Value"], shader.inputs["Roughness"])
+        tree.links.new(wet.outputs["Value"], self.create_group_output(group, output, "Float", "Roughness"))
+        tree.links.new(self.create_group_input(group, input, "Float", "Wet Intensity", 0.0), wet.inputs[1])
+
+        rouIn, rouOut = self.create_range_selector(group, input, 8, gridPos, "Roughness")
+        tree.links.new(diffuse.outputs["Color"], rouIn)
+        tree.links.new(rouOut, wet.inputs[0])
+        gridPos -= 2
+
+        if heightNormal:
+            # The normal map is derived from the whole texture, a range selector
+            # would only change the Height output.
+            tree.links.new(diffuse.outputs["Color"], self.create_group_output(group, output, "Float", "Height"))
+            normal = self.at(self.create_image_node(tree, heightNormal, clip = decal), 10, gridPos - 2)
+            tree.links.new(vector.outputs["Vector"], normal.inputs["Vector"])
+            nvector = self.at(tree.nodes.new("ShaderNodeNormalMap"), 13, gridPos - 2.5)
+            tree.links.new(normal.outputs["Color"], nvector.inputs["Color"])
+            tree.links.new(self.create_group_input(group, input, "Float", "Normal Strength", 0.25), nvector.inputs["Strength"])
+        else:
+            heiIn, heiOut = self.create_range_selector(group, input, 8, gridPos, "Normal")
+            tree.links.new(diffuse.outputs["Color"], heiIn)
+            tree.links.new(heiOut, self.create_group_output(group, output, "Float", "Height"))
+            nvector = self.at(tree.nodes.new("ShaderNodeBump"), 13, gridPos - 2.5)
+            tree.links.new(heiOut, nvector.inputs["Height"])
+            tree.links.new(self.create_group_input(group, input, "Float", "Bump Strength", 0.25), nvector.inputs["Strength"])
+        tree.links.new(nvector.outputs["Normal"], shader.inputs["Normal"])
+        tree.links.new(nvector.outputs["Normal"], self.create_group_output(group, output, "Vector", "Normal"))
+        gridPos -= 2
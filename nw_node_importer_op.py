@@ -39,12 +39,19 @@ class NW_NodeImporter(Operator, NW_NodeUtils):
             return True
 
         # No, try to import ..
+        existing = set(i.as_pointer() for i in list(bpy.data.node_groups) + list(bpy.data.images))
         with bpy.data.libraries.load(blend, link=link) as (data_src, data_dst):
             if group not in data_src.node_groups:
                 return False # Not available
 
             data_dst.node_groups = [group]
 
+        # Tag the group and everything appended along with it ..
+        if not link:
+            for id in list(bpy.data.node_groups) + list(bpy.data.images):
+                if id.as_pointer() not in existing:
+                    self.tag(id)
+
         return True
 
     def execute(self, context):
@@ -0,0 +1,169 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, json, hashlib
+
+from . nw_node_utils import NW_NodeUtils
+
+class NW_NodeSpec:
+    """
+    Declarative description of a node group: interface sockets, nodes (with
+    properties and input defaults) and links. Sockets are referenced as
+    (node id, socket name or index), the group sockets as ("Group Input", index)
+    and ("Group Output", index). Serializes to JSON, identical specs share the hash.
+    """
+    GROUP_INPUT = "Group Input"
+    GROUP_OUTPUT = "Group Output"
+
+    def __init__(self, name, outputX = 0):
+        self.name = name
+        self.outputX = outputX
+        self.inputs = []
+        self.outputs = []
+        self.nodes = []
+        self.links = []
+
+    def node(self, type, x, y, props = None, defaults = None):
+        """
+        Add node of the given type at grid position x/y, returns its id.
+        props are set as attributes, defaults is a list of (input, value).
+        """
+        id = "n%d" % len(self.nodes)
+        self.nodes.append({
+            "id": id,
+            "type": type,
+            "x": x,
+            "y": y,
+            "props": props or {},
+            "defaults": [ list(d) for d in defaults or [] ]
+        })
+        return id
+
+    def math(self, op, x, y, clamp = False, def0 = 0.5, def1 = 0.5):
+        """
+        Add math node, same parameters as NW_NodeUtils.create_math_node.
+        """
+        return self.node("ShaderNodeMath", x, y, { "operation": op, "use_clamp": clamp }, [ (0, def0), (1, def1) ])
+
+    def input(self, type, name, defValue = None):
+        """
+        Add group input socket, returns the socket reference.
+        """
+        self.inputs.append([type, name, defValue])
+        return (self.GROUP_INPUT, len(self.inputs) - 1)
+
+    def output(self, type, name):
+        """
+        Add group output socket, returns the socket reference.
+        """
+        self.outputs.append([type, name])
+        return (self.GROUP_OUTPUT, len(self.outputs) - 1)
+
+    def link(self, fromSocket, toSocket):
+        """
+        Link output socket (node id, socket) to input socket (node id, socket).
+        """
+        self.links.append([fromSocket[0], fromSocket[1], toSocket[0], toSocket[1]])
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "outputX": self.outputX,
+            "inputs": self.inputs,
+            "outputs": self.outputs,
+            "nodes": self.nodes,
+            "links": self.links
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"))
+
+    def hash(self):
+        """
+        Stable hash of the spec, used to find already compiled trees.
+        """
+        return hashlib.sha1(self.to_json().encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def from_json(text):
+        data = json.loads(text)
+        spec = NW_NodeSpec(data["name"], data["outputX"])
+        spec.inputs = data["inputs"]
+        spec.outputs = data["outputs"]
+        spec.nodes = data["nodes"]
+        spec.links = data["links"]
+        return spec
+
+class NW_SpecCompiler(NW_NodeUtils):
+    """
+    Instantiates NW_NodeSpec as node group trees. Trees are tagged with the
+    spec hash, compiling an identical spec again returns the existing tree.
+    """
+
+    def find_tree(self, hash):
+        """
+        Return the tree compiled from a spec with the given hash or None.
+        """
+        for tree in bpy.data.node_groups:
+            if tree.get("nw_spec_hash") == hash:
+                return tree
+        return None
+
+    def compile(self, spec):
+        """
+        Return tree for the spec, it's only created if not yet existing.
+        """
+        hash = spec.hash()
+        tree = self.find_tree(hash)
+        if tree:
+            return tree
+
+        tree = self.tag(bpy.data.node_groups.new(spec.name, "ShaderNodeTree"))
+        tree["nw_spec_hash"] = hash
+
+        # Whole interface in one go, before any node links to it.
+        for type, name, defValue in spec.inputs:
+            socket = tree.inputs.new("NodeSocket" + type, name)
+            if defValue is not None:
+                socket.default_value = defValue
+        for type, name in spec.outputs:
+            tree.outputs.new("NodeSocket" + type, name)
+
+        nodes = {
+            NW_NodeSpec.GROUP_INPUT: tree.nodes.new("NodeGroupInput"),
+            NW_NodeSpec.GROUP_OUTPUT: self.at(tree.nodes.new("NodeGroupOutput"), spec.outputX, 0)
+        }
+        for n in spec.nodes:
+            node = self.at(tree.nodes.new(n["type"]), n["x"], n["y"])
+            for name, value in n["props"].items():
+                setattr(node, name, value)
+            for socket, value in n["defaults"]:
+                node.inputs[socket].default_value = value
+            nodes[n["id"]] = node
+
+        for fromNode, fromSocket, toNode, toSocket in spec.links:
+            tree.links.new(nodes[fromNode].outputs[fromSocket], nodes[toNode].inputs[toSocket])
+
+        tree.update_tag()
+        return tree
+
+    def instance(self, tree, groupTree):
+        """
+        Create group node for groupTree in tree.
+        """
+        group = tree.nodes.new("ShaderNodeGroup")
+        group.node_tree = groupTree
+        return group
@@ -14,7 +14,17 @@
 # along with this program; if not, write to the Free Software Foundation,
 # Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
 
-import bpy
+import bpy, json
+
+from . nw_texture_mapper import NW_TextureMapper
+from . nw_cache import NW_Cache
+
+class DummyGroup:
+    """
+    Stands in for a group node, if only the tree is created (no instance).
+    """
+    def __init__(self, tree):
+        self.node_tree = tree
 
 class NW_NodeUtils:
     """
@@ -46,14 +56,54 @@ class NW_NodeUtils:
         node.location.y = self.baseY + y * self.gridSizeY
         return node
 
+    def tag(self, id):
+        """
+        Mark data block as created by Node Wizard (see NW_GarbageCollector).
+        """
+        id["nw_generated"] = True
+        return id
+
+    def add_tiles(self, image, tiles):
+        """
+        Turn image (loaded from the first tile) into a tiled (UDIM) image with all
+        tiles (dict tile number -> file). Tiles are only loaded when sampled. Blender
+        before 2.82 has no tiled images, the first tile is used alone.
+        """
+        if bpy.app.version < (2, 82, 0):
+            print("Node Wizard: UDIM tiles require Blender 2.82, using %s only" % image.filepath)
+            return
+        image.source = "TILED"
+        # Tiles have no name, bpy collections only look up names.
+        numbers = set(t.number for t in image.tiles)
+        for tile in tiles:
+            if tile not in numbers:
+                image.tiles.new(tile_number=tile)
+
+    def resolve_image_path(self, fileName):
+        """
+        Return the file actually loaded for a texture file (e.g. a transcoded copy).
+        The image keeps the original file name as "nw_source" (and how a derived
+        file was made as "nw_recipe").
+        """
+        return NW_Cache.resolve(fileName)
+
     def create_image_node(self, tree, fileName, nonColor = True, clip = False):
         """
-        Create image node with the given file.
+        Create image node with the given file, ValueError for a UDIM file
+        without tiles.
         """
+        tiles = NW_TextureMapper.tileFiles(fileName)
+        if not tiles:
+            raise ValueError("No UDIM tiles found for %s" % fileName)
         node = tree.nodes.new("ShaderNodeTexImage")
-        node.image = bpy.data.images.load(fileName)
-              node = tree.nodes.new("ShaderNodeTexImage")
-        node.image = bpy.data.images.load(fileName)
+        loaded = self.resolve_image_path(next(iter(tiles.values())))
+        node.image = bpy.data.images.load(loaded)
+        if None not in tiles:
+            self.add_tiles(node.image, tiles)
+        node.image["nw_source"] = fileName
+        if loaded in NW_Cache.recipes:
+            node.image["nw_recipe"] = json.dumps(NW_Cache.recipes[loaded])
+        self.tag(node.image)
         if nonColor:
             node.image.colorspace_settings.name = "Non-Color"
         if clip:
@@ -86,7 +136,7 @@ class NW_NodeUtils:
         Returns the created group and both input and output.
         """
         group = tree.nodes.new("ShaderNodeGroup")
-        group.node_tree = bpy.data.node_groups.new(name, "ShaderNodeTree")
+        group.node_tree = self.tag(bpy.data.node_groups.new(name, "ShaderNodeTree"))
         input = group.node_tree.nodes.new("NodeGroupInput")
         output = self.at(group.node_tree.nodes.new("NodeGroupOutput"), outputX, 0)
 
@@ -97,7 +147,7 @@ class NW_NodeUtils:
         Create the group, but do not create an instance ..
         Returns the created tree and both input and output.
         """
-        tree = bpy.data.node_groups.new(name, "ShaderNodeTree")
+        tree = self.tag(bpy.data.node_groups.new(name, "ShaderNodeTree"))
         input = tree.nodes.new("NodeGroupInput")
         output = self.at(tree.nodes.new("NodeGroupOutput"), outputX, 0)
 
@@ -0,0 +1,156 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, json, tempfile
+from bpy.types import Operator
+from bpy.props import BoolProperty
+
+from . nw_cache import NW_Cache
+from . nw_node_spec import NW_SpecCompiler
+from . nw_tools_op import NW_DX2OGLConverterOperator
+from . nw_transcode import NW_Transcoder
+
+class NW_NormalClassifier:
+    """
+    Finds the normal map images of all materials and groups (image nodes feeding
+    a Normal Map node) and classifies them as DirectX or OpenGL. Statistics are
+    computed by the background Blender workers (see nw_transcode_worker.py) and
+    cached by image content.
+    """
+    # Longest side of the downsampled copy the statistics are computed on.
+    size = 256
+
+    # Curl of one convention must exceed the other one by this factor (flat maps stay undecided).
+    margin = 1.25
+
+    @staticmethod
+    def trees():
+        return [ m.node_tree for m in bpy.data.materials if m.node_tree ] + list(bpy.data.node_groups)
+
+    @staticmethod
+    def image_node(socket):
+        """
+        Image node linked to socket (through reroutes), None if there is none.
+        """
+        while socket.links:
+            node = socket.links[0].from_node
+            if node.type == "TEX_IMAGE":
+                return node if node.image else None
+            if node.type != "REROUTE":
+                return None
+            socket = node.inputs[0]
+        return None
+
+    @staticmethod
+    def find():
+        """
+        List of (tree, normal map node, image) of all normal maps, maps already
+        converted (converter between image and normal map node) are skipped.
+        """
+        found = []
+        for tree in NW_NormalClassifier.trees():
+            for node in tree.nodes:
+                if node.type == "NORMAL_MAP" and not node.mute:
+                    image = NW_NormalClassifier.image_node(node.inputs["Color"])
+                    if image:
+                        found.append((tree, node, image.image))
+        return found
+
+    @staticmethod
+    def source(image, folder):
+        """
+        File to classify for the image, packed images are written to folder.
+        """
+        if image.packed_file:
+            fileName = os.path.join(folder, "%d%s" % (image.as_pointer(), os.path.splitext(image.filepath)[1] or ".png"))
+            with open(fileName, "wb") as f:
+                f.write(image.packed_file.data)
+            return fileName
+        fileName = image.get("nw_source") or bpy.path.abspath(image.filepath)
+        return fileName if os.path.isfile(fileName) else None
+
+    @staticmethod
+    def decide(stats):
+        if stats["ogl"] > stats["dx"] * NW_NormalClassifier.margin:
+            return "DX"
+        if stats["dx"] > stats["ogl"] * NW_NormalClassifier.margin:
+            return "OGL"
+        return "UNKNOWN"
+
+    @staticmethod
+    def classify(images):
+        """
+        Classify images, returns dict image -> "DX", "OGL" or "UNKNOWN" (no file,
+        flat map or failed).
+        """
+        results = {}
+        with tempfile.TemporaryDirectory() as folder:
+            targets, jobs = {}, []
+            for image in set(images):
+                fileName = NW_NormalClassifier.source(image, folder)
+                if not fileName:
+                    results[image] = "UNKNOWN"
+                    continue
+                target, hit = NW_Cache.lookup("%s_nmap%d" % (NW_Cache.source_hash(fileName), NW_NormalClassifier.size), ".json")
+                if not hit and target not in [ j["target"] for j in jobs ]:
+                    jobs.append({ "kind": "classify", "source": fileName, "target": target, "size": NW_NormalClassifier.size })
+                targets[image] = target
+            NW_Cache.save_hashes()
+            if jobs and bpy.app.binary_path:
+                NW_Transcoder.run_jobs(jobs)
+
+        for image, target in targets.items():
+            try:
+                with open(target) as f:
+                    results[image] = NW_NormalClassifier.decide(json.load(f))
+            except (OSError, ValueError, KeyError):
+                results[image] = "UNKNOWN"
+        return results
+
+class NW_FixDirectXNormalsOperator(Operator, NW_SpecCompiler):
+    bl_idname = "material.nw_fix_dx_normals_op"
+    bl_label = "Fix DirectX Normal Maps"
+    bl_description = "Classify all normal maps of the file as DirectX or OpenGL and put a DX2OGL converter in front of the DirectX ones"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    dry_run: BoolProperty(name="Dry Run", description="Only report the DirectX normal maps")
+
+    def execute(self, context):
+        found = NW_NormalClassifier.find()
+        if not found:
+            self.report({"INFO"}, "No normal maps found.")
+            return{'FINISHED'}
+
+        kinds = NW_NormalClassifier.classify(image for _, _, image in found)
+        dx = [ (tree, node, image) for tree, node, image in found if kinds[image] == "DX" ]
+        unknown = len([ i for i in set(kinds) if kinds[i] == "UNKNOWN" ])
+
+        if not self.dry_run and dx:
+            # All converters share the same tree.
+            converter = self.compile(NW_DX2OGLConverterOperator.dx2ogl_converter_spec())
+            for tree, node, image in dx:
+                socket = node.inputs["Color"].links[0].from_socket
+                group = self.instance(tree, converter)
+                group.location = node.location.x - self.gridSizeX, node.location.y - self.gridSizeY
+                tree.links.new(socket, group.inputs["Vector"])
+                tree.links.new(group.outputs["Vector"], node.inputs["Color"])
+
+        names = sorted(set(image.name for _, _, image in dx))
+        for name in names:
+            self.report({"INFO"}, "DirectX: %s" % name)
+        self.report({"INFO"}, "%d normal maps, %d DirectX (%d uses%s), %d undecided." % (len(kinds), len(names), len(dx),
+            "" if self.dry_run else " fixed", unknown))
+        return{'FINISHED'}
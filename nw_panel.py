@@ -23,6 +23,19 @@ from . nw_preview_helper   import NW_PreviewHelper
 from . nw_generate_op      import NW_GenerateOperator
 from . nw_tools_op         import *
 from . nw_node_importer_op import NW_NodeImporter
+from . nw_batch_op         import NW_BatchGenerateOperator, NW_BatchProgress
+from . nw_gc               import NW_GarbageCollectOperator
+from . nw_ingest           import NW_FolderIngest
+from . nw_profiler         import NW_Profiler, NW_ProfileSummaryOperator
+from . nw_render_cost      import NW_RenderCost, NW_RenderCostOperator
+from . nw_baker            import NW_BakeMaskOperator
+from . nw_flatten          import NW_FlattenOperator
+from . nw_group_registry   import NW_MergeGroupsOperator
+from . nw_normal_check     import NW_FixDirectXNormalsOperator
+from . nw_cache            import NW_Cache, NW_CacheMaintenanceOperator
+from . nw_decal_atlas      import NW_DecalAtlasOperator
+from . nw_variants         import NW_ObjectVariantsOperator, NW_MergeVariantsOperator
+from . nw_staging          import NW_Staging, NW_RewritePathsOperator
 
 class NW_Panel(NW_BasePanel):
     bl_space_type = "NODE_EDITOR"
@@ -40,16 +53,53 @@ class NW_Panel(NW_BasePanel):
         op.add_hslbc = properties.add_hslbc
         op.add_uv = properties.add_uv
         op.decal = properties.decal
+        op.height_normal = properties.height_normal
+        op.normal_strength = properties.normal_strength
 
         op = self.add_split_row().operator(NW_GenerateOperator.bl_idname, text="From Diffuse Image", icon="UV")
         op.mode = "Image"
         op.add_hslbc = properties.add_hslbc
         op.add_uv = properties.add_uv
         op.decal = properties.decal
+        op.height_normal = properties.height_normal
+        op.normal_strength = properties.normal_strength
+
+        op = self.add_split_row().operator(NW_BatchGenerateOperator.bl_idname, text="Batch PBR Setup (Folder)", icon="FILE_FOLDER")
+        op.add_hslbc = properties.add_hslbc
+        op.add_uv = properties.add_uv
+        op.decal = properties.decal
+        op.height_normal = properties.height_normal
+        op.normal_strength = properties.normal_strength
+        op.remote = False
+        if NW_Staging.library():
+            op = self.add_split_row().operator(NW_BatchGenerateOperator.bl_idname, text="Batch PBR Setup (HTTP Library)", icon="URL")
+            op.add_hslbc = properties.add_hslbc
+            op.add_uv = properties.add_uv
+            op.decal = properties.decal
+            op.height_normal = properties.height_normal
+            op.normal_strength = properties.normal_strength
+            op.remote = True
+        if NW_BatchProgress.label:
+            self.add_label(NW_BatchProgress.text())
+            self.add_label("Esc to cancel")
     
         self.add_center_row().prop(properties, "add_hslbc")
         self.add_center_row().prop(properties, "add_uv")
         self.add_center_row().prop(properties, "decal")
+        if properties.decal:
+            op = self.add_split_row().operator(NW_DecalAtlasOperator.bl_idname, text=NW_DecalAtlasOperator.bl_label, icon="IMGDISPLAY")
+            op.size = properties.atlas_size
+            op.padding = properties.atlas_padding
+            row = self.add_center_row()
+            row.prop(properties, "atlas_size")
+            row.prop(properties, "atlas_padding")
+        row = self.add_center_row()
+        row.prop(properties, "height_normal")
+        if properties.height_normal:
+            row.prop(properties, "normal_strength")
+        self.add_center_row().prop(properties, "watch_textures")
+        if NW_FolderIngest.active:
+            self.add_label(NW_FolderIngest.active.status())
         self.add_separator()
 
         #########################################
@@ -65,6 +115,11 @@ class NW_Panel(NW_BasePanel):
             text=NW_GenerateTwoLayerTextureBasedSetupOperator.bl_label,
             icon="RENDERLAYERS"
         )
+        self.add_split_row().operator(
+            NW_GenerateLayerStackOperator.bl_idname,
+            text=NW_GenerateLayerStackOperator.bl_label,
+            icon="RENDERLAYERS"
+        )
         self.add_separator()
 
         #########################################
@@ -80,16 +135,27 @@ class NW_Panel(NW_BasePanel):
             text=NW_DX2OGLConverterOperator.bl_label,
             icon="ARROW_LEFTRIGHT"
         )
+        self.add_split_row().operator(
+            NW_FixDirectXNormalsOperator.bl_idname,
+            text="Find DirectX Normal Maps",
+            icon="VIEWZOOM"
+        ).dry_run = True
+        self.add_split_row().operator(
+            NW_FixDirectXNormalsOperator.bl_idname,
+            text=NW_FixDirectXNormalsOperator.bl_label,
+            icon="ARROW_LEFTRIGHT"
+        ).dry_run = False
         self.add_split_row().operator(
             NW_GenerateDistortionOperator.bl_idname,
             text=NW_GenerateDistortionOperator.bl_label,
             icon="EMPTY_ARROWS"
-        )
+        ).tier = properties.vector_tier
         self.add_split_row().operator(
             NW_GenerateBlurOperator.bl_idname,
             text=NW_GenerateBlurOperator.bl_label,
             icon="EMPTY_ARROWS"
-        )
+        ).tier = properties.vector_tier
+        self.add_center_row().prop(properties, "vector_tier", expand=True)
         self.add_separator()
 
         #########################################
@@ -101,6 +167,71 @@ class NW_Panel(NW_BasePanel):
             text="Add Mask", 
             icon="ADD"
         ).group = properties.nodes_previews
+        op = self.add_split_row().operator(
+            NW_BakeMaskOperator.bl_idname,
+            text=NW_BakeMaskOperator.bl_label,
+            icon="RENDER_STILL"
+        )
+        op.target = properties.bake_target
+        op.resolution = properties.bake_resolution
+        op.samples = properties.bake_samples
+        self.add_center_row().prop(properties, "bake_target", expand=True)
+        row = self.add_center_row()
+        if properties.bake_target == "IMAGE":
+            row.prop(properties, "bake_resolution")
+        row.prop(properties, "bake_samples")
+        self.add_separator()
+
+        #########################################
+
+        self.add_label("Flatten")
+        for allMaterials, text in [ (False, NW_FlattenOperator.bl_label), (True, "Flatten Selected Objects") ]:
+            op = self.add_split_row().operator(
+                NW_FlattenOperator.bl_idname,
+                text=text,
+                icon="IMAGE_DATA"
+            )
+            op.all_materials = allMaterials
+            op.resolution = properties.flatten_resolution
+            op.samples = properties.flatten_samples
+            op.directory = properties.flatten_directory
+        row = self.add_center_row()
+        row.prop(properties, "flatten_resolution")
+        row.prop(properties, "flatten_samples")
+        self.add_split_row().prop(properties, "flatten_directory")
+        self.add_separator()
+
+        #########################################
+
+        self.add_label("Object Variants")
+        op = self.add_split_row().operator(
+            NW_ObjectVariantsOperator.bl_idname,
+            text=NW_ObjectVariantsOperator.bl_label,
+            icon="OBJECT_DATA"
+        )
+        op.source = properties.variant_source
+        op.inputs = properties.variant_inputs
+        op.amount = properties.variant_amount
+        op.remove = False
+        self.add_split_row().operator(
+            NW_ObjectVariantsOperator.bl_idname,
+            text="Remove Variant Drivers",
+            icon="X"
+        ).remove = True
+        self.add_center_row().prop(properties, "variant_source", expand=True)
+        self.add_center_row().prop(properties, "variant_inputs")
+        if properties.variant_source == "RANDOM":
+            self.add_center_row().prop(properties, "variant_amount")
+        self.add_split_row().operator(
+            NW_MergeVariantsOperator.bl_idname,
+            text="Find Material Variants",
+            icon="VIEWZOOM"
+        ).dry_run = True
+        self.add_split_row().operator(
+            NW_MergeVariantsOperator.bl_idname,
+            text=NW_MergeVariantsOperator.bl_label,
+            icon="AUTOMERGE_ON"
+        ).dry_run = False
         self.add_separator()
 
         #########################################
@@ -112,3 +243,73 @@ class NW_Panel(NW_BasePanel):
             text="Add Material", 
             icon="ADD"
         ).group = properties.materials_previews
+
+        #########################################
+
+        self.add_separator()
+        self.add_label("Clean Up")
+        self.add_split_row().operator(
+            NW_GarbageCollectOperator.bl_idname,
+            text="Report Unused",
+            icon="INFO"
+        ).dry_run = True
+        self.add_split_row().operator(
+            NW_GarbageCollectOperator.bl_idname,
+            text="Remove Unused",
+            icon="TRASH"
+        ).dry_run = False
+        self.add_split_row().operator(
+            NW_MergeGroupsOperator.bl_idname,
+            text=NW_MergeGroupsOperator.bl_label,
+            icon="AUTOMERGE_ON"
+        )
+        self.add_split_row().operator(
+            NW_CacheMaintenanceOperator.bl_idname,
+            text="Verify Texture Cache",
+            icon="CHECKMARK"
+        ).verify = True
+        self.add_split_row().operator(
+            NW_CacheMaintenanceOperator.bl_idname,
+            text=NW_CacheMaintenanceOperator.bl_label,
+            icon="TRASH"
+        ).verify = False
+        if NW_Cache.stats["hits"] or NW_Cache.stats["misses"]:
+            self.add_label(NW_Cache.text())
+        self.add_split_row().operator(
+            NW_RewritePathsOperator.bl_idname,
+            text="Use Canonical Paths (Publish)",
+            icon="WORLD"
+        ).target = "CANONICAL"
+        self.add_split_row().operator(
+            NW_RewritePathsOperator.bl_idname,
+            text="Use Staged Copies",
+            icon="DISK_DRIVE"
+        ).target = "STAGED"
+
+        #########################################
+
+        self.add_separator()
+        self.add_label("Render Cost")
+        self.add_split_row().operator(
+            NW_RenderCostOperator.bl_idname,
+            text=NW_RenderCostOperator.bl_label,
+            icon="RENDER_STILL"
+        )
+        for result in NW_RenderCost.report[:NW_RenderCost.hotspots]:
+            self.add_label("%s: %.2f %s" % (result["material"], result["score"], NW_RenderCost.unit))
+            if result["hotspots"]:
+                name, cost = result["hotspots"][0]
+                self.add_label("    %s: %.2f" % (name, cost))
+
+        #########################################
+
+        if NW_Profiler.enabled():
+            self.add_separator()
+            self.add_label("Profiling")
+            for name, values in sorted(NW_Profiler.latencies.items()):
+                self.add_label("%s: %dx, p50 %.1fms, max %.1fms" % (name, len(values), NW_Profiler.percentile(values, 0.5), max(values)))
+            self.add_split_row().operator(
+                NW_ProfileSummaryOperator.bl_idname,
+                text=NW_ProfileSummaryOperator.bl_label,
+                icon="TIME"
+            )
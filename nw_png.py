@@ -0,0 +1,45 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+# No bpy in here, used by nw_transcode_worker.py (own process) as well.
+import os, struct, zlib
+
+# PNG color type per channel count.
+color_types = { 1: 0, 2: 4, 3: 2, 4: 6 }
+
+def write_png(fileName, pixels):
+    """
+    Write a numpy array (height, width, channels) of uint8 or uint16 as PNG,
+    rows bottom up like Blender image pixels. The file is replaced atomically
+    (temp name per process, several processes may write the same file).
+    """
+    import numpy as np
+
+    height, width, channels = pixels.shape
+    bitDepth = 16 if pixels.dtype == np.uint16 else 8
+    rows = np.flipud(pixels).astype(">u2" if bitDepth == 16 else np.uint8).reshape(height, -1).view(np.uint8)
+    raw = np.hstack([ np.zeros((height, 1), np.uint8), rows ]).tobytes()
+
+    def chunk(tag, payload):
+        return struct.pack(">I", len(payload)) + tag + payload + struct.pack(">I", zlib.crc32(tag + payload) & 0xffffffff)
+
+    temp = "%s.%d.tmp" % (fileName, os.getpid())
+    with open(temp, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bitDepth, color_types[channels], 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+    os.replace(temp, fileName)
@@ -0,0 +1,108 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, threading, types
+from bpy.types import AddonPreferences
+from bpy.props import BoolProperty, StringProperty, FloatProperty, IntProperty, EnumProperty
+
+class NW_Preferences(AddonPreferences):
+    bl_idname = __package__
+
+    # Copy read by worker threads (see snapshot()), bpy isn't thread safe.
+    frozen = None
+
+    profiling: BoolProperty(name="Profile Operators", description="Log latency and created data of all Node Wizard operators (also enabled by NW_PROFILE=1)")
+    profile_cprofile: BoolProperty(name="cProfile Dumps", description="Write a cProfile dump per operator invocation (also enabled by NW_PROFILE=cprofile)")
+    profile_directory: StringProperty(name="Profile Folder", subtype="DIR_PATH", description="Folder for the profile log, empty for the temp folder")
+
+    ingest_enabled: BoolProperty(name="Watch Drop Folder", description="Generate PBR groups for texture sets showing up in the drop folder")
+    ingest_directory: StringProperty(name="Drop Folder", subtype="DIR_PATH", description="Folder (and sub folders) new texture sets are delivered to")
+    ingest_library: StringProperty(name="Library Folder", subtype="DIR_PATH", description="Generated groups are written to this folder, one .blend per set (sub folders of the drop folder are mirrored)")
+    ingest_settle: FloatProperty(name="Settle Time", default=10.0, min=0.0, subtype="TIME", unit="TIME",
+        description="Seconds a set must stay unchanged before it's ingested (copies in progress)")
+
+    cache_directory: StringProperty(name="Cache Folder", subtype="DIR_PATH", description="Folder for transcoded maps and other derived files, empty for the temp folder (also set by NW_CACHE_DIR)")
+    transcode_scalar: BoolProperty(name="8 Bit Scalar Maps", default=True,
+        description="Convert roughness, gloss, metallic and specular maps with more than 8 bit to 8 bit (4x less image memory)")
+    cache_size: FloatProperty(name="Size Limit (GB)", default=10.0, min=0.1,
+        description="Least recently used cache files are evicted above this size")
+    transcode_workers: IntProperty(name="Processes", default=4, min=1, max=64, description="Background Blender processes used for transcoding")
+    staging: BoolProperty(name="Stage Textures Locally", description="Copy the maps of generated sets to the cache folder first and load the copies (also enabled by NW_STAGING=1)")
+    staging_workers: IntProperty(name="Copies", default=8, min=1, max=64, description="Files copied at the same time")
+    staging_check: EnumProperty(name="Check", items=[
+        ("STAT", "Size/Time", "A staged copy is current if the source still has the size and modification time it was copied with"),
+        ("HASH", "Content", "Compare content hashes in addition (source hashes are cached per size and time)")
+    ])
+
+    http_library: StringProperty(name="HTTP Library", description="URL of a texture library served over HTTP (with index.json), also set by NW_HTTP_LIBRARY")
+
+    cost_table: StringProperty(name="Cost Table", subtype="FILE_PATH",
+        description="Render cost table fitted by tools/nw_cost_calibrate.py, empty for the built-in relative costs")
+
+    def draw(self, context):
+        layout = self.layout
+        layout.label(text="Texture Cache")
+        row = layout.row()
+        row.prop(self, "transcode_scalar")
+        row.prop(self, "transcode_workers")
+        row = layout.row()
+        row.prop(self, "cache_directory")
+        row.prop(self, "cache_size")
+        row = layout.row()
+        row.prop(self, "staging")
+        row.prop(self, "staging_workers")
+        row.prop(self, "staging_check")
+        layout.prop(self, "http_library")
+        layout.label(text="Drop Folder Ingest")
+        row = layout.row()
+        row.prop(self, "ingest_enabled")
+        row.prop(self, "ingest_settle")
+        layout.prop(self, "ingest_directory")
+        layout.prop(self, "ingest_library")
+        layout.label(text="Render Cost")
+        layout.prop(self, "cost_table")
+        layout.label(text="Profiling")
+        row = layout.row()
+        row.prop(self, "profiling")
+        row.prop(self, "profile_cprofile")
+        layout.prop(self, "profile_directory")
+
+    @staticmethod
+    def get():
+        """
+        Return the preferences, None if the add-on isn't enabled (e.g. loaded by a script).
+        Worker threads get the copy taken by the main thread (see snapshot()).
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return NW_Preferences.frozen
+        addon = bpy.context.preferences.addons.get(__package__)
+        return addon.preferences if addon else None
+
+    @staticmethod
+    def snapshot():
+        """
+        Main thread: copy the preferences (relative paths made absolute) for
+        worker threads started afterwards.
+        """
+        prefs = NW_Preferences.get()
+        if not prefs:
+            NW_Preferences.frozen = None
+            return
+        values = {}
+        for name in NW_Preferences.__annotations__:
+            value = getattr(prefs, name)
+            values[name] = bpy.path.abspath(value) if isinstance(value, str) and value.startswith("//") else value
+        NW_Preferences.frozen = types.SimpleNamespace(**values)
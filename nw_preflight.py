@@ -0,0 +1,240 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+# No bpy in here, used by tools/nw_preflight.py as well.
+import os, struct
+from concurrent.futures import ThreadPoolExecutor
+
+class NW_ImageInfo:
+    """
+    What the header of an image file tells (no pixel data is read).
+    """
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.format = None
+        self.width = self.height = 0
+        self.bitDepth = 0
+        self.channels = 0
+        self.error = None
+        # Suspicious, but loadable (e.g. no JPEG end marker).
+        self.warning = None
+
+    def __repr__(self):
+        if self.error:
+            return "%s: %s" % (self.fileName, self.error)
+        return "%s: %s %dx%d, %d channels, %d bit" % (self.fileName, self.format, self.width, self.height, self.channels, self.bitDepth)
+
+class NW_Preflight:
+    """
+    Header-only validation of texture sets, runs before any data block is
+    created. Files are read in a thread pool (I/O bound, fine on network mounts).
+    """
+    workers = 32
+
+    # Bytes at the end of a JPEG searched for the end marker (trailing padding or metadata).
+    jpeg_tail = 65536
+
+    # Extensions of the formats with a header check.
+    checked_ext = ".png,.jpg,.jpeg,.exr,.tif,.tiff".split(",")
+
+    # Channels per PNG color type.
+    png_channels = { 0: 1, 2: 3, 3: 3, 4: 2, 6: 4 }
+
+    # Bits per EXR pixel type (uint, half, float).
+    exr_bits = { 0: 32, 1: 16, 2: 32 }
+
+    @staticmethod
+    def read_png(f, info, size):
+        f.seek(0)
+        head = f.read(33)
+        if len(head) < 33 or head[12:16] != b"IHDR":
+            raise ValueError("IHDR missing")
+        info.width, info.height, info.bitDepth, colorType = struct.unpack(">IIBB", head[16:26])
+        info.channels = NW_Preflight.png_channels.get(colorType, 0)
+        f.seek(size - 12)
+        if f.read(12)[4:8] != b"IEND":
+            raise ValueError("truncated (no IEND)")
+
+    @staticmethod
+    def read_jpeg(f, info, size):
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                raise ValueError("no SOF marker")
+            # Padding bytes ..
+            while marker[1] == 0xFF:
+                marker = marker[1:] + f.read(1)
+            length = struct.unpack(">H", f.read(2))[0]
+            if marker[1] in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                info.bitDepth, info.height, info.width, info.channels = struct.unpack(">BHHB", f.read(6))
+                break
+            f.seek(length - 2, os.SEEK_CUR)
+        # Decoders cope with missing end markers (partly gray image at worst).
+        f.seek(max(0, size - NW_Preflight.jpeg_tail))
+        if b"\xff\xd9" not in f.read():
+            info.warning = "possibly truncated (no EOI near the end)"
+
+    @staticmethod
+    def read_exr(f, info, size):
+        f.seek(8)
+        data = f.read(65536)
+        pos = 0
+        while pos < len(data) and data[pos] != 0:
+            end = data.index(b"\0", pos)
+            name = data[pos:end]
+            end = data.index(b"\0", end + 1)
+            length = struct.unpack("<i", data[end + 1:end + 5])[0]
+            value = data[end + 5:end + 5 + length]
+            if len(value) < length:
+                raise ValueError("truncated header")
+            if name == b"dataWindow":
+                x0, y0, x1, y1 = struct.unpack("<iiii", value)
+                info.width, info.height = x1 - x0 + 1, y1 - y0 + 1
+            elif name == b"channels":
+                p = 0
+                while p < len(value) and value[p] != 0:
+                    p = value.index(b"\0", p) + 1
+                    info.bitDepth = max(info.bitDepth, NW_Preflight.exr_bits.get(struct.unpack("<i", value[p:p + 4])[0], 0))
+                    info.channels += 1
+                    p += 16
+            pos = end + 5 + length
+        if not info.width or not info.channels:
+            raise ValueError("incomplete header")
+
+    @staticmethod
+    def read_tiff(f, info, size):
+        f.seek(0)
+        order = "<" if f.read(2) == b"II" else ">"
+        f.seek(4)
+        f.seek(struct.unpack(order + "I", f.read(4))[0])
+        count = struct.unpack(order + "H", f.read(2))[0]
+        # Tag type -> (struct format, size).
+        types = { 3: ("H", 2), 4: ("I", 4) }
+        tags = {}
+        for _ in range(count):
+            tag, type, n, value = struct.unpack(order + "HHI4s", f.read(12))
+            if type in types:
+                fmt, s = types[type]
+                if n * s <= 4:
+                    tags[tag] = list(struct.unpack(order + fmt * n, value[:n * s]))
+                else:
+                    tags[tag] = (struct.unpack(order + "I", value)[0], fmt, n)
+
+        def values(tag):
+            v = tags.get(tag)
+            if isinstance(v, tuple):
+                offset, fmt, n = v
+                f.seek(offset)
+                return list(struct.unpack(order + fmt * n, f.read(n * struct.calcsize(fmt))))
+            return v or []
+
+        info.width, info.height = values(256)[0], values(257)[0]
+        bits = values(258) or [ 1 ]
+        info.bitDepth = bits[0]
+        info.channels = (values(277) or [ 1 ])[0]
+
+        # Strips or tiles must be inside of the file.
+        offsets, counts = values(273) or values(324), values(279) or values(325)
+        if offsets and counts and max(o + c for o, c in zip(offsets, counts)) > size:
+            raise ValueError("truncated (image data beyond end of file)")
+
+    @staticmethod
+    def read_info(fileName):
+        """
+        Return NW_ImageInfo for the file, info.error is set for unreadable files.
+        """
+        info = NW_ImageInfo(fileName)
+        try:
+            size = os.path.getsize(fileName)
+            with open(fileName, "rb") as f:
+                magic = f.read(8)
+                if magic.startswith(b"\x89PNG\r\n\x1a\n"):
+                    info.format = "PNG"
+                    NW_Preflight.read_png(f, info, size)
+                elif magic.startswith(b"\xff\xd8"):
+                    info.format = "JPEG"
+                    NW_Preflight.read_jpeg(f, info, size)
+                elif magic.startswith(b"\x76\x2f\x31\x01"):
+                    info.format = "EXR"
+                    NW_Preflight.read_exr(f, info, size)
+                elif magic[0:4] in (b"II*\0", b"MM\0*"):
+                    info.format = "TIFF"
+                    NW_Preflight.read_tiff(f, info, size)
+                elif size == 0:
+                    raise ValueError("empty file")
+                elif os.path.splitext(fileName)[1].lower() in NW_Preflight.checked_ext:
+                    raise ValueError("content doesn't match the file type")
+                else:
+                    # Other formats (TGA, BMP, ..) aren't checked.
+                    info.format = os.path.splitext(fileName)[1][1:].upper()
+                    return info
+            if info.width <= 0 or info.height <= 0:
+                info.error = "invalid resolution"
+        except (OSError, ValueError, IndexError, struct.error) as e:
+            info.error = str(e) or "unreadable header"
+        return info
+
+    @staticmethod
+    def read_all(fileNames):
+        """
+        Read headers of all files in parallel, returns dict file name -> NW_ImageInfo.
+        """
+        fileNames = list(set(fileNames))
+        if len(fileNames) < 2:
+            return { f: NW_Preflight.read_info(f) for f in fileNames }
+        with ThreadPoolExecutor(max_workers=min(NW_Preflight.workers, len(fileNames))) as pool:
+            return dict(zip(fileNames, pool.map(NW_Preflight.read_info, fileNames)))
+
+    @staticmethod
+    def check_set(maps, infos):
+        """
+        Check a set (dict map type -> list of files, more than one for UDIM tiles)
+        with the read headers, returns list of ("ERROR"/"WARNING", message).
+        """
+        issues = []
+        if any(len(files) == 0 for files in maps.values()):
+            issues.append(("ERROR", "UDIM map without tiles"))
+        first = { key: files[0] for key, files in maps.items() if files }
+        for key, fileName in sorted((key, f) for key, files in maps.items() for f in files):
+            info = infos[fileName]
+            name = os.path.basename(fileName)
+            if info.error:
+                issues.append(("ERROR", "%s: %s" % (name, info.error)))
+                continue
+            if info.warning:
+                issues.append(("WARNING", "%s: %s" % (name, info.warning)))
+            if not info.width:
+                continue # Format not checked.
+
+            base = infos.get(first.get("diffuse"))
+            if key != "diffuse" and base and base.width and (base.width, base.height) != (info.width, info.height):
+                issues.append(("WARNING", "%s: %dx%d differs from diffuse %dx%d" % (name, info.width, info.height, base.width, base.height)))
+            if key == "normal" and info.channels < 3:
+                issues.append(("ERROR", "%s: normal map has %d channel(s)" % (name, info.channels)))
+            if key == "diffuse" and info.channels < 3:
+                issues.append(("WARNING", "%s: diffuse map is grayscale" % name))
+            if key == "height" and info.bitDepth < 16:
+                issues.append(("WARNING", "%s: %d bit height map may show banding" % (name, info.bitDepth)))
+        return issues
+
+    @staticmethod
+    def check_sets(sets):
+        """
+        Check many sets (list of dicts map type -> list of files) at once, returns list of issue lists.
+        """
+        infos = NW_Preflight.read_all(f for maps in sets for files in maps.values() for f in files)
+        return [ NW_Preflight.check_set(maps, infos) for maps in sets ]
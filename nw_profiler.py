@@ -0,0 +1,255 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, json, time, tempfile, functools, cProfile
+from collections import Counter
+from bpy.types import Operator
+
+from . nw_preferences import NW_Preferences
+
+class NW_Profiler:
+    """
+    Opt-in instrumentation, enabled by the add-on preferences or the environment
+    (NW_PROFILE=1, NW_PROFILE=cprofile for additional cProfile dumps, NW_PROFILE_DIR
+    for the output folder). Operators are measured as a whole (wall time, helper
+    calls, created nodes/links/sockets/images), hot helpers are counted and timed
+    inside of them. Modal jobs (e.g. batch generation) are measured from
+    execute() to their end as "<operator> (job)". Every measurement is a line
+    in nw_profile.jsonl.
+    """
+    # Upper bounds (ms) of the latency histogram buckets.
+    buckets = [ 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000 ]
+
+    # Frames of the running measurements and latencies (ms) per name of this session.
+    stack = []
+    latencies = {}
+
+    @staticmethod
+    def enabled():
+        prefs = NW_Preferences.get()
+        return os.environ.get("NW_PROFILE", "") not in ("", "0") or bool(prefs and prefs.profiling)
+
+    @staticmethod
+    def use_cprofile():
+        prefs = NW_Preferences.get()
+        return os.environ.get("NW_PROFILE") == "cprofile" or bool(prefs and prefs.profile_cprofile)
+
+    @staticmethod
+    def directory():
+        prefs = NW_Preferences.get()
+        directory = os.environ.get("NW_PROFILE_DIR") or (prefs and bpy.path.abspath(prefs.profile_directory)) or tempfile.gettempdir()
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @staticmethod
+    def log_file():
+        return os.path.join(NW_Profiler.directory(), "nw_profile.jsonl")
+
+    @staticmethod
+    def totals():
+        """
+        Current number of nodes, links, group sockets and images.
+        """
+        trees = list(bpy.data.node_groups) + [ m.node_tree for m in bpy.data.materials if m.node_tree ]
+        return {
+            "nodes": sum(len(t.nodes) for t in trees),
+            "links": sum(len(t.links) for t in trees),
+            "sockets": sum(len(t.inputs) + len(t.outputs) for t in bpy.data.node_groups),
+            "images": len(bpy.data.images)
+        }
+
+    @staticmethod
+    def begin(name):
+        """
+        Start a measurement, logged by end(). Helper calls are counted while the
+        frame is on the stack.
+        """
+        return { "name": name, "calls": Counter(), "ms": Counter(), "before": NW_Profiler.totals(), "start": time.perf_counter() }
+
+    @staticmethod
+    def end(frame, profile = None):
+        ms = (time.perf_counter() - frame["start"]) * 1000.0
+        after = NW_Profiler.totals()
+
+        record = {
+            "time": time.time(),
+            "name": frame["name"],
+            "ms": ms,
+            "calls": dict(frame["calls"]),
+            "helper_ms": dict(frame["ms"]),
+            "created": { k: after[k] - frame["before"][k] for k in after }
+        }
+        if profile:
+            record["profile"] = os.path.join(NW_Profiler.directory(), "%s_%d.prof" % (frame["name"], time.time() * 1000))
+            profile.dump_stats(record["profile"])
+
+        NW_Profiler.latencies.setdefault(frame["name"], []).append(ms)
+        with open(NW_Profiler.log_file(), "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    @staticmethod
+    def measure(name, call):
+        """
+        Run call() as a measured invocation and log the result.
+        """
+        frame = NW_Profiler.begin(name)
+        NW_Profiler.stack.append(frame)
+        profile = cProfile.Profile() if NW_Profiler.use_cprofile() else None
+        try:
+            return profile.runcall(call) if profile else call()
+        finally:
+            NW_Profiler.stack.pop()
+            NW_Profiler.end(frame, profile)
+
+    @staticmethod
+    def run_operator(function, name, method, self, args):
+        if not NW_Profiler.enabled():
+            return function(self, *args)
+
+        # Modal calls count to the job started by execute(), logged when it ends.
+        if method in ("modal", "cancel"):
+            span = getattr(self, "nw_span", None)
+            if not span:
+                return function(self, *args)
+            NW_Profiler.stack.append(span)
+            try:
+                result = function(self, *args)
+            finally:
+                NW_Profiler.stack.pop()
+            if method == "cancel" or not result & { "RUNNING_MODAL", "PASS_THROUGH" }:
+                self.nw_span = None
+                NW_Profiler.end(span)
+            return result
+
+        # invoke() calling execute() is measured once.
+        if NW_Profiler.stack and NW_Profiler.stack[-1]["name"] == name:
+            result = function(self, *args)
+        else:
+            result = NW_Profiler.measure(name, lambda: function(self, *args))
+        if method == "execute" and "RUNNING_MODAL" in result:
+            self.nw_span = NW_Profiler.begin(name + " (job)")
+        return result
+
+    @staticmethod
+    def wrap_operator(function, name, method):
+        """
+        Wrap an operator method, Blender checks the number of arguments.
+        """
+        if method in ("execute", "cancel"):
+            def wrapper(self, context):
+                return NW_Profiler.run_operator(function, name, method, self, (context,))
+        else:
+            def wrapper(self, context, event):
+                return NW_Profiler.run_operator(function, name, method, self, (context, event))
+        functools.update_wrapper(wrapper, function)
+        wrapper.nw_profiled = True
+        return wrapper
+
+    @staticmethod
+    def wrap_helper(function, name):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # Outside of an operator, hot helpers are measured on their own.
+            if not NW_Profiler.stack:
+                if not NW_Profiler.enabled():
+                    return function(*args, **kwargs)
+                return NW_Profiler.measure(name, lambda: function(*args, **kwargs))
+
+            frame = NW_Profiler.stack[-1]
+            frame["calls"][name] += 1
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                frame["ms"][name] += (time.perf_counter() - start) * 1000.0
+        wrapper.nw_profiled = True
+        return wrapper
+
+    @staticmethod
+    def instrument(operators, helpers):
+        """
+        Wrap execute(), invoke() and modal() (and cancel() ending modal jobs) of
+        all operators and the helpers, given as (class, method name, label).
+        Safe to be called more than once.
+        """
+        for op in [ op for op in operators if issubclass(op, Operator) ]:
+            for method in [ "execute", "invoke", "modal", "cancel" ]:
+                function = getattr(op, method, None)
+                if function and not getattr(function, "nw_profiled", False):
+                    setattr(op, method, NW_Profiler.wrap_operator(function, op.__name__, method))
+
+        for cls, method, label in helpers:
+            raw = cls.__dict__[method]
+            isStatic = isinstance(raw, staticmethod)
+            function = raw.__func__ if isStatic else raw
+            if getattr(function, "nw_profiled", False):
+                continue
+            wrapped = NW_Profiler.wrap_helper(function, label)
+            setattr(cls, method, staticmethod(wrapped) if isStatic else wrapped)
+
+    @staticmethod
+    def histogram(values):
+        counts = [ 0 ] * (len(NW_Profiler.buckets) + 1)
+        for v in values:
+            index = 0
+            while index < len(NW_Profiler.buckets) and v > NW_Profiler.buckets[index]:
+                index += 1
+            counts[index] += 1
+        labels = [ "<=%dms" % b for b in NW_Profiler.buckets ] + [ ">%dms" % NW_Profiler.buckets[-1] ]
+        return dict(zip(labels, counts))
+
+    @staticmethod
+    def percentile(values, p):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+    @staticmethod
+    def summary(logFile = None):
+        """
+        Per name latency statistics and histogram of all logged invocations.
+        """
+        latencies = {}
+        with open(logFile or NW_Profiler.log_file()) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                latencies.setdefault(record["name"], []).append(record["ms"])
+
+        return { name: {
+            "count": len(values),
+            "p50_ms": NW_Profiler.percentile(values, 0.5),
+            "p95_ms": NW_Profiler.percentile(values, 0.95),
+            "max_ms": max(values),
+            "histogram": NW_Profiler.histogram(values)
+        } for name, values in latencies.items() }
+
+class NW_ProfileSummaryOperator(Operator):
+    bl_idname = "material.nw_profile_summary_op"
+    bl_label = "Write Profile Summary"
+    bl_description = "Write per operator latency histograms of the profile log to nw_profile_summary.json"
+
+    def execute(self, context):
+        if not os.path.exists(NW_Profiler.log_file()):
+            self.report({"ERROR"}, "No profile log yet.")
+            return{'CANCELLED'}
+
+        fileName = os.path.join(NW_Profiler.directory(), "nw_profile_summary.json")
+        with open(fileName, "w") as f:
+            json.dump(NW_Profiler.summary(), f, indent=2)
+        self.report({"INFO"}, "Profile summary written to %s" % fileName)
+        return{'FINISHED'}
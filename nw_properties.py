@@ -14,16 +14,37 @@
 # along with this program; if not, write to the Free Software Foundation,
 # Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
 
-from bpy.props import EnumProperty, BoolProperty, IntProperty, PointerProperty
+from bpy.props import EnumProperty, BoolProperty, IntProperty, FloatProperty, StringProperty, PointerProperty
 from bpy.types import PropertyGroup, WindowManager
 
 from . nw_preview_helper import NW_PreviewHelper
+from . nw_texture_watcher import NW_TextureWatcher
+from . nw_tools_op import vector_tiers
+from . nw_baker import bake_targets
+from . nw_variants import variant_sources, variant_items
 
 class NW_Properties(PropertyGroup):
 
     add_hslbc: BoolProperty(name="Add HSL/BC Setup")
     add_uv: BoolProperty(name="Add UV Input")
     decal: BoolProperty(name="Clip Texture/Decal")
+    height_normal: BoolProperty(name="Normal from Height", description="Derive a normal map from the height map (or diffuse image) once, instead of a bump node")
+    normal_strength: FloatProperty(name="Strength", description="Slope scale of the derived normal map, 1.0 = full height step per pixel of a 1K map",
+        default=1.0, min=0.0, soft_max=10.0)
+    atlas_size: IntProperty(name="Atlas Size", default=4096, min=256, max=16384)
+    atlas_padding: IntProperty(name="Padding", description="Pixels around every decal repeating its border", default=8, min=0, max=256)
+    watch_textures: BoolProperty(name="Watch Texture Files", description="Reload changed texture files and add new maps to generated groups",
+        update=lambda self, _: NW_TextureWatcher.enable(self.watch_textures))
+    vector_tier: EnumProperty(name="Tier", items=vector_tiers)
+    bake_target: EnumProperty(name="Target", items=bake_targets)
+    bake_resolution: IntProperty(name="Resolution", default=1024, min=64, max=16384)
+    bake_samples: IntProperty(name="Samples", default=16, min=1, max=4096)
+    flatten_resolution: IntProperty(name="Resolution", default=2048, min=64, max=16384)
+    flatten_samples: IntProperty(name="Samples", default=16, min=1, max=4096)
+    flatten_directory: StringProperty(name="Directory", subtype="DIR_PATH", description="Save flattened images as PNG files in here (packed if empty)")
+    variant_source: EnumProperty(name="Source", items=variant_sources)
+    variant_inputs: EnumProperty(name="Inputs", items=variant_items, options={"ENUM_FLAG"}, default={"HUE", "OFFSET_X", "OFFSET_Y"})
+    variant_amount: FloatProperty(name="Amount", description="Scales the spread of random variants", default=1.0, min=0.0, soft_max=4.0)
     nodes_previews: EnumProperty(items = lambda _, __: NW_PreviewHelper.getCollection("nodes").items)
     materials_previews: EnumProperty(items = lambda _, __: NW_PreviewHelper.getCollection("materials").items)        
 
@@ -0,0 +1,197 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, json, tempfile
+from bpy.types import Operator
+
+from . nw_cost_table import NW_CostTable
+from . nw_gc import NW_GarbageCollector
+from . nw_preferences import NW_Preferences
+from . nw_preflight import NW_Preflight
+
+class NW_RenderCost:
+    """
+    Static render cost estimate of materials: all nodes evaluated for the
+    active output (nested groups included, unconnected and muted nodes not)
+    are counted per category and scored with a cost table.
+    """
+    # Last estimate, shown in the panel.
+    report = []
+    unit = ""
+
+    procedural = { "TEX_NOISE": "noise", "TEX_MUSGRAVE": "musgrave", "TEX_VORONOI": "voronoi" }
+    shaders = { "EMISSION", "SUBSURFACE_SCATTERING", "HOLDOUT", "VOLUME_ABSORPTION", "VOLUME_SCATTER", "PRINCIPLED_VOLUME", "EEVEE_SPECULAR" }
+    free = { "REROUTE", "FRAME", "GROUP_INPUT", "GROUP_OUTPUT", "OUTPUT_MATERIAL" }
+
+    # Cycles evaluates the height input of a bump node three times (center and two offsets).
+    bump_evaluations = 3
+
+    # Hotspots listed per material.
+    hotspots = 5
+
+    def __init__(self, table = None):
+        self.table = table or NW_RenderCost.load_table()
+        self.trees = {}
+        self.megapixels = {}
+
+    @staticmethod
+    def load_table():
+        prefs = NW_Preferences.get()
+        fileName = prefs and bpy.path.abspath(prefs.cost_table)
+        if fileName:
+            try:
+                return NW_CostTable.load(fileName)
+            except (OSError, ValueError, KeyError) as e:
+                print("Node Wizard: can't load cost table %s: %s" % (fileName, e))
+        return NW_CostTable()
+
+    @staticmethod
+    def category(node):
+        """
+        Cost table key of the node, None if free.
+        """
+        type = node.type
+        if type in NW_RenderCost.free:
+            return None
+        if type in ("TEX_IMAGE", "TEX_ENVIRONMENT"):
+            return "image"
+        if type in NW_RenderCost.procedural:
+            return NW_RenderCost.procedural[type]
+        if type.startswith("TEX_"):
+            return "procedural"
+        if type == "BSDF_PRINCIPLED":
+            return "principled"
+        if type.startswith("BSDF_") or type in NW_RenderCost.shaders:
+            return "bsdf"
+        if type == "BUMP":
+            return "bump"
+        if type in ("MIX_SHADER", "ADD_SHADER"):
+            return "mix_shader"
+        return "other"
+
+    def image_megapixels(self, image):
+        """
+        Resolution of the image (all UDIM tiles), from the file header if not loaded.
+        """
+        key = image.as_pointer()
+        if key not in self.megapixels:
+            width, height = image.size
+            if not width and not image.packed_file:
+                info = NW_Preflight.read_info(bpy.path.abspath(image.filepath))
+                width, height = info.width, info.height
+            tiles = len(image.tiles) if image.source == "TILED" else 1
+            self.megapixels[key] = width * height * max(1, tiles) / 1000000.0
+        return self.megapixels[key]
+
+    def node_counts(self, node):
+        counts = {}
+        if node.mute:
+            return counts
+        if node.type == "GROUP" and node.node_tree:
+            return self.tree_cost(node.node_tree)[0]
+        key = NW_RenderCost.category(node)
+        if key:
+            counts[key] = 1.0
+        if key == "image" and node.image:
+            counts["image_megapixel"] = self.image_megapixels(node.image)
+        return counts
+
+    def walk(self, node, factor, counts, contributions, visited):
+        """
+        Add node and all nodes it depends on (times the number of evaluations) to counts.
+        """
+        if (node, factor) in visited:
+            return
+        visited.add((node, factor))
+
+        nodeCounts = self.node_counts(node)
+        for key, value in nodeCounts.items():
+            counts[key] = counts.get(key, 0.0) + value * factor
+        # Groups contribute their nodes (by path), so hotspots are single nodes.
+        if node.type == "GROUP" and nodeCounts:
+            parts = [ ("%s/%s" % (node.node_tree.name, name), cost) for name, cost in self.tree_cost(node.node_tree)[1].items() ]
+        else:
+            parts = [ (node.name, self.table.score(nodeCounts)) ] if nodeCounts else []
+        for name, cost in parts:
+            contributions[name] = contributions.get(name, 0.0) + cost * factor
+
+        for socket in node.inputs:
+            f = factor * NW_RenderCost.bump_evaluations if node.type == "BUMP" and socket.name == "Height" else factor
+            for link in socket.links:
+                if not getattr(link, "is_muted", False):
+                    self.walk(link.from_node, f, counts, contributions, visited)
+
+    def tree_cost(self, tree):
+        """
+        (counts, contributions by node) of a group tree, evaluated once per tree.
+        """
+        if tree not in self.trees:
+            counts, contributions, visited = {}, {}, set()
+            for node in tree.nodes:
+                if node.type == "GROUP_OUTPUT" and getattr(node, "is_active_output", True):
+                    self.walk(node, 1, counts, contributions, visited)
+            self.trees[tree] = (counts, contributions)
+        return self.trees[tree]
+
+    def material_cost(self, material):
+        """
+        Estimate of a material (dict), None if it doesn't use nodes.
+        """
+        if not material.use_nodes or not material.node_tree:
+            return None
+        counts, contributions, visited = {}, {}, set()
+        for node in material.node_tree.nodes:
+            if node.type == "OUTPUT_MATERIAL" and getattr(node, "is_active_output", True):
+                self.walk(node, 1, counts, contributions, visited)
+
+        groups = set(n.node_tree for n, _ in visited if n.type == "GROUP" and n.node_tree)
+        return {
+            "material": material.name,
+            "score": self.table.score(counts),
+            "counts": counts,
+            "nw_groups": len([ g for g in groups if NW_GarbageCollector.is_generated(g) ]),
+            "hotspots": sorted(contributions.items(), key=lambda c: -c[1])[:NW_RenderCost.hotspots]
+        }
+
+    def estimate(self, materials):
+        """
+        Estimates of all materials, most expensive first.
+        """
+        results = [ self.material_cost(m) for m in materials ]
+        return sorted((r for r in results if r), key=lambda r: -r["score"])
+
+class NW_RenderCostOperator(Operator):
+    bl_idname = "material.nw_render_cost_op"
+    bl_label = "Estimate Render Cost"
+    bl_description = "Score all materials by the nodes they evaluate, write the hotspot report to nw_render_cost.json"
+
+    def execute(self, context):
+        estimator = NW_RenderCost()
+        NW_RenderCost.report = estimator.estimate(bpy.data.materials)
+        NW_RenderCost.unit = estimator.table.unit
+
+        folder = os.path.dirname(bpy.data.filepath) or tempfile.gettempdir()
+        fileName = os.path.join(folder, "nw_render_cost.json")
+        with open(fileName, "w") as f:
+            json.dump({ "unit": estimator.table.unit, "costs": estimator.table.costs, "materials": NW_RenderCost.report }, f, indent=2)
+
+        if NW_RenderCost.report:
+            top = NW_RenderCost.report[0]
+            self.report({"INFO"}, "%d materials, most expensive %s (%.2f %s), report written to %s" % (
+                len(NW_RenderCost.report), top["material"], top["score"], estimator.table.unit, fileName))
+        else:
+            self.report({"INFO"}, "No node based materials.")
+        return{'FINISHED'}
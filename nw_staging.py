@@ -0,0 +1,326 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, json, shutil, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor
+from bpy.types import Operator
+from bpy.props import EnumProperty
+
+from . nw_cache import NW_Cache
+from . nw_preferences import NW_Preferences
+from . nw_texture_mapper import NW_TextureMapper
+from . nw_transcode import NW_Transcoder
+from . nw_texture_source import NW_HttpSource
+
+path_targets = [
+    ("CANONICAL", "Canonical", "Source files on the network, for publishing"),
+    ("STAGED", "Staged", "Local copies in the cache folder")
+]
+
+class NW_Staging:
+    """
+    Texture sets on slow network storage are copied to the cache folder
+    (staged/, one folder per source folder, so UDIM tiles stay together)
+    before their images are loaded, by a bounded pool of threads. The copies
+    are registered as substitutes (see NW_Cache.resolve()), images keep the
+    canonical file as "nw_source" and can be pointed back to it for publishing.
+    """
+    # Staged file -> [ size, mtime ] of the source it was copied from, persisted
+    # next to the cache folders (copies are touched for eviction, their own mtime
+    # tells nothing).
+    index = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def enabled():
+        prefs = NW_Preferences.get()
+        return bool(os.environ.get("NW_STAGING")) or bool(prefs and prefs.staging)
+
+    @staticmethod
+    def settings():
+        """
+        (threads, check) from the preferences.
+        """
+        prefs = NW_Preferences.get()
+        return (prefs.staging_workers, prefs.staging_check) if prefs else (8, "STAT")
+
+    @staticmethod
+    def root():
+        return os.path.join(NW_Cache.directory(), "staged")
+
+    @staticmethod
+    def library():
+        """
+        URL of the HTTP texture library, empty if none.
+        """
+        prefs = NW_Preferences.get()
+        return (os.environ.get("NW_HTTP_LIBRARY") or (prefs.http_library if prefs else "")).rstrip("/")
+
+    @staticmethod
+    def configure():
+        """
+        Main thread: plug the HTTP library (downloads go to the cache folder)
+        into the texture mapper, returns the source or None.
+        """
+        url = NW_Staging.library()
+        current = NW_TextureMapper.sources[0] if NW_TextureMapper.sources else None
+        if not url:
+            NW_TextureMapper.sources = []
+            return None
+        folder, workers = os.path.join(NW_Cache.directory(), "remote"), NW_Staging.settings()[0]
+        if not current or (current.url, current.folder, current.workers) != (url, folder, workers):
+            current = NW_HttpSource(url, folder, workers)
+            NW_TextureMapper.sources = [ current ]
+        return current
+
+    @staticmethod
+    def path(source):
+        folder = hashlib.sha1(os.path.abspath(os.path.dirname(source)).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(NW_Staging.root(), folder[:2], folder, os.path.basename(source))
+
+    @staticmethod
+    def is_staged(fileName):
+        return os.path.abspath(fileName).startswith(os.path.abspath(NW_Staging.root()) + os.sep)
+
+    @staticmethod
+    def index_file():
+        return os.path.join(NW_Cache.directory(), "staged.json")
+
+    @staticmethod
+    def load_index():
+        if NW_Staging.index is None:
+            try:
+                with open(NW_Staging.index_file()) as f:
+                    NW_Staging.index = json.load(f)
+            except (OSError, ValueError):
+                NW_Staging.index = {}
+        return NW_Staging.index
+
+    @staticmethod
+    def save_index():
+        with NW_Staging.lock:
+            # Merge with entries written by other processes meanwhile ..
+            index = NW_Staging.load_index()
+            try:
+                with open(NW_Staging.index_file()) as f:
+                    index.update({ k: v for k, v in json.load(f).items() if k not in index })
+            except (OSError, ValueError):
+                pass
+            temp = NW_Cache.temp_path(NW_Staging.index_file())
+            with open(temp, "w") as f:
+                json.dump(index, f)
+            os.replace(temp, NW_Staging.index_file())
+
+    @staticmethod
+    def file_hash(fileName):
+        h = hashlib.sha1()
+        with open(fileName, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    @staticmethod
+    def current(source, target, st, check):
+        """
+        True if target is an intact copy of source (st: stat of source).
+        """
+        if NW_Staging.load_index().get(target) != [ st.st_size, st.st_mtime_ns ]:
+            return False
+        try:
+            if os.path.getsize(target) != st.st_size:
+                return False
+        except OSError:
+            return False
+        return check != "HASH" or NW_Cache.source_hash(source) == NW_Staging.file_hash(target)
+
+    @staticmethod
+    def copy(source, check):
+        """
+        Stage a single file, returns (staged file, bytes copied) or (None, 0) on failure.
+        """
+        target = NW_Staging.path(source)
+        try:
+            st = os.stat(source)
+            if NW_Staging.current(source, target, st, check):
+                NW_Cache.touch(target)
+                return target, 0
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temp = NW_Cache.temp_path(target)
+            try:
+                shutil.copyfile(source, temp)
+                os.replace(temp, target)
+            finally:
+                if os.path.exists(temp):
+                    os.remove(temp)
+            with NW_Staging.lock:
+                NW_Staging.load_index()[target] = [ st.st_size, st.st_mtime_ns ]
+            if check == "HASH" and not NW_Staging.current(source, target, st, check):
+                return None, 0
+            return target, st.st_size
+        except OSError as e:
+            print("Node Wizard: can't stage %s: %s" % (source, e))
+            return None, 0
+
+    @staticmethod
+    def stage(files, force = False, cancelled = None):
+        """
+        Stage files (UDIM patterns expanded) if enabled (or forced) and register
+        the copies as substitutes, derived files (e.g. transcoded copies) stay
+        preferred. Copies not started when cancelled() returns True are skipped.
+        Returns (files staged, bytes copied).
+        """
+        if not force and not NW_Staging.enabled():
+            return 0, 0
+        sources = sorted(set(t for f in files for t in NW_TextureMapper.tileFiles(f).values() if not NW_Staging.is_staged(t)))
+        if not sources:
+            return 0, 0
+
+        workers, check = NW_Staging.settings()
+        NW_Staging.load_index()
+        with ThreadPoolExecutor(max_workers=min(workers, len(sources))) as pool:
+            results = list(pool.map(lambda s: (None, 0) if cancelled and cancelled() else NW_Staging.copy(s, check), sources))
+        NW_Staging.save_index()
+        NW_Cache.save_hashes()
+
+        staged = copied = 0
+        for source, (target, size) in zip(sources, results):
+            if not target:
+                continue
+            registered = NW_Cache.substitutes.get(source)
+            if not registered or NW_Staging.is_staged(registered) or not os.path.exists(registered):
+                NW_Cache.substitute(source, target)
+            staged += 1
+            copied += size
+
+        if copied:
+            NW_Cache.added()
+        return staged, copied
+
+    @staticmethod
+    def text(staged, copied):
+        return "%d maps staged locally, %.1f MB copied" % (staged, copied / (1024.0 * 1024.0))
+
+    @staticmethod
+    def local(source):
+        """
+        File to load for source, the staged (or derived) copy if registered.
+        """
+        tiles = NW_TextureMapper.tileFiles(source)
+        first = next(iter(tiles.values()), source)
+        resolved = NW_Cache.resolve(first)
+        if None in tiles or resolved == first:
+            return resolved if None in tiles else source
+        return os.path.join(os.path.dirname(resolved), os.path.basename(source))
+
+    @staticmethod
+    def image_path(image, fileName):
+        """
+        File path to set for image, tiled images of Blender 3.0 and later use the <UDIM> token.
+        """
+        tiles = NW_TextureMapper.tileFiles(fileName)
+        if None in tiles or (image.source == "TILED" and bpy.app.version >= (3, 0, 0)):
+            return fileName
+        return next(iter(tiles.values()), fileName)
+
+    @staticmethod
+    def rewrite(target):
+        """
+        Point all generated images to their canonical or staged files, returns
+        the number of images changed.
+        """
+        images = [ i for i in bpy.data.images if i.get("nw_source") and not i.packed_file ]
+        if target == "STAGED":
+            NW_Staging.stage([ i["nw_source"] for i in images ], force = True)
+
+        changed = 0
+        for image in images:
+            source = image["nw_source"]
+            path = NW_Staging.image_path(image, NW_Staging.local(source) if target == "STAGED" else source)
+            if os.path.abspath(bpy.path.abspath(image.filepath)) != os.path.abspath(path):
+                image.filepath = path
+                changed += 1
+        return changed
+
+    @staticmethod
+    def missing(fileName):
+        """
+        True if the file (or a tile of a <UDIM> file) doesn't exist.
+        """
+        tiles = NW_TextureMapper.tileFiles(fileName)
+        return not tiles or not all(os.path.exists(f) for f in tiles.values())
+
+    @staticmethod
+    def recover(images):
+        """
+        Point generated images, whose files are missing (evicted from the cache,
+        temp folder cleaned, other machine), to new ones. Staged copies are staged
+        again, transcoded and derived files are made again (see "nw_recipe"),
+        the canonical file is used otherwise. Returns the images still missing.
+        """
+        staged = [ i for i in images if NW_Staging.is_staged(bpy.path.abspath(i.filepath)) ]
+        if staged:
+            NW_Staging.stage([ i["nw_source"] for i in staged ])
+
+        lost = []
+        for image in images:
+            recipe = json.loads(image["nw_recipe"]) if "nw_recipe" in image else None
+            if recipe and recipe["kind"] == "normal":
+                # Derived normal maps are their own source, there's nothing to fall back to.
+                path = NW_Transcoder.recreate(recipe)
+                if path:
+                    image["nw_source"] = path
+            else:
+                if recipe:
+                    NW_Transcoder.recreate(recipe)
+                path = NW_Staging.local(image["nw_source"])
+            if not path or NW_Staging.missing(path):
+                lost.append(image)
+                continue
+            image.filepath = NW_Staging.image_path(image, path)
+        return lost
+
+    @staticmethod
+    @bpy.app.handlers.persistent
+    def load_post(_):
+        """
+        Generated images with missing files after loading a file get new ones (see recover()).
+        """
+        missing = [ i for i in bpy.data.images if i.get("nw_source") and not i.packed_file and
+            NW_Staging.missing(bpy.path.abspath(i.filepath)) ]
+        for image in NW_Staging.recover(missing) if missing else []:
+            print("Node Wizard: can't recover %s (%s)" % (image.name, image.filepath))
+
+    @staticmethod
+    def enable(state):
+        handlers = bpy.app.handlers.load_post
+        if state and NW_Staging.load_post not in handlers:
+            handlers.append(NW_Staging.load_post)
+        elif not state and NW_Staging.load_post in handlers:
+            handlers.remove(NW_Staging.load_post)
+
+class NW_RewritePathsOperator(Operator):
+    bl_idname = "material.nw_rewrite_paths_op"
+    bl_label = "Rewrite Image Paths"
+    bl_description = "Point all generated images to their canonical network files (for publishing) or to local staged copies"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    target: EnumProperty(name="Target", items=path_targets)
+
+    def execute(self, context):
+        changed = NW_Staging.rewrite(self.target)
+        self.report({"INFO"}, "%d images pointed to %s files." % (changed, "canonical" if self.target == "CANONICAL" else "staged"))
+        return{'FINISHED'}
@@ -14,12 +14,14 @@
 # along with this program; if not, write to the Free Software Foundation,
 # Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
 
-import os
+import os, re
 
 class NW_TextureMapper:
     """
     Automatically map different types of textures based on the ending of the core file name.
     /path/to/file/xxxEXT.jpg/png
+    UDIM tiles (/path/to/file/xxxEXT.1001.png, or _1001) are mapped to one file name
+    with a <UDIM> token instead of the tile number.
     Below the known extensions, feel free to add more.
     """
     diffuse_ext = "basecolor,base_color,diffuse,diff,albedo,col,color".split(",")
@@ -30,6 +32,42 @@ class NW_TextureMapper:
     metal_ext = "metal,metallic".split(",")
     height_ext = "hgt,height".split(",")
 
+    # File types considered when scanning whole folders.
+    image_ext = ".png,.jpg,.jpeg,.tif,.tiff,.exr,.tga,.bmp,.hdr,.webp".split(",")
+
+    # UDIM tile number (or token) at the end of the core file name.
+    udim_token = "<UDIM>"
+    tile_re = re.compile(r"^(.+)([._])(1\d\d\d|<UDIM>)$")
+
+    # All map types, named as the attributes holding the file names.
+    map_types = "diffuse,specular,roughness,gloss,normal,metal,height".split(",")
+
+    # Pluggable sources for folders that aren't local (e.g. NW_HttpSource),
+    # objects with handles(path), listdir(path), walk(path) and fetch(files).
+    sources = []
+
+    @staticmethod
+    def source(path):
+        """
+        Source serving path, None for local files.
+        """
+        for s in NW_TextureMapper.sources:
+            if s.handles(path):
+                return s
+        return None
+
+    @staticmethod
+    def listdir(path):
+        s = NW_TextureMapper.source(path)
+        return s.listdir(path) if s else os.listdir(path)
+
+    @staticmethod
+    def join(path, name):
+        """
+        os.path.join(), but URLs keep "/" on every platform.
+        """
+        return "%s/%s" % (path.rstrip("/"), name) if NW_TextureMapper.source(path) else os.path.join(path, name)
+
     def endsWithAny(self, name, exts):
         """
         Check if name ends with any of the exts given.
@@ -46,11 +84,12 @@ class NW_TextureMapper:
         """
         # print("Parse '%s' for '%s'" % (path, baseName))
         self.baseName = baseName.strip("_")
-        for f in os.listdir(path):
-            fullName = os.path.join(path, f)
+        self.path = path
+        for f in self.listdir(path):
+            fullName = self.join(path, f)
             name = os.path.split(f)[1]
             if name.startswith(baseName):
-                bName = os.path.splitext(name)[0]
+                bName, fullName = self.splitTile(fullName)
                 if (self.endsWithAny(bName, self.diffuse_ext)):
                     self.diffuse = fullName
                 elif (self.endsWithAny(bName, self.spec_ext)):
@@ -68,21 +107,149 @@ class NW_TextureMapper:
 
         self.valid = self.diffuse != None
 
-    def __init__(self, image):
+    @staticmethod
+    def splitTile(fileName):
+        """
+        Return (core name without tile number, file name), the latter with
+        <UDIM> instead of the tile number for UDIM tiles.
+        """
+        path, name = os.path.split(fileName)
+        bName, ext = os.path.splitext(name)
+        m = NW_TextureMapper.tile_re.match(bName)
+        if not m:
+            return (bName, fileName)
+        return (m.group(1), NW_TextureMapper.join(path, m.group(1) + m.group(2) + NW_TextureMapper.udim_token + ext))
+
+    @staticmethod
+    def tileFiles(fileName):
+        """
+        Return dict tile number -> file of a <UDIM> file name, { None: fileName } for plain files.
+        """
+        if NW_TextureMapper.udim_token not in fileName:
+            return { None: fileName }
+        path, name = os.path.split(fileName)
+        prefix, suffix = name.split(NW_TextureMapper.udim_token)
+        tiles = {}
+        try:
+            for f in NW_TextureMapper.listdir(path):
+                tile = f[len(prefix):len(f) - len(suffix)]
+                if f.startswith(prefix) and f.endswith(suffix) and len(tile) == 4 and tile.isdigit():
+                    tiles[int(tile)] = NW_TextureMapper.join(path, f)
+        except OSError:
+            pass
+        return dict(sorted(tiles.items()))
+
+    def __init__(self, image = None):
         """
         CTor, create mapping from any selected texture (independent to ext).
         """
         # Default values.
         self.valid = False
+        self.path = self.baseName = None
         self.diffuse = self.specular = self.roughness = self.gloss = self.normal = self.metal = self.height = None
+        if not image:
+            return
 
         # Prepare search.
-        path, name = os.path.split(image)
-        baseName = os.path.splitext(name)[0]
+        path = os.path.split(image)[0]
+        baseName = self.splitTile(image)[0]
         allExt = self.diffuse_ext + self.spec_ext + self.rough_ext + self.gloss_ext + self.normal_ext + self.metal_ext + self.height_ext
 
         # Check if selected texture matches at least any of the valid extensions.
         for ext in allExt:
             if baseName.lower().endswith(ext):
                 self.parseTextures(path, baseName[0:-len(ext)])
-                break
\ No newline at end of file
+                break
+        NW_TextureMapper.localize([ self ])
+
+    def maps(self):
+        """
+        Return dict of all found map types and their file names.
+        """
+        return { t: getattr(self, t) for t in self.map_types if getattr(self, t) != None }
+
+    def files(self):
+        """
+        Return dict of all found map types and the list of their files (all tiles for UDIM maps).
+        """
+        return { t: list(self.tileFiles(f).values()) for t, f in self.maps().items() }
+
+    def isTiled(self):
+        return any(self.udim_token in f for f in self.maps().values())
+
+    @staticmethod
+    def classify(fileName):
+        """
+        Return (baseName, map type) of a texture file, None if the ending is unknown.
+        Same precedence as parseTextures.
+        """
+        baseName = NW_TextureMapper.splitTile(fileName)[0]
+        lower = baseName.lower()
+        m = NW_TextureMapper
+        for key, exts in [ ("diffuse", m.diffuse_ext), ("specular", m.spec_ext), ("roughness", m.rough_ext),
+            ("gloss", m.gloss_ext), ("normal", m.normal_ext), ("metal", m.metal_ext), ("height", m.height_ext) ]:
+            for ext in exts:
+                if lower.endswith(ext):
+                    return (baseName[0:-len(ext)], key)
+        return None
+
+    @staticmethod
+    def fromMaps(path, baseName, maps):
+        """
+        Create mapper from already known files (dict map type -> file), no folder scan.
+        """
+        mapper = NW_TextureMapper()
+        mapper.path = path
+        mapper.baseName = baseName.strip("_")
+        for key, fileName in maps.items():
+            setattr(mapper, key, fileName)
+        mapper.valid = mapper.diffuse != None
+        return mapper
+
+    @staticmethod
+    def localize(mappers):
+        """
+        Download the maps of mappers served by a source (all at once) and
+        replace them by the local files. Sets losing their diffuse map get invalid.
+        """
+        remote = {}
+        for mapper in mappers:
+            for fileName in mapper.maps().values():
+                s = NW_TextureMapper.source(fileName)
+                if s:
+                    remote.setdefault(s, set()).update(NW_TextureMapper.tileFiles(fileName).values())
+        if not remote:
+            return
+
+        local = {}
+        for s, files in remote.items():
+            local.update(s.fetch(files))
+        for mapper in mappers:
+            for key, fileName in mapper.maps().items():
+                if not NW_TextureMapper.source(fileName):
+                    continue
+                first = next(iter(NW_TextureMapper.tileFiles(fileName).values()), None)
+                if first in local:
+                    setattr(mapper, key, os.path.join(os.path.dirname(local[first]), os.path.basename(fileName)))
+                else:
+                    setattr(mapper, key, None)
+            if mapper.diffuse:
+                mapper.path = os.path.dirname(mapper.diffuse)
+            mapper.valid = mapper.diffuse != None
+
+    @staticmethod
+    def scanSets(files):
+        """
+        Group a list of texture files to sets, returns mappers of all valid sets.
+        """
+        sets = {}
+        for fileName in files:
+            if os.path.splitext(fileName)[1].lower() not in NW_TextureMapper.image_ext:
+                continue
+            match = NW_TextureMapper.classify(fileName)
+            if match:
+                path = os.path.dirname(fileName)
+                sets.setdefault((path, match[0]), {}).setdefault(match[1], NW_TextureMapper.splitTile(fileName)[1])
+
+        mappers = [ NW_TextureMapper.fromMaps(path, baseName, maps) for (path, baseName), maps in sorted(sets.items()) ]
+        return [ m for m in mappers if m.valid ]
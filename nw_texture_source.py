@@ -0,0 +1,230 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+# No bpy in here, used by tools/nw_http_server.py (self check) as well.
+import os, json, time, queue, hashlib, threading, http.client
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, quote
+
+class NW_HttpPool:
+    """
+    Keep-alive connections to one server, reused by all threads (HTTP/1.1).
+    """
+    def __init__(self, url, size, timeout = 60.0):
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host, self.port = parts.hostname, parts.port
+        self.timeout = timeout
+        self.idle = queue.LifoQueue(size)
+        self.opened = 0
+
+    def connect(self):
+        self.opened += 1
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, path, headers = {}):
+        """
+        GET path, returns (status, headers, body). A stale idle connection
+        (closed by the server) is replaced once.
+        """
+        for attempt in range(2):
+            try:
+                connection = self.idle.get_nowait()
+            except queue.Empty:
+                connection = self.connect()
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                connection.close()
+            else:
+                try:
+                    self.idle.put_nowait(connection)
+                except queue.Full:
+                    connection.close()
+            return response.status, response.headers, body
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+class NW_HttpSource:
+    """
+    Texture library served over HTTP. The server provides a JSON index at
+    <url>/index.json:
+
+        { "files": [ { "path": "wood/oak_basecolor.png", "size": 123, "mtime": 1690000000.0 }, .. ] }
+
+    Files are addressed by URL (<url>/<path>), folders are listed from the
+    index. Only the maps actually used are downloaded (fetch()), big files in
+    parallel byte ranges, into a local folder (one sub folder per remote
+    folder, so UDIM tiles stay together). Downloads are current while the
+    index reports the size and mtime they were fetched with.
+    """
+    # Bytes per range request and seconds the index is kept in memory.
+    chunk = 8 * 1024 * 1024
+    index_ttl = 60.0
+
+    def __init__(self, url, folder, workers = 8):
+        self.url = url.rstrip("/")
+        self.folder = folder
+        self.workers = workers
+        self.pool = NW_HttpPool(self.url, workers)
+        self.files = None
+        self.loaded = 0
+        self.meta = None
+        self.lock = threading.Lock()
+
+        # Whether the server answers range requests, probed once.
+        self.ranges = None
+
+    def handles(self, path):
+        return path == self.url or path.startswith(self.url + "/")
+
+    def request_path(self, url):
+        return quote(urlsplit(url).path)
+
+    def index(self):
+        """
+        Dict URL -> (size, mtime) of all files, from the (cached) index.
+        """
+        if self.files is None or time.time() - self.loaded > NW_HttpSource.index_ttl:
+            status, _, body = self.pool.request(self.request_path(self.url + "/index.json"))
+            if status != 200:
+                raise OSError("%s/index.json: HTTP %d" % (self.url, status))
+            entries = json.loads(body.decode("utf-8"))["files"]
+            self.files = { "%s/%s" % (self.url, e["path"].lstrip("/")): (e["size"], e.get("mtime", 0)) for e in entries }
+            self.loaded = time.time()
+        return self.files
+
+    def listdir(self, path):
+        """
+        Names in the remote folder path (files only, like a flat os.listdir()).
+        """
+        prefix = path.rstrip("/") + "/"
+        return [ f[len(prefix):] for f in self.index() if f.startswith(prefix) and "/" not in f[len(prefix):] ]
+
+    def walk(self, path):
+        """
+        URLs of all files below the remote folder path.
+        """
+        prefix = path.rstrip("/") + "/"
+        return sorted(f for f in self.index() if f.startswith(prefix))
+
+    def local(self, url):
+        folder = hashlib.sha1(url.rsplit("/", 1)[0].encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.folder, folder[:2], folder, url.rsplit("/", 1)[1])
+
+    def meta_file(self):
+        return self.folder.rstrip(os.sep) + ".json"
+
+    def load_meta(self):
+        if self.meta is None:
+            try:
+                with open(self.meta_file()) as f:
+                    self.meta = json.load(f)
+            except (OSError, ValueError):
+                self.meta = {}
+        return self.meta
+
+    def save_meta(self):
+        with self.lock:
+            temp = "%s.%d.tmp" % (self.meta_file(), os.getpid())
+            with open(temp, "w") as f:
+                json.dump(self.meta, f)
+            os.replace(temp, self.meta_file())
+
+    def current(self, url, target):
+        size, mtime = self.index()[url]
+        try:
+            return self.load_meta().get(target) == [ size, mtime ] and os.path.getsize(target) == size
+        except OSError:
+            return False
+
+    def fetch(self, urls):
+        """
+        Download the files (URLs) not cached yet, returns dict URL -> local
+        file (failed ones are missing).
+        """
+        index = self.index()
+        urls = sorted(set(u for u in urls if u in index))
+        todo = [ u for u in urls if not self.current(u, self.local(u)) ]
+
+        big = [ u for u in todo if index[u][0] > NW_HttpSource.chunk ]
+        if big and self.ranges is None:
+            self.ranges = self.safe(lambda u: self.pool.request(self.request_path(u), { "Range": "bytes=0-0" })[0] == 206, big[0])
+
+        # One task per byte range (whole files without range support), all files at once.
+        tasks, temps = [], {}
+        for url in todo:
+            size = index[url][0]
+            target = self.local(url)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temps[url] = "%s.%d.%d.tmp" % (target, os.getpid(), threading.get_ident())
+            with open(temps[url], "wb") as f:
+                f.truncate(size)
+            if size > NW_HttpSource.chunk and self.ranges:
+                tasks += [ (url, start, min(start + NW_HttpSource.chunk, size) - 1) for start in range(0, size, NW_HttpSource.chunk) ]
+            else:
+                tasks.append((url, None, None))
+
+        def run(task):
+            url, first, last = task
+            if first is None:
+                status, _, body = self.pool.request(self.request_path(url))
+                ok = status == 200 and len(body) == index[url][0]
+            else:
+                status, _, body = self.pool.request(self.request_path(url), { "Range": "bytes=%d-%d" % (first, last) })
+                ok = status == 206 and len(body) == last - first + 1
+            if ok:
+                with open(temps[url], "r+b") as f:
+                    f.seek(first or 0)
+                    f.write(body)
+            return ok
+
+        failed = set()
+        if tasks:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+                for task, ok in zip(tasks, pool.map(lambda t: self.safe(run, t), tasks)):
+                    if not ok:
+                        failed.add(task[0])
+
+        meta = self.load_meta()
+        for url in todo:
+            if url in failed:
+                os.remove(temps[url])
+                print("Node Wizard: can't download %s" % url)
+                continue
+            os.replace(temps[url], self.local(url))
+            with self.lock:
+                meta[self.local(url)] = list(index[url])
+        if todo:
+            self.save_meta()
+        return { u: self.local(u) for u in urls if u not in failed }
+
+    @staticmethod
+    def safe(run, task):
+        try:
+            return run(task)
+        except (OSError, http.client.HTTPException):
+            return False
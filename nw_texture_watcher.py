@@ -0,0 +1,168 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, json
+
+from . nw_texture_mapper import NW_TextureMapper
+from . nw_material_builder import NW_MaterialBuilder
+from . nw_cache import NW_Cache
+from . nw_staging import NW_Staging
+
+class NW_TextureWatcher:
+    """
+    Keeps generated groups in sync with their texture files. Every generated tree
+    records its source files (path, mtime, size), a timer polls them and reloads
+    changed images in place. Map types added next to the sources later on are
+    patched into the existing tree.
+    """
+    interval = 2.0
+
+    @staticmethod
+    def stat(fileName):
+        """
+        Return (mtime, size) of the file or None, if not accessible.
+        UDIM file names give the latest mtime and total size of all tiles.
+        """
+        if NW_TextureMapper.udim_token in fileName:
+            stats = [ NW_TextureWatcher.stat(f) for f in NW_TextureMapper.tileFiles(fileName).values() ]
+            stats = [ st for st in stats if st ]
+            return (max(st[0] for st in stats), sum(st[1] for st in stats)) if stats else None
+        try:
+            st = os.stat(fileName)
+            return (st.st_mtime, st.st_size)
+        except OSError:
+            return None
+
+    @staticmethod
+    def record(tree, maps, mode, decal):
+        """
+        Store the source files (dict map type -> file) of a generated tree.
+        """
+        sources = {}
+        for key, fileName in maps.items():
+            st = NW_TextureWatcher.stat(fileName)
+            if st:
+                sources[key] = { "path": fileName, "mtime": st[0], "size": st[1] }
+
+        directory = os.path.dirname(maps["diffuse"])
+        st = NW_TextureWatcher.stat(directory)
+        tree["nw_sources"] = json.dumps({
+            "mode": mode,
+            "decal": decal,
+            "directory": directory,
+            "dirMtime": st[0] if st else 0,
+            "maps": sources
+        })
+
+    @staticmethod
+    def sources(tree):
+        """
+        Return the recorded sources of a tree or None, if not generated by us.
+        """
+        try:
+            return json.loads(tree.get("nw_sources", ""))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def poll():
+        """
+        Timer callback, stats all tracked files (each only once), reloads
+        changed images and patches new map types.
+        """
+        tracked = []
+        for tree in bpy.data.node_groups:
+            info = NW_TextureWatcher.sources(tree)
+            if info:
+                tracked.append((tree, info))
+
+        # Batch all stat calls, files and folders are often shared between trees.
+        stats = {}
+        for _, info in tracked:
+            for fileName in [ m["path"] for m in info["maps"].values() ] + [ info["directory"] ]:
+                if fileName not in stats:
+                    stats[fileName] = NW_TextureWatcher.stat(fileName)
+
+        changed = set()
+        for tree, info in tracked:
+            dirty = False
+            for m in info["maps"].values():
+                st = stats[m["path"]]
+                if st and (st[0] != m["mtime"] or st[1] != m["size"]):
+                    m["mtime"], m["size"] = st
+                    changed.add(m["path"])
+                    dirty = True
+
+            # Only search for new map types if the folder content changed.
+            st = stats[info["directory"]]
+            if st and st[0] != info["dirMtime"]:
+                info["dirMtime"] = st[0]
+                dirty = True
+                if info["mode"] == "PBR":
+                    NW_TextureWatcher.patch(tree, info)
+
+            if dirty:
+                tree["nw_sources"] = json.dumps(info)
+
+        if changed:
+            # Transcoded copies are outdated now, staged copies are refreshed.
+            for source in changed:
+                NW_Cache.substitutes.pop(source, None)
+            NW_Staging.stage(changed)
+            for image in bpy.data.images:
+                source = image.get("nw_source")
+                if source in changed:
+                    if image.source != "TILED":
+                        image.filepath = NW_Cache.resolve(source)
+                    image.reload()
+
+        return NW_TextureWatcher.interval
+
+    @staticmethod
+    def patch(tree, info):
+        """
+        Add map types, which showed up after generation, to the tree.
+        """
+        diffuse = info["maps"].get("diffuse")
+        if not diffuse:
+            return
+
+        mapper = NW_TextureMapper(diffuse["path"])
+        if not mapper.valid:
+            return
+
+        # Maps without files yet (UDIM pattern without tiles) are added later.
+        for key, fileName in mapper.maps().items():
+            if not NW_TextureMapper.tileFiles(fileName):
+                setattr(mapper, key, None)
+
+        added = NW_MaterialBuilder().patch_pbr_setup(tree, mapper, info["maps"].keys(), info["decal"])
+        for key in added:
+            fileName = getattr(mapper, key)
+            st = NW_TextureWatcher.stat(fileName)
+            if st:
+                info["maps"][key] = { "path": fileName, "mtime": st[0], "size": st[1] }
+
+    @staticmethod
+    def enable(state):
+        """
+        Start or stop polling.
+        """
+        registered = bpy.app.timers.is_registered(NW_TextureWatcher.poll)
+        if state and not registered:
+            bpy.app.timers.register(NW_TextureWatcher.poll, first_interval=NW_TextureWatcher.interval, persistent=True)
+        elif not state and registered:
+            bpy.app.timers.unregister(NW_TextureWatcher.poll)
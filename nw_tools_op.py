@@ -16,34 +16,36 @@
 
 import bpy
 from bpy.types import Operator
-from bpy.props import StringProperty
+from bpy.props import StringProperty, EnumProperty
 
 from . nw_node_utils import NW_NodeUtils
+from . nw_node_spec import NW_NodeSpec, NW_SpecCompiler
 
-class NW_NormalScalerOperator(Operator, NW_NodeUtils):
+class NW_NormalScalerOperator(Operator, NW_SpecCompiler):
     bl_idname = "material.nw_normal_scaler_op"
     bl_label = "Create Normal Scaler"
     bl_description = "Generates a setup to scale a normal and plugs it to the Normal output of all selected nodes."
     bl_options = {'REGISTER', 'UNDO'}
 
-    def fill_normal_scaler(self, group, input, output):
-        tree = group.node_tree
+    @staticmethod
+    def normal_scaler_spec():
+        spec = NW_NodeSpec("NW Normal Scaler", 5)
 
-        separate = self.at(tree.nodes.new("ShaderNodeSeparateXYZ"), 1, 0)
-        mul = self.at(self.create_math_node(tree, "MULTIPLY"), 2, -1)
-        combine = self.at(tree.nodes.new("ShaderNodeCombineXYZ"), 3, 0)
-        norm = self.at(tree.nodes.new("ShaderNodeVectorMath"), 4, 0)
-        norm.operation = "NORMALIZE"
+        separate = spec.node("ShaderNodeSeparateXYZ", 1, 0)
+        mul = spec.math("MULTIPLY", 2, -1)
+        combine = spec.node("ShaderNodeCombineXYZ", 3, 0)
+        norm = spec.node("ShaderNodeVectorMath", 4, 0, { "operation": "NORMALIZE" })
 
-        tree.links.new(separate.outputs["X"], combine.inputs["X"])
-        tree.links.new(separate.outputs["Y"], combine.inputs["Y"])
-        tree.links.new(separate.outputs["Z"], mul.inputs[0])
-        tree.links.new(mul.outputs["Value"], combine.inputs["Z"])
-        tree.links.new(combine.outputs["Vector"], norm.inputs[0])
+        spec.link((separate, "X"), (combine, "X"))
+        spec.link((separate, "Y"), (combine, "Y"))
+        spec.link((separate, "Z"), (mul, 0))
+        spec.link((mul, "Value"), (combine, "Z"))
+        spec.link((combine, "Vector"), (norm, 0))
 
-        tree.links.new(self.create_group_input(group, input, "Vector", "Vector"), separate.inputs["Vector"])
-        tree.links.new(self.create_group_input(group, input, "Float", "Scale", 1.0), mul.inputs[1])
-        tree.links.new(norm.outputs["Vector"], self.create_group_output(group, output, "Vector", "Vector"))
+        spec.link(spec.input("Vector", "Vector"), (separate, "Vector"))
+        spec.link(spec.input("Float", "Scale", 1.0), (mul, 1))
+        spec.link((norm, "Vector"), spec.output("Vector", "Vector"))
+        return spec
 
     def execute(self, context):
         # Access the current tree.
@@ -54,11 +56,13 @@ class NW_NormalScalerOperator(Operator, NW_NodeUtils):
             self.report({"ERROR"}, "No node with Normal output selected.")
             return{'CANCELLED'}
 
+        # All scalers share the same tree.
+        scaler = self.compile(self.normal_scaler_spec())
+
         for candidate in validNodes:
             # Create a node for this one.
-            group, input, output = self.create_group(tree, "NW Normal Scaler", 5)
+            group = self.instance(tree, scaler)
             group.location = candidate.location.x + self.gridSizeX, candidate.location.y
-            self.fill_normal_scaler(group, input, output)
 
             # Rebuild mapping.
             self.remap_output_links(tree, candidate, "Normal", group, "Vector")
@@ -66,26 +70,28 @@ class NW_NormalScalerOperator(Operator, NW_NodeUtils):
 
         return{'FINISHED'}
 
-class NW_DX2OGLConverterOperator(Operator, NW_NodeUtils):
+class NW_DX2OGLConverterOperator(Operator, NW_SpecCompiler):
     bl_idname = "material.nw_dx2ogl_converter_op"
     bl_label = "Create DX2OGL Normal Converter"
     bl_description = "Generates a setup to convert DirectX normal maps to OpenGL(Blender) normal maps and plugs it to the Color output of all selected nodes."
     bl_options = {'REGISTER', 'UNDO'}
 
-    def fill_dx2ogl_converter(self, group, input, output):
-        tree = group.node_tree
+    @staticmethod
+    def dx2ogl_converter_spec():
+        spec = NW_NodeSpec("NW DX 2 OGL Converter", 5)
 
-        separate = self.at(tree.nodes.new("ShaderNodeSeparateXYZ"), 1, 0)
-        sub = self.at(self.create_math_node(tree, "SUBTRACT", def0 = 1.0), 2, -1)
-        combine = self.at(tree.nodes.new("ShaderNodeCombineXYZ"), 3, 0)
+        separate = spec.node("ShaderNodeSeparateXYZ", 1, 0)
+        sub = spec.math("SUBTRACT", 2, -1, def0 = 1.0)
+        combine = spec.node("ShaderNodeCombineXYZ", 3, 0)
 
-        tree.links.new(separate.outputs["X"], combine.inputs["X"])
-        tree.links.new(separate.outputs["Y"], sub.inputs[1])
-        tree.links.new(sub.outputs["Value"], combine.inputs["Y"])
-        tree.links.new(separate.outputs["Z"], combine.inputs["Z"])
+        spec.link((separate, "X"), (combine, "X"))
+        spec.link((separate, "Y"), (sub, 1))
+        spec.link((sub, "Value"), (combine, "Y"))
+        spec.link((separate, "Z"), (combine, "Z"))
 
-        tree.links.new(self.create_group_input(group, input, "Vector", "Vector"), separate.inputs["Vector"])
-        tree.links.new(combine.outputs["Vector"], self.create_group_output(group, output, "Vector", "Vector"))
+        spec.link(spec.input("Vector", "Vector"), (separate, "Vector"))
+        spec.link((combine, "Vector"), spec.output("Vector", "Vector"))
+        return spec
 
     def execute(self, context):
         # Access the current tree.
@@ -96,11 +102,13 @@ class NW_DX2OGLConverterOperator(Operator, NW_NodeUtils):
             self.report({"ERROR"}, "No node with Color output selected.")
             return{'CANCELLED'}
 
+        # All converters share the same tree.
+        converter = self.compile(self.dx2ogl_converter_spec())
+
         for candidate in validNodes:
             # Create a node for this one.
-            group, input, output = self.create_group(tree, "NW DX 2 OGL Converter", 5)
+            group = self.instance(tree, converter)
             group.location = candidate.location.x + self.gridSizeX, candidate.location.y
-            self.fill_dx2ogl_converter(group, input, output)
 
             # Rebuild mapping.
             self.remap_output_links(tree, candidate, "Color", group, "Vector")
@@ -108,33 +116,75 @@ class NW_DX2OGLConverterOperator(Operator, NW_NodeUtils):
 
         return{'FINISHED'}      
 
-class NW_GenerateTwoLayerTextureBasedSetupOperator(Operator, NW_NodeUtils):
-    bl_idname = "material.nw_generate_two_layer_texture_based_setup_op"
-    bl_label = "Two Layers, Texture based"
-    bl_description = "Generates setup that mixes two selected material nodes using a mask and adds a height shift between both (Texture based)."
-    bl_options = {'REGISTER', 'UNDO'}
-
-    def create_optional_mix(self, tree, gridX, gridY, nodes, name, factorSocket, targetSocket, defValue):
-        # expected to be 2 entries ...
-        n0 = nodes[0].outputs[name] if nodes[0].outputs.find(name) != -1 else None
-        n1 = nodes[1].outputs[name] if nodes[1].outputs.find(name) != -1 else None
-        
-        if n0 or n1:
-            mix = self.at(tree.nodes.new("ShaderNodeMixRGB"), gridX, gridY)
-            tree.links.new(factorSocket, mix.inputs["Fac"])
-            if targetSocket:
-                tree.links.new(mix.outputs["Color"], targetSocket)
-            if n0:
-                tree.links.new(n0, mix.inputs[1])
+class NW_LayerMixer(NW_NodeUtils):
+    """
+    Channel wise mixing of generated material groups (Base Color, Metallic, ..),
+    the result feeds a single Principled BSDF.
+    """
+
+    def create_optional_mix(self, tree, gridX, gridY, nodes, name, factorSockets, targetSocket, defValue):
+        """
+        Mix output name of all nodes bottom up, layer n + 1 is mixed over the
+        result using factorSockets[n]. Layers without that output use defValue.
+        Returns the resulting socket, None if no node has this output.
+        """
+        sockets = [ n.outputs[name] if n.outputs.find(name) != -1 else None for n in nodes ]
+        if not any(sockets):
+            return None
+
+        result = sockets[0]
+        for index, socket in enumerate(sockets[1:]):
+            mix = self.at(tree.nodes.new("ShaderNodeMixRGB"), gridX + index, gridY)
+            tree.links.new(factorSockets[index], mix.inputs["Fac"])
+            if result:
+                tree.links.new(result, mix.inputs[1])
             else: 
                 mix.inputs[1].default_value = defValue
-            if n1:
-                tree.links.new(n1, mix.inputs[2])
+            if socket:
+                tree.links.new(socket, mix.inputs[2])
             else: 
                 mix.inputs[2].default_value = defValue
-            return mix.outputs["Color"]
-
-        return None
+            result = mix.outputs["Color"]
+
+        if targetSocket:
+            tree.links.new(result, targetSocket)
+        return result
+
+    def create_mask(self, tree, gridX, gridY, index = 0):
+        """
+        Create default mask (noise with a hard step), returns the mask socket.
+        Masks with different index cover different areas.
+        """
+        noise = self.at(tree.nodes.new("ShaderNodeTexNoise"), gridX, gridY)
+        # Another slice of 4D noise per mask (Blender 2.81), a bigger scale before.
+        if index and bpy.app.version >= (2, 81, 0):
+            noise.noise_dimensions = "4D"
+            noise.inputs["W"].default_value = 10.0 * index
+        elif index:
+            noise.inputs["Scale"].default_value *= 1.0 + 0.37 * index
+        ramp = self.at(tree.nodes.new("ShaderNodeValToRGB"), gridX + 2, gridY)
+        ramp.color_ramp.elements[0].position = 0.499
+        ramp.color_ramp.elements[1].position = 0.501
+        tree.links.new(noise.outputs["Fac"], ramp.inputs["Fac"])
+        return ramp.outputs["Color"]
+
+    def create_channel_mixes(self, tree, gridX, gridY, nodes, masks, shader):
+        """
+        Mix all PBR channels of nodes into shader, returns the mixed normal (or None)
+        and the next free grid row.
+        """
+        if self.create_optional_mix(tree, gridX, gridY, nodes, "Base Color", masks, shader.inputs["Base Color"], (0.8, 0.8, 0.8, 0)): gridY -= 1
+        if self.create_optional_mix(tree, gridX, gridY, nodes, "Metallic", masks, shader.inputs["Metallic"], (0, 0, 0, 0)): gridY -= 1
+        if self.create_optional_mix(tree, gridX, gridY, nodes, "Specular", masks, shader.inputs["Specular"], (0.5, 0.5, 0.5, 0)): gridY -= 1
+        if self.create_optional_mix(tree, gridX, gridY, nodes, "Roughness", masks, shader.inputs["Roughness"], (0.5, 0.5, 0.5, 0)): gridY -= 1
+        normal = self.create_optional_mix(tree, gridX, gridY, nodes, "Normal", masks, None, (0.0, 0.0, 1, 0))
+        return normal, gridY
+
+class NW_GenerateTwoLayerTextureBasedSetupOperator(Operator, NW_LayerMixer):
+    bl_idname = "material.nw_generate_two_layer_texture_based_setup_op"
+    bl_label = "Two Layers, Texture based"
+    bl_description = "Generates setup that mixes two selected material nodes using a mask and adds a height shift between both (Texture based)."
+    bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
         # Access the current tree.
@@ -150,22 +200,12 @@ class NW_GenerateTwoLayerTextureBasedSetupOperator(Operator, NW_NodeUtils):
         else:
             self.baseX, self.baseY = selected[1].location.x + self.gridSizeX, selected[1].location.y - self.gridSizeY
 
-        noise = self.at(tree.nodes.new("ShaderNodeTexNoise"), -2, 0)
-        ramp = self.at(tree.nodes.new("ShaderNodeValToRGB"), 0, 0)
-        ramp.color_ramp.elements[0].position = 0.499
-        ramp.color_ramp.elements[1].position = 0.501
-        tree.links.new(noise.outputs["Fac"], ramp.inputs["Fac"])
+        mask = self.create_mask(tree, -2, 0)
         bump = self.at(tree.nodes.new("ShaderNodeBump"), 2, 0)
-        tree.links.new(ramp.outputs["Color"], bump.inputs["Height"])
+        tree.links.new(mask, bump.inputs["Height"])
         shader = self.at(tree.nodes.new("ShaderNodeBsdfPrincipled"), 7, 0)
 
-        gridY = 2
-        if self.create_optional_mix(tree, 3, gridY, selected, "Base Color", ramp.outputs["Color"], shader.inputs["Base Color"], (0.8, 0.8, 0.8, 0)): gridY -= 1
-        if self.create_optional_mix(tree, 3, gridY, selected, "Metallic", ramp.outputs["Color"], shader.inputs["Metallic"], (0, 0, 0, 0)): gridY -= 1
-        if self.create_optional_mix(tree, 3, gridY, selected, "Specular", ramp.outputs["Color"], shader.inputs["Specular"], (0.5, 0.5, 0.5, 0)): gridY -= 1
-        if self.create_optional_mix(tree, 3, gridY, selected, "Roughness", ramp.outputs["Color"], shader.inputs["Roughness"], (0.5, 0.5, 0.5, 0)): gridY -= 1
-        
-        normal = self.create_optional_mix(tree, 3, gridY, selected, "Normal", ramp.outputs["Color"], None, (0.0, 0.0, 1, 0))
+        normal, gridY = self.create_channel_mixes(tree, 3, 2, selected, [ mask ], shader)
         if normal:
             geom = self.at(tree.nodes.new("ShaderNodeNewGeometry"), 4, 2)
             vmath = self.at(tree.nodes.new("ShaderNodeVectorMath"), 5, 1)
@@ -182,45 +222,81 @@ class NW_GenerateTwoLayerTextureBasedSetupOperator(Operator, NW_NodeUtils):
 
         return{'FINISHED'}   
 
-class NW_GenerateTwoLayerShaderBasedSetupOperator(Operator, NW_NodeUtils):
+class NW_GenerateLayerStackOperator(Operator, NW_LayerMixer):
+    bl_idname = "material.nw_generate_layer_stack_op"
+    bl_label = "Layer Stack"
+    bl_description = "Stacks any number of selected material nodes (top node is the lowest layer) with a mask per layer, all channels are mixed into a single Principled BSDF"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # Outputs of generated material groups.
+    channels = [ "Base Color", "Metallic", "Specular", "Roughness", "Normal" ]
+
+    def execute(self, context):
+        # Access the current tree.
+        tree = context.space_data.edit_tree
+
+        layers = [ n for n in self.get_selected_nodes(tree) if any(n.outputs.find(c) != -1 for c in self.channels) ]
+        if len(layers) < 2:
+            self.report({"ERROR"}, "Select at least two generated materials.")
+            return{'CANCELLED'}
+        layers.sort(key=lambda n: -n.location.y)
+
+        self.baseX = max(n.location.x for n in layers) + self.gridSizeX
+        self.baseY = layers[0].location.y - self.gridSizeY
+
+        # One mask per layer above the first, each adds a height shift.
+        masks = [ self.create_mask(tree, -2, -2 * index, index) for index in range(len(layers) - 1) ]
+        gridX = 3 + len(masks)
+        shader = self.at(tree.nodes.new("ShaderNodeBsdfPrincipled"), gridX + 2, 0)
+
+        normal, gridY = self.create_channel_mixes(tree, 3, 2, layers, masks, shader)
+        for index, mask in enumerate(masks):
+            bump = self.at(tree.nodes.new("ShaderNodeBump"), gridX + index * 0.5, gridY - 1 - index)
+            tree.links.new(mask, bump.inputs["Height"])
+            if normal:
+                tree.links.new(normal, bump.inputs["Normal"])
+            normal = bump.outputs["Normal"]
+        tree.links.new(normal, shader.inputs["Normal"])
+
+        return{'FINISHED'}
+
+class NW_GenerateTwoLayerShaderBasedSetupOperator(Operator, NW_SpecCompiler):
     bl_idname = "material.nw_generate_two_layer_shader_based_setup_op"
     bl_label = "Two Layers, Shader based"
     bl_description = "Generates setup that mixes two selected material nodes using a mask and adds a height shift between both (Shader based)."
     bl_options = {'REGISTER', 'UNDO'}   
 
-    def create_layer_group(self, baseTree):
-        group, input, output = self.create_group(baseTree, "NW Shader Layer", 5)
-        tree = group.node_tree
-
-        bump = self.at(tree.nodes.new("ShaderNodeBump"), 0, 0)
-        shader = self.at(tree.nodes.new("ShaderNodeBsdfPrincipled"), 2, 0)
-        geom = self.at(tree.nodes.new("ShaderNodeNewGeometry"), 1, 2)
-        mix0 = self.at(tree.nodes.new("ShaderNodeMixShader"), 1, 0)
-        dot = self.at(tree.nodes.new("ShaderNodeVectorMath"), 2, 1)
-        dot.operation = "DOT_PRODUCT"
-        mix1 = self.at(tree.nodes.new("ShaderNodeMixShader"), 4, 0)
-
-        tree.links.new(self.create_group_input(group, input, "Shader", "Shader Lower"), mix0.inputs[1])
-        tree.links.new(self.create_group_input(group, input, "Shader", "Shader Upper"), mix0.inputs[2])
-        mask = self.create_group_input(group, input, "Float", "Mask")
-        tree.links.new(mask, mix0.inputs["Fac"])
-        tree.links.new(mask, bump.inputs["Height"])
-
-        tree.links.new(geom.outputs["Normal"], dot.inputs[0])
-        tree.links.new(bump.outputs["Normal"], dot.inputs[1])
-        tree.links.new(bump.outputs["Normal"], shader.inputs["Normal"])
-        tree.links.new(dot.outputs["Value"], mix1.inputs["Fac"])
-        tree.links.new(shader.outputs["BSDF"], mix1.inputs[1])
-        tree.links.new(mix0.outputs["Shader"], mix1.inputs[2])
-        tree.links.new(mix1.outputs["Shader"], self.create_group_output(group, output, "Shader", "Shader"))
-
-        tree.links.new(self.create_group_input(group, input, "Color", "Gap Base Color", (1, 0, 0, 1)), shader.inputs["Base Color"])
-        tree.links.new(self.create_group_input(group, input, "Float", "Gap Metallic", 0.0), shader.inputs["Metallic"])
-        tree.links.new(self.create_group_input(group, input, "Float", "Gap Specular", 0.5), shader.inputs["Specular"])
-        tree.links.new(self.create_group_input(group, input, "Float", "Gap Roughness", 0.5), shader.inputs["Roughness"])
-        tree.links.new(self.create_group_input(group, input, "Float", "Gap Height", 1.0), bump.inputs["Strength"])
-
-        return (group, input, output)
+    @staticmethod
+    def layer_group_spec():
+        spec = NW_NodeSpec("NW Shader Layer", 5)
+
+        bump = spec.node("ShaderNodeBump", 0, 0)
+        shader = spec.node("ShaderNodeBsdfPrincipled", 2, 0)
+        geom = spec.node("ShaderNodeNewGeometry", 1, 2)
+        mix0 = spec.node("ShaderNodeMixShader", 1, 0)
+        dot = spec.node("ShaderNodeVectorMath", 2, 1, { "operation": "DOT_PRODUCT" })
+        mix1 = spec.node("ShaderNodeMixShader", 4, 0)
+
+        spec.link(spec.input("Shader", "Shader Lower"), (mix0, 1))
+        spec.link(spec.input("Shader", "Shader Upper"), (mix0, 2))
+        mask = spec.input("Float", "Mask")
+        spec.link(mask, (mix0, "Fac"))
+        spec.link(mask, (bump, "Height"))
+
+        spec.link((geom, "Normal"), (dot, 0))
+        spec.link((bump, "Normal"), (dot, 1))
+        spec.link((bump, "Normal"), (shader, "Normal"))
+        spec.link((dot, "Value"), (mix1, "Fac"))
+        spec.link((shader, "BSDF"), (mix1, 1))
+        spec.link((mix0, "Shader"), (mix1, 2))
+        spec.link((mix1, "Shader"), spec.output("Shader", "Shader"))
+
+        spec.link(spec.input("Color", "Gap Base Color", (1, 0, 0, 1)), (shader, "Base Color"))
+        spec.link(spec.input("Float", "Gap Metallic", 0.0), (shader, "Metallic"))
+        spec.link(spec.input("Float", "Gap Specular", 0.5), (shader, "Specular"))
+        spec.link(spec.input("Float", "Gap Roughness", 0.5), (shader, "Roughness"))
+        spec.link(spec.input("Float", "Gap Height", 1.0), (bump, "Strength"))
+        return spec
 
     def execute(self, context):
         # Access the current tree.
@@ -238,8 +314,7 @@ class NW_GenerateTwoLayerShaderBasedSetupOperator(Operator, NW_NodeUtils):
         else:
             self.baseX, self.baseY = selected[1].location.x + self.gridSizeX, selected[1].location.y - self.gridSizeY
 
-        group, input, output = self.create_layer_group(tree)
-        self.at(group, 2, 0)
+        group = self.at(self.instance(tree, self.compile(self.layer_group_spec())), 2, 0)
 
         noise = self.at(tree.nodes.new("ShaderNodeTexNoise"), -2, 0)
         ramp = self.at(tree.nodes.new("ShaderNodeValToRGB"), 0, 0)
@@ -253,40 +328,53 @@ class NW_GenerateTwoLayerShaderBasedSetupOperator(Operator, NW_NodeUtils):
 
         return{'FINISHED'}    
 
-class DummyGroup:
-    def __init__(self, tree):
-        self.node_tree = tree        
+# Performance tiers of the vector groups, each tier is a separate group with the same interface.
+vector_tiers = [
+    ("FULL", "Full", "Multi-octave noise, best quality"),
+    ("FAST", "Fast", "Cheaper jitter (capped noise detail / white noise), same inputs")
+]
 
-class NW_GenerateDistortionOperator(Operator, NW_NodeUtils):
+class NW_GenerateDistortionOperator(Operator, NW_SpecCompiler):
     bl_idname = "material.nw_generate_distortion_setup_op"
     bl_label = "UV Vector Distortion"
     bl_description = "Add UV Vector Distortion Group (Setup from https://cgmasters.net)."
     bl_options = {'REGISTER', 'UNDO'}        
 
+    tier: EnumProperty(name="Tier", items=vector_tiers)
+
+    # Noise detail used at most by the fast tier.
+    fast_max_detail = 1.0
+
+    @staticmethod
+    def distortion_spec(tier = "FULL"):
+        spec = NW_NodeSpec("NW Vector Distortion" + (" (Fast)" if tier == "FAST" else ""), 4)
+
+        noise = spec.node("ShaderNodeTexNoise", 1, 0)
+        sub = spec.math("SUBTRACT", 2, 0)
+        mix = spec.node("ShaderNodeMixRGB", 3, 0, { "blend_type": "ADD" })
+
+        inVector = spec.input("Vector", "Vector")
+        spec.link(inVector, (noise, "Vector"))
+        spec.link(inVector, (mix, "Color1"))
+        spec.link((noise, "Fac"), (sub, 0))
+        spec.link((sub, "Value"), (mix, "Color2"))
+        spec.link((mix, "Color"), spec.output("Vector", "Vector"))
+
+        spec.link(spec.input("Float", "Scale", 20.0), (noise, "Scale"))
+        detail = spec.input("Float", "Detail", 2.0)
+        if tier == "FAST":
+            # Every octave is another noise evaluation, limit them.
+            cap = spec.math("MINIMUM", 0, -1, def1 = NW_GenerateDistortionOperator.fast_max_detail)
+            spec.link(detail, (cap, 0))
+            spec.link((cap, "Value"), (noise, "Detail"))
+        else:
+            spec.link(detail, (noise, "Detail"))
+        spec.link(spec.input("Float", "Intensity", 0.0), (mix, "Fac"))
+        return spec
+
     def execute(self, context):
-        name = "NW Vector Distortion"
-
-        # Check if already exists ..
-        if bpy.data.node_groups.find(name) < 0:
-            # No, create it.
-            tree, input, output = self.create_group_tree(name, 4)
-            group = DummyGroup(tree)
-
-            noise = self.at(tree.nodes.new("ShaderNodeTexNoise"), 1, 0)
-            sub = self.at(self.create_math_node(tree, "SUBTRACT"), 2, 0)
-            mix = self.at(tree.nodes.new("ShaderNodeMixRGB"), 3, 0)
-            mix.blend_type = "ADD"
-
-            inVector = self.create_group_input(group, input, "Vector", "Vector")
-            tree.links.new(inVector, noise.inputs["Vector"])
-            tree.links.new(inVector, mix.inputs["Color1"])
-            tree.links.new(noise.outputs["Fac"], sub.inputs[0])
-            tree.links.new(sub.outputs["Value"], mix.inputs["Color2"])
-            tree.links.new(mix.outputs["Color"], self.create_group_output(group, output, "Vector", "Vector"))
-
-            tree.links.new(self.create_group_input(group, input, "Float", "Scale", 20.0), noise.inputs["Scale"])
-            tree.links.new(self.create_group_input(group, input, "Float", "Detail", 2.0), noise.inputs["Detail"])
-            tree.links.new(self.create_group_input(group, input, "Float", "Intensity", 0.0), mix.inputs["Fac"])
+        # Created only once, identical specs share the tree.
+        tree = self.compile(self.distortion_spec(self.tier))
 
         # Instanciate group ..
         bpy.ops.node.add_node(
@@ -294,45 +382,83 @@ class NW_GenerateDistortionOperator(Operator, NW_NodeUtils):
             use_transform=True, 
             settings=[{
                 "name": "node_tree", 
-                "value": "bpy.data.node_groups['%s']" % name
+                "value": "bpy.data.node_groups['%s']" % tree.name
                 }]
         )
         return bpy.ops.node.translate_attach_remove_on_cancel('INVOKE_DEFAULT')
 
-class NW_GenerateBlurOperator(Operator, NW_NodeUtils):
+class NW_GenerateBlurOperator(Operator, NW_SpecCompiler):
     bl_idname = "material.nw_generate_blur_setup_op"
     bl_label = "UV Vector Blur"
     bl_description = "Add UV Vector Blur Group (Setup from https://cgmasters.net)."
     bl_options = {'REGISTER', 'UNDO'}        
 
+    tier: EnumProperty(name="Tier", items=vector_tiers)
+
+    @staticmethod
+    def blur_spec(tier = "FULL"):
+        if tier == "FAST":
+            return NW_GenerateBlurOperator.fast_blur_spec()
+
+        spec = NW_NodeSpec("NW Vector Blur", 6)
+
+        noiseScale = spec.math("MULTIPLY", 1, -1, def1 = 10000.0)
+        noise = spec.node("ShaderNodeTexNoise", 2, 0)
+        sub = spec.math("SUBTRACT", 3, 0)
+        mixScale = spec.math("DIVIDE", 4, -1, def1 = 1000.0)
+        mix = spec.node("ShaderNodeMixRGB", 5, 0, { "blend_type": "ADD" })
+
+        inVector = spec.input("Vector", "Vector")
+        spec.link(inVector, (noise, "Vector"))
+        spec.link(inVector, (mix, "Color1"))
+        spec.link((noise, "Fac"), (sub, 0))
+        spec.link((sub, "Value"), (mix, "Color2"))
+        spec.link((mix, "Color"), spec.output("Vector", "Vector"))
+
+        spec.link(spec.input("Float", "Scale", 10.0), (noiseScale, 0))
+        spec.link((noiseScale, "Value"), (noise, "Scale"))
+        spec.link(spec.input("Float", "Detail", 2.0), (noise, "Detail"))
+        spec.link(spec.input("Float", "Intensity", 0.0), (mixScale, 0))
+        spec.link((mixScale, "Value"), (mix, "Fac"))
+        return spec
+
+    @staticmethod
+    def fast_blur_spec():
+        """
+        The noise in the full tier is only used as per sample jitter, a single white
+        noise lookup does the same. Scale scales the vector looked up (the jitter
+        cell size), Detail has no effect and is kept for a compatible interface.
+        """
+        spec = NW_NodeSpec("NW Vector Blur (Fast)", 6)
+
+        noiseScale = spec.node("ShaderNodeVectorMath", 1, -1, { "operation": "SCALE" })
+        noise = spec.node("ShaderNodeTexWhiteNoise", 2, 0, { "noise_dimensions": "3D" })
+        sub = spec.math("SUBTRACT", 3, 0)
+        mixScale = spec.math("DIVIDE", 4, -1, def1 = 1000.0)
+        mix = spec.node("ShaderNodeMixRGB", 5, 0, { "blend_type": "ADD" })
+
+        inVector = spec.input("Vector", "Vector")
+        spec.link(inVector, (noiseScale, 0))
+        spec.link((noiseScale, "Vector"), (noise, "Vector"))
+        spec.link(inVector, (mix, "Color1"))
+        spec.link((noise, "Value"), (sub, 0))
+        spec.link((sub, "Value"), (mix, "Color2"))
+        spec.link((mix, "Color"), spec.output("Vector", "Vector"))
+
+        spec.link(spec.input("Float", "Scale", 10.0), (noiseScale, "Scale"))
+        spec.input("Float", "Detail", 2.0)
+        spec.link(spec.input("Float", "Intensity", 0.0), (mixScale, 0))
+        spec.link((mixScale, "Value"), (mix, "Fac"))
+        return spec
+
     def execute(self, context):
-        name = "NW Vector Blur"
-
-        # Check if already exists ..
-        if bpy.data.node_groups.find(name) < 0:
-            # No, create it.
-            tree, input, output = self.create_group_tree(name, 6)
-            group = DummyGroup(tree)
-
-            noiseScale = self.at(self.create_math_node(tree, "MULTIPLY", def1=10000.0), 1, -1)
-            noise = self.at(tree.nodes.new("ShaderNodeTexNoise"), 2, 0)
-            sub = self.at(self.create_math_node(tree, "SUBTRACT"), 3, 0)
-            mixScale = self.at(self.create_math_node(tree, "DIVIDE", def1=1000.0), 4, -1)
-            mix = self.at(tree.nodes.new("ShaderNodeMixRGB"), 5, 0)
-            mix.blend_type = "ADD"
-
-            inVector = self.create_group_input(group, input, "Vector", "Vector")
-            tree.links.new(inVector, noise.inputs["Vector"])
-            tree.links.new(inVector, mix.inputs["Color1"])
-            tree.links.new(noise.outputs["Fac"], sub.inputs[0])
-            tree.links.new(sub.outputs["Value"], mix.inputs["Color2"])
-            tree.links.new(mix.outputs["Color"], self.create_group_output(group, output, "Vector", "Vector"))
-
-            tree.links.new(self.create_group_input(group, input, "Float", "Scale", 10.0), noiseScale.inputs[0])
-            tree.links.new(noiseScale.outputs["Value"], noise.inputs["Scale"])
-            tree.links.new(self.create_group_input(group, input, "Float", "Detail", 2.0), noise.inputs["Detail"])
-            tree.links.new(self.create_group_input(group, input, "Float", "Intensity", 0.0), mixScale.inputs[0])
-            tree.links.new(mixScale.outputs["Value"], mix.inputs["Fac"])
+        # White noise node is available since 2.81.
+        if self.tier == "FAST" and bpy.app.version < (2, 81, 0):
+            self.report({"ERROR"}, "Fast tier requires Blender 2.81 or newer.")
+            return{'CANCELLED'}
+
+        # Created only once, identical specs share the tree.
+        tree = self.compile(self.blur_spec(self.tier))
 
         # Instanciate group ..
         bpy.ops.node.add_node(
@@ -340,7 +466,7 @@ class NW_GenerateBlurOperator(Operator, NW_NodeUtils):
             use_transform=True, 
             settings=[{
                 "name": "node_tree", 
-                "value": "bpy.data.node_groups['%s']" % name
+                "value": "bpy.data.node_groups['%s']" % tree.name
                 }]
         )
-        return bpy.ops.node.translate_attach_remove_on_cancel('INVOKE_DEFAULT')        
+        return bpy.ops.node.translate_attach_remove_on_cancel('INVOKE_DEFAULT')
@@ -0,0 +1,175 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy, os, json, time, tempfile, subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from . nw_cache import NW_Cache
+from . nw_preflight import NW_Preflight
+from . nw_preferences import NW_Preferences
+from . nw_texture_mapper import NW_TextureMapper
+
+class NW_Transcoder:
+    """
+    Scalar maps (roughness, gloss, metallic, specular) delivered with more than
+    8 bit are loaded as float buffers (16 bytes per pixel instead of 4) without
+    any visible benefit. They are converted to 8 bit PNGs once, by a pool of
+    background Blender processes (Blender decodes all formats), and stored in
+    the cache. Height, normal and diffuse maps keep their precision.
+    Normal maps derived from height maps are created the same way.
+    """
+    # Bits kept per map type, map types not listed aren't touched.
+    precision = { "roughness": 8, "gloss": 8, "metal": 8, "specular": 8 }
+
+    # Bytes per pixel of float and byte image buffers (always RGBA).
+    float_bytes = 16
+    byte_bytes = 4
+
+    # Seconds a worker process may take.
+    timeout = 600
+
+    worker_script = os.path.join(os.path.dirname(__file__), "nw_transcode_worker.py")
+
+    @staticmethod
+    def enabled():
+        prefs = NW_Preferences.get()
+        return bool(bpy.app.binary_path) and (prefs is None or prefs.transcode_scalar)
+
+    @staticmethod
+    def workers():
+        prefs = NW_Preferences.get()
+        return prefs.transcode_workers if prefs else max(1, min(4, (os.cpu_count() or 2) // 2))
+
+    @staticmethod
+    def run_jobs(jobs, cancelled = None):
+        """
+        Convert jobs (dicts source, target, bits) in parallel Blender processes,
+        returns the set of failed sources. The processes are killed once
+        cancelled() returns True.
+        """
+        cancelled = cancelled or (lambda: False)
+        count = min(NW_Transcoder.workers(), len(jobs))
+        chunks = [ jobs[i::count] for i in range(count) ]
+
+        def run(chunk):
+            if cancelled():
+                return [ j["source"] for j in chunk ]
+            with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+                json.dump(chunk, f)
+            try:
+                process = subprocess.Popen([ bpy.app.binary_path, "-b", "--factory-startup", "--python-exit-code", "1",
+                    "-P", NW_Transcoder.worker_script, "--", f.name ],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                deadline = time.perf_counter() + NW_Transcoder.timeout
+                while process.poll() is None:
+                    if cancelled() or time.perf_counter() > deadline:
+                        process.kill()
+                        process.wait()
+                        break
+                    time.sleep(0.1)
+            except (OSError, subprocess.SubprocessError):
+                pass
+            finally:
+                os.remove(f.name)
+            return [ j["source"] for j in chunk if not os.path.exists(j["target"]) ]
+
+        failed = set()
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            for result in pool.map(run, chunks):
+                failed.update(result)
+
+        NW_Cache.added()
+        return failed
+
+    @staticmethod
+    def transcode(maps, cancelled = None):
+        """
+        Transcode the maps of a set (dict map type -> file) where useful and
+        register the results with the cache. Returns (list of converted map
+        types, image memory saved in bytes), see run_jobs() for cancelled.
+        """
+        candidates = { key: fileName for key, fileName in maps.items()
+            if key in NW_Transcoder.precision and NW_TextureMapper.udim_token not in fileName }
+        if not candidates or not NW_Transcoder.enabled():
+            return [], 0
+
+        infos = NW_Preflight.read_all(candidates.values())
+        jobs, done, saved = [], [], 0
+        for key, fileName in sorted(candidates.items()):
+            info = infos[fileName]
+            bits = NW_Transcoder.precision[key]
+            if info.error or info.bitDepth <= bits:
+                continue
+            target, hit = NW_Cache.lookup("%s_%dbit" % (NW_Cache.source_hash(fileName), bits), ".png")
+            if not hit:
+                jobs.append({ "source": NW_Cache.resolve(fileName), "target": target, "bits": bits })
+            NW_Cache.recipes[target] = { "kind": "transcode", "type": key, "source": fileName }
+            done.append((key, fileName, target, info))
+        NW_Cache.save_hashes()
+
+        if jobs:
+            NW_Transcoder.run_jobs(jobs, cancelled)
+        converted = []
+        for key, fileName, target, info in done:
+            if not os.path.exists(target):
+                continue
+            NW_Cache.substitute(fileName, target)
+            converted.append(key)
+            saved += info.width * info.height * (NW_Transcoder.float_bytes - NW_Transcoder.byte_bytes)
+        return converted, saved
+
+    @staticmethod
+    def derive_normals(heights, strength, wrap, cancelled = None):
+        """
+        Derive tangent space normal maps from height maps (list of files) once,
+        Sobel gradients scaled by strength, wrapped around the borders for
+        tiling textures. Returns dict height file -> normal map file, see
+        run_jobs() for cancelled.
+        """
+        heights = [ h for h in set(heights) if NW_TextureMapper.udim_token not in h ]
+        if not heights or not bpy.app.binary_path:
+            return {}
+
+        jobs, derived = [], {}
+        for fileName in sorted(heights):
+            target, hit = NW_Cache.lookup("%s_normal_%g%s" % (NW_Cache.source_hash(fileName), strength, "w" if wrap else "c"), ".png")
+            if not hit:
+                jobs.append({ "kind": "normal", "source": NW_Cache.resolve(fileName), "target": target, "strength": strength, "wrap": wrap })
+            derived[fileName] = target
+            NW_Cache.recipes[target] = { "kind": "normal", "source": fileName, "strength": strength, "wrap": wrap }
+        NW_Cache.save_hashes()
+
+        if jobs:
+            NW_Transcoder.run_jobs(jobs, cancelled)
+        return { h: n for h, n in derived.items() if os.path.exists(n) }
+
+    @staticmethod
+    def recreate(recipe):
+        """
+        Make a derived file again (see NW_Cache.recipes), returns it or None.
+        """
+        source = recipe["source"]
+        if not os.path.exists(source):
+            return None
+        if recipe["kind"] == "normal":
+            return NW_Transcoder.derive_normals([ source ], recipe["strength"], recipe["wrap"]).get(source)
+        if recipe["kind"] == "transcode" and NW_Transcoder.transcode({ recipe["type"]: source })[0]:
+            return NW_Cache.substitutes.get(source)
+        return None
+
+    @staticmethod
+    def text(converted, saved):
+        return "%s transcoded to 8 bit, %.1f MB image memory saved" % (", ".join(converted), saved / (1024.0 * 1024.0))
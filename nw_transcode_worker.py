@@ -0,0 +1,182 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+# Not part of the add-on modules, run by NW_Transcoder in background Blender processes:
+#   blender -b --factory-startup -P nw_transcode_worker.py -- jobs.json
+# Every job (source, target, bits) converts the source to an 8 bit PNG, raw
+# values (no color management), grayscale if all color channels are equal.
+# Jobs of kind "normal" (source, target, strength, wrap) derive a tangent
+# space normal map from a height map, jobs of kind "classify" (source, target,
+# size) write the curl statistics of a normal map (see classify_normal()),
+# jobs of kind "stats" (source, target, size) the statistics used to guess
+# the map type (see map_stats()), jobs of kind "atlas" (target, size,
+# padding, fill, items) composite decals into an atlas page (see
+# composite_atlas()).
+
+import bpy, sys, os, json
+import numpy as np
+
+# Shared with the add-on, which isn't loaded in here.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nw_png import write_png
+
+def transcode(job):
+    image = bpy.data.images.load(job["source"])
+    try:
+        image.colorspace_settings.name = "Non-Color"
+        width, height = image.size
+        pixels = np.empty(width * height * 4, np.float32)
+        image.pixels.foreach_get(pixels)
+        pixels = pixels.reshape(height, width, 4)[:, :, :3]
+
+        levels = (1 << job["bits"]) - 1
+        quantized = np.clip(np.rint(pixels * levels), 0, levels).astype(np.uint8)
+        if (quantized[:, :, 0] == quantized[:, :, 1]).all() and (quantized[:, :, 0] == quantized[:, :, 2]).all():
+            quantized = quantized[:, :, :1]
+        write_png(job["target"], quantized)
+    finally:
+        bpy.data.images.remove(image)
+
+def normal_from_height(job):
+    image = bpy.data.images.load(job["source"])
+    try:
+        image.colorspace_settings.name = "Non-Color"
+        width, height = image.size
+        pixels = np.empty(width * height * 4, np.float32)
+        image.pixels.foreach_get(pixels)
+        heights = pixels.reshape(height, width, 4)[:, :, :3].mean(axis=2)
+
+        # Sobel gradients, rows run bottom up (+V) like the pixels. Slopes are
+        # scaled to a 1K map, so all resolutions of a map give the same result.
+        p = np.pad(heights, 1, mode="wrap" if job["wrap"] else "edge")
+        dx = (p[:-2, 2:] + 2.0 * p[1:-1, 2:] + p[2:, 2:]) - (p[:-2, :-2] + 2.0 * p[1:-1, :-2] + p[2:, :-2])
+        dy = (p[2:, :-2] + 2.0 * p[2:, 1:-1] + p[2:, 2:]) - (p[:-2, :-2] + 2.0 * p[:-2, 1:-1] + p[:-2, 2:])
+        dx *= job["strength"] * width / 8192.0
+        dy *= job["strength"] * height / 8192.0
+
+        normal = np.dstack([ -dx, -dy, np.ones_like(dx) ])
+        normal /= np.linalg.norm(normal, axis=2, keepdims=True)
+        write_png(job["target"], np.clip(np.rint((normal * 0.5 + 0.5) * 255.0), 0, 255).astype(np.uint8))
+    finally:
+        bpy.data.images.remove(image)
+
+def downsample(pixels, size):
+    """
+    Block means of pixels (height, width, channels), longest side about size.
+    """
+    height, width, channels = pixels.shape
+    step = max(1, max(width, height) // size)
+    h, w = height // step * step, width // step * step
+    return pixels[:h, :w].reshape(h // step, step, w // step, step, channels).mean(axis=(1, 3))
+
+def write_json(target, result):
+    temp = "%s.%d.tmp" % (target, os.getpid())
+    with open(temp, "w") as f:
+        json.dump(result, f)
+    os.replace(temp, target)
+
+def classify_normal(job):
+    """
+    A tangent space normal map encodes the slopes of a height field, which has
+    no curl. The curl is measured for both green channel conventions on a
+    downsampled copy (block means), the matching convention has the smaller one.
+    """
+    image = bpy.data.images.load(job["source"])
+    try:
+        image.colorspace_settings.name = "Non-Color"
+        width, height = image.size
+        pixels = np.empty(width * height * 4, np.float32)
+        image.pixels.foreach_get(pixels)
+        pixels = downsample(pixels.reshape(height, width, 4)[:, :, :3], job["size"])
+
+        n = pixels * 2.0 - 1.0
+        nz = np.clip(n[:, :, 2], 0.05, None)
+        gx, gy = -n[:, :, 0] / nz, -n[:, :, 1] / nz
+        dgx = gx[1:, :-1] - gx[:-1, :-1]
+        dgy = gy[:-1, 1:] - gy[:-1, :-1]
+
+        write_json(job["target"], { "ogl": float(np.abs(dgx - dgy).mean()), "dx": float(np.abs(dgx + dgy).mean()) })
+    finally:
+        bpy.data.images.remove(image)
+
+def map_stats(job):
+    """
+    Statistics telling map types apart (see NW_MapClassifier.scores()), on a
+    downsampled copy: channel means, colorfulness (mean channel difference),
+    share of near black/white pixels and the deviation of the decoded vector
+    length from 1 (normal maps are unit vectors).
+    """
+    image = bpy.data.images.load(job["source"])
+    try:
+        image.colorspace_settings.name = "Non-Color"
+        width, height = image.size
+        pixels = np.empty(width * height * 4, np.float32)
+        image.pixels.foreach_get(pixels)
+        pixels = downsample(pixels.reshape(height, width, 4)[:, :, :3], job["size"])
+
+        r, g, b = pixels[:, :, 0], pixels[:, :, 1], pixels[:, :, 2]
+        gray = pixels.mean(axis=2)
+        write_json(job["target"], {
+            "mean": [ float(r.mean()), float(g.mean()), float(b.mean()) ],
+            "color": float((np.abs(r - g) + np.abs(g - b) + np.abs(b - r)).mean() / 3.0),
+            "binary": float(((gray < 0.1) | (gray > 0.9)).mean()),
+            "normal": float(np.abs(np.linalg.norm(pixels * 2.0 - 1.0, axis=2) - 1.0).mean())
+        })
+    finally:
+        bpy.data.images.remove(image)
+
+def composite_atlas(job):
+    """
+    Every item (source, x, y, w, h) is resampled to w x h (nearest pixel) and
+    placed at x, y with its edge pixels repeated over the padding, colors are
+    inverted for items with "invert" (gloss in a roughness atlas). Unused space
+    keeps the fill color. Raw values, 8 bit RGBA.
+    """
+    size, pad = job["size"], job["padding"]
+    atlas = np.empty((size, size, 4), np.float32)
+    atlas[:, :] = job["fill"]
+    for item in job["items"]:
+        image = bpy.data.images.load(item["source"])
+        try:
+            image.colorspace_settings.name = "Non-Color"
+            width, height = image.size
+            pixels = np.empty(width * height * 4, np.float32)
+            image.pixels.foreach_get(pixels)
+            pixels = pixels.reshape(height, width, 4)
+            if item.get("invert"):
+                pixels[:, :, :3] = 1.0 - pixels[:, :, :3]
+        finally:
+            bpy.data.images.remove(image)
+
+        x, y, w, h = item["x"], item["y"], item["w"], item["h"]
+        rows = ((np.arange(h) + 0.5) * height / h).astype(np.int64)
+        cols = ((np.arange(w) + 0.5) * width / w).astype(np.int64)
+        tile = np.pad(pixels[rows][:, cols], ((pad, pad), (pad, pad), (0, 0)), mode="edge")
+        atlas[y - pad:y + h + pad, x - pad:x + w + pad] = tile
+
+    write_png(job["target"], np.clip(np.rint(atlas * 255.0), 0, 255).astype(np.uint8))
+
+def main():
+    with open(sys.argv[sys.argv.index("--") + 1]) as f:
+        jobs = json.load(f)
+    for job in jobs:
+        try:
+            { "normal": normal_from_height, "classify": classify_normal, "stats": map_stats,
+                "atlas": composite_atlas }.get(job.get("kind"), transcode)(job)
+        except Exception as e:
+            print("Node Wizard: can't transcode %s: %s" % (job["source"], e))
+
+main()
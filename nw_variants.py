@@ -0,0 +1,229 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+import bpy
+from bpy.types import Operator
+from bpy.props import EnumProperty, FloatProperty, BoolProperty
+
+from . nw_node_utils import NW_NodeUtils
+from . nw_gc import NW_GarbageCollector
+from . nw_group_registry import NW_GroupRegistry
+
+variant_sources = [
+    ("RANDOM", "Random", "Object Info random value (per object and instance) varies the inputs around their current value"),
+    ("ATTRIBUTE", "Object Property", "Custom object properties (e.g. nw_material_group_hue) are added to the current values, requires Blender 2.93")
+]
+
+# Group inputs worth varying (see create_texture_mapping() and create_hslbc()), with the spread of random variants.
+variant_inputs = {
+    "Hue": 0.1,
+    "Saturation": 0.3,
+    "HSL-Value": 0.3,
+    "Brightness": 0.1,
+    "Contrast": 0.1,
+    "Scale": 0.5,
+    "Offset X": 1.0,
+    "Offset Y": 1.0
+}
+
+# Enum identifiers (no blanks) -> input names.
+variant_ids = { name.upper().replace(" ", "_").replace("-", "_"): name for name in variant_inputs }
+variant_items = [ (id, name, "Vary %s per object" % name) for id, name in variant_ids.items() ]
+
+class NW_Variants(NW_NodeUtils):
+    """
+    One material serving many objects with different group input values: the
+    inputs are driven by the Object Info random value or by custom object
+    properties, instead of duplicating materials and groups per variant.
+    """
+    # Decorrelates the random value per input (fractional part of random * factor).
+    factors = [ 1.0, 7.31, 13.97, 29.17, 43.91, 61.33, 83.77, 97.13 ]
+
+    @staticmethod
+    def can_read_properties():
+        return bpy.app.version >= (2, 93, 0)
+
+    @staticmethod
+    def property_name(owner, node, name):
+        """
+        Custom object property of an input, prefixed by the material (owner) name,
+        nodes of different materials may have the same name.
+        """
+        return "nw_" + "_".join(bpy.path.clean_name(n).lower() for n in [ owner, node.name, name ] if n)
+
+    def clear(self, tree, node):
+        """
+        Remove the drivers of node, the inputs keep their values.
+        """
+        for n in [ n for n in tree.nodes if n.get("nw_variant_of") == node.name ]:
+            tree.nodes.remove(n)
+
+    def drive(self, tree, node, names, source, amount = 1.0, owner = ""):
+        """
+        Drive the inputs names (unconnected ones only) of the group node by
+        source ("RANDOM" or "ATTRIBUTE", see property_name() for owner).
+        Returns the driven input names.
+        """
+        self.clear(tree, node)
+        self.baseX, self.baseY = node.location.x - 3 * self.gridSizeX, node.location.y
+
+        driven, info = [], None
+        for index, name in enumerate(n for n in variant_inputs if n in names):
+            socket = node.inputs.get(name)
+            if not socket or socket.links:
+                continue
+            created = []
+            if source == "RANDOM":
+                if not info:
+                    info = self.at(tree.nodes.new("ShaderNodeObjectInfo"), -2, 0)
+                    created.append(info)
+                spread = variant_inputs[name] * amount
+                factor = self.at(self.create_math_node(tree, "MULTIPLY", def1 = NW_Variants.factors[index]), -1, -0.5 * index)
+                fraction = self.at(self.create_math_node(tree, "MODULO", def1 = 1.0), 0, -0.5 * index)
+                scale = self.at(self.create_math_node(tree, "MULTIPLY", def1 = spread), 1, -0.5 * index)
+                value = self.at(self.create_math_node(tree, "ADD", def1 = socket.default_value - 0.5 * spread), 2, -0.5 * index)
+                tree.links.new(info.outputs["Random"], factor.inputs[0])
+                tree.links.new(factor.outputs["Value"], fraction.inputs[0])
+                tree.links.new(fraction.outputs["Value"], scale.inputs[0])
+                tree.links.new(scale.outputs["Value"], value.inputs[0])
+                created += [ factor, fraction, scale, value ]
+            else:
+                attribute = self.at(tree.nodes.new("ShaderNodeAttribute"), 1, -0.5 * index)
+                attribute.attribute_type = "OBJECT"
+                attribute.attribute_name = NW_Variants.property_name(owner, node, name)
+                value = self.at(self.create_math_node(tree, "ADD", def1 = socket.default_value), 2, -0.5 * index)
+                tree.links.new(attribute.outputs["Fac"], value.inputs[0])
+                created += [ attribute, value ]
+
+            value.label = name
+            tree.links.new(value.outputs["Value"], socket)
+            for n in created:
+                n["nw_variant_of"] = node.name
+            driven.append(name)
+
+        self.baseX = self.baseY = 0
+        return driven
+
+    @staticmethod
+    def groups(tree):
+        """
+        Generated group nodes at the top level of tree.
+        """
+        return [ n for n in tree.nodes if n.type == "GROUP" and n.node_tree and NW_GarbageCollector.is_generated(n.node_tree) ]
+
+    @staticmethod
+    def duplicates():
+        """
+        Materials differing in the variant input values of their generated groups
+        only, list of lists, the material to keep first.
+        """
+        memo, sets = {}, {}
+        for m in bpy.data.materials:
+            if m.use_nodes and m.node_tree and NW_Variants.groups(m.node_tree):
+                sets.setdefault(NW_GroupRegistry.structure_hash(m.node_tree, memo, variant_inputs), []).append(m)
+        return [ sorted(materials, key=lambda m: (len(m.name), -m.users, m.name)) for materials in sets.values() if len(materials) > 1 ]
+
+    def merge(self, dry_run = False):
+        """
+        Replace every set of duplicates by the material kept: differing input
+        values become custom properties of the objects (difference to the
+        kept values), read by attribute nodes. Returns (sets, merged materials).
+        """
+        # Slots of linked duplicates share the mesh's materials, the first
+        # reassignment would hide the variant of the others.
+        slots = { obj: [ slot.material for slot in obj.material_slots ] for obj in bpy.data.objects }
+
+        sets, merged = 0, 0
+        for keep, *others in NW_Variants.duplicates():
+            sets += 1
+            merged += len(others)
+            if dry_run:
+                continue
+
+            # Inputs with differing values per group node ..
+            varying = {}
+            for node in NW_Variants.groups(keep.node_tree):
+                names = [ name for name in variant_inputs if node.inputs.get(name) and not node.inputs[name].links and
+                    any(abs(m.node_tree.nodes[node.name].inputs[name].default_value - node.inputs[name].default_value) > 1e-6 for m in others) ]
+                if names:
+                    varying[node] = names
+
+            # .. stored per object ..
+            for obj, materials in slots.items():
+                for index, material in enumerate(materials):
+                    if material in others or material == keep:
+                        for node, names in varying.items():
+                            other = material.node_tree.nodes[node.name]
+                            for name in names:
+                                obj[NW_Variants.property_name(keep.name, node, name)] = other.inputs[name].default_value - node.inputs[name].default_value
+                        obj.material_slots[index].material = keep
+
+            # .. and read by the kept material.
+            for node, names in varying.items():
+                self.drive(keep.node_tree, node, names, "ATTRIBUTE", owner = keep.name)
+            for m in others:
+                if m.users == 0:
+                    bpy.data.materials.remove(m)
+        return sets, merged
+
+class NW_ObjectVariantsOperator(Operator, NW_Variants):
+    bl_idname = "material.nw_object_variants_op"
+    bl_label = "Vary Inputs per Object"
+    bl_description = "Drive the chosen inputs of the selected groups per object (random value or custom object property), one material serves all variants"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    source: EnumProperty(name="Source", items=variant_sources)
+    inputs: EnumProperty(name="Inputs", items=variant_items, options={"ENUM_FLAG"}, default={"HUE", "OFFSET_X", "OFFSET_Y"})
+    amount: FloatProperty(name="Amount", description="Scales the spread of random variants", default=1.0, min=0.0, soft_max=4.0)
+    remove: BoolProperty(name="Remove", description="Remove the drivers instead")
+
+    def execute(self, context):
+        tree = context.space_data.edit_tree
+        nodes = [ n for n in tree.nodes if n.select and n.type == "GROUP" ]
+        if not nodes:
+            self.report({"ERROR"}, "No group node selected.")
+            return{'CANCELLED'}
+        if self.source == "ATTRIBUTE" and not self.remove and not NW_Variants.can_read_properties():
+            self.report({"ERROR"}, "Object properties in materials require Blender 2.93.")
+            return{'CANCELLED'}
+
+        if self.remove:
+            for node in nodes:
+                self.clear(tree, node)
+            return{'FINISHED'}
+
+        owner = context.space_data.id.name if context.space_data.id else ""
+        for node in nodes:
+            driven = self.drive(tree, node, [ variant_ids[i] for i in self.inputs ], self.source, self.amount, owner)
+            if driven and self.source == "ATTRIBUTE":
+                self.report({"INFO"}, "%s: object properties %s" % (node.name, ", ".join(NW_Variants.property_name(owner, node, n) for n in driven)))
+        return{'FINISHED'}
+
+class NW_MergeVariantsOperator(Operator, NW_Variants):
+    bl_idname = "material.nw_merge_variants_op"
+    bl_label = "Merge Material Variants"
+    bl_description = "Replace materials differing in group input values only (Hue, Scale, Offset, ..) by one material reading the values from object properties"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    dry_run: BoolProperty(name="Dry Run", description="Only report the variant sets")
+
+    def execute(self, context):
+        if not self.dry_run and not NW_Variants.can_read_properties():
+            self.report({"ERROR"}, "Object properties in materials require Blender 2.93.")
+            return{'CANCELLED'}
+        sets, merged = self.merge(self.dry_run)
+        self.report({"INFO"}, "%d variant sets, %d materials %s." % (sets, merged, "mergeable" if self.dry_run else "merged"))
+        return{'FINISHED'}
@@ -0,0 +1,66 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Bake the Node Wizard mask groups (NW_Edges_AO, NW_Edges_Bevel, ..) used at the
+top level of materials per object with Cycles CPU, same as "Bake Selected
+Masks" in the panel. Already baked (muted) masks are baked again, e.g. after
+geometry changes. Folders are searched recursively for .blend files.
+
+    blender -b --factory-startup -P tools/nw_bake_masks.py -- [--target ATTRIBUTE|IMAGE]
+        [--resolution 1024] [--samples 16] [--save] file.blend folder ...
+"""
+
+import sys, os, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import nw_headless
+from nw_gc_batch import blend_files
+
+def main():
+    parser = argparse.ArgumentParser(description="Node Wizard mask baking over .blend files.")
+    parser.add_argument("paths", nargs="+", help=".blend files or folders")
+    parser.add_argument("--target", choices=[ "ATTRIBUTE", "IMAGE" ], default="ATTRIBUTE")
+    parser.add_argument("--resolution", type=int, default=1024, help="Image size (IMAGE target).")
+    parser.add_argument("--samples", type=int, default=16)
+    parser.add_argument("--save", action="store_true", help="Save the files after baking.")
+    args = parser.parse_args(nw_headless.script_args())
+
+    import bpy
+    baker = nw_headless.module("nw_baker").NW_Baker()
+
+    for fileName in blend_files(args.paths):
+        bpy.ops.wm.open_mainfile(filepath=fileName, load_ui=False)
+        baked, done = 0, set()
+        for obj in bpy.context.scene.objects:
+            if obj.type != "MESH" or (args.target == "IMAGE" and not obj.data.uv_layers):
+                continue
+            for material in set(s.material for s in obj.material_slots if s.material and s.material.use_nodes):
+                # An image only fits one object ..
+                if args.target == "IMAGE" and material in done:
+                    print("%s: %s already baked for another object, skipped for %s" % (fileName, material.name, obj.name))
+                    continue
+                done.add(material)
+                for mask in [ n for n in material.node_tree.nodes if baker.is_mask(n) ]:
+                    baked += baker.bake_mask(bpy.context, obj, material, mask, args.target, args.resolution, args.samples)
+
+        if args.save and baked:
+            bpy.ops.wm.save_mainfile(filepath=fileName)
+        print("%s: %d mask outputs baked" % (fileName, baked))
+
+if __name__ == "__main__":
+    main()
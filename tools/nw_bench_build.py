@@ -0,0 +1,170 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Build cost benchmark, runs every setup variant against the recording bpy
+stand-in (no Blender required) and reports created nodes, links, interface
+sockets, images and the Python side build time.
+
+    python tools/nw_bench_build.py [--repeat N] [--json results.json] [--filter text]
+"""
+
+import sys, os, time, json, types, tempfile, argparse, itertools, statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import nw_recording_bpy
+recorder = nw_recording_bpy.install()
+
+import nw_headless
+
+class Bench:
+    """
+    Collects variants (name, setup, run) and measures them.
+    """
+    def __init__(self, textures):
+        self.textures = textures
+        self.variants = []
+        self.generate = nw_headless.module("nw_generate_op")
+        self.tools = nw_headless.module("nw_tools_op")
+
+    def context(self, tree):
+        return types.SimpleNamespace(
+            space_data = types.SimpleNamespace(edit_tree = tree),
+            preferences = sys.modules["bpy"].context.preferences,
+            window_manager = nw_recording_bpy.WindowManager()
+        )
+
+    def material_tree(self):
+        return nw_recording_bpy.data.materials.new("Bench").node_tree
+
+    def operator(self, cls, **props):
+        op = cls()
+        for name, value in props.items():
+            setattr(op, name, value)
+        return op
+
+    def add(self, name, run, setup = None):
+        self.variants.append((name, setup, run))
+
+    def pbr(self, tree, maps = "full", **options):
+        """
+        Run the PBR setup for the given synthetic set into tree.
+        """
+        op = self.operator(self.generate.NW_GenerateOperator, mode = "PBR", filepath = self.textures[maps]["diffuse"], **options)
+        op.execute(self.context(tree))
+        return op
+
+    def collect(self):
+        flags = [ dict(zip(("add_hslbc", "add_uv", "decal"), f)) for f in itertools.product([False, True], repeat=3) ]
+
+        for maps in sorted(self.textures):
+            for f in flags:
+                name = "PBR[%s]%s" % (maps, "".join("+" + k for k, v in f.items() if v))
+                self.add(name, lambda tree, maps=maps, f=f: self.pbr(tree, maps, **f))
+
+        for f in flags:
+            name = "Image%s" % "".join("+" + k for k, v in f.items() if v)
+            self.add(name, lambda tree, f=f: self.operator(self.generate.NW_GenerateOperator,
+                mode = "Image", filepath = self.textures["full"]["diffuse"], **f).execute(self.context(tree)))
+
+        def select_groups(tree):
+            self.pbr(tree, "full")
+            self.pbr(tree, "gloss_height")
+            for n in tree.nodes:
+                n.select = n.type == "GROUP"
+
+        def select_layers(count):
+            def setup(tree):
+                for index in range(count):
+                    self.pbr(tree, [ "full", "gloss_height" ][index % 2])
+                for index, n in enumerate(n for n in tree.nodes if n.type == "GROUP"):
+                    n.location.y = -600 * index
+                    n.select = True
+            return setup
+
+        def select_image(tree):
+            node = tree.nodes.new("ShaderNodeTexImage")
+            node.outputs["Color"]
+            node.select = True
+
+        def tool(cls):
+            return lambda tree: self.operator(cls).execute(self.context(tree))
+
+        self.add("Two Layers, Texture based", tool(self.tools.NW_GenerateTwoLayerTextureBasedSetupOperator), select_groups)
+        self.add("Two Layers, Shader based", tool(self.tools.NW_GenerateTwoLayerShaderBasedSetupOperator), select_groups)
+        for count in [ 2, 4, 8 ]:
+            self.add("Layer Stack, %d layers" % count, tool(self.tools.NW_GenerateLayerStackOperator), select_layers(count))
+        self.add("Normal Scaler", tool(self.tools.NW_NormalScalerOperator), select_groups)
+        self.add("DX2OGL Converter", tool(self.tools.NW_DX2OGLConverterOperator), select_image)
+        for tier, _, _ in self.tools.vector_tiers:
+            self.add("Vector Distortion [%s]" % tier, lambda tree, tier=tier: self.operator(self.tools.NW_GenerateDistortionOperator, tier = tier).execute(self.context(tree)))
+            self.add("Vector Blur [%s]" % tier, lambda tree, tier=tier: self.operator(self.tools.NW_GenerateBlurOperator, tier = tier).execute(self.context(tree)))
+
+    def measure(self, name, setup, run, repeat):
+        times = []
+        for _ in range(repeat):
+            nw_recording_bpy.reset()
+            tree = self.material_tree()
+            if setup:
+                setup(tree)
+            recorder.reset()
+
+            start = time.perf_counter()
+            run(tree)
+            times.append(time.perf_counter() - start)
+
+        c = recorder.counts
+        return {
+            "name": name,
+            "nodes": c["nodes.new"],
+            "links": c["links.new"],
+            "sockets": c["tree.inputs.new"] + c["tree.outputs.new"],
+            "images": c["images.load"],
+            "groups": c["node_groups.new"],
+            "calls": sum(c.values()),
+            "ms_median": statistics.median(times) * 1000.0,
+            "ms_min": min(times) * 1000.0
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Node Wizard build cost benchmark (recording stand-in).")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="Write results to this file.")
+    parser.add_argument("--filter", default="", help="Only run variants containing this text.")
+    args = parser.parse_args(nw_headless.script_args())
+
+    with tempfile.TemporaryDirectory() as folder:
+        textures = {
+            "full": nw_headless.make_texture_set(os.path.join(folder, "full"), "full", ["diffuse", "metal", "specular", "roughness", "normal"]),
+            "gloss_height": nw_headless.make_texture_set(os.path.join(folder, "gloss_height"), "gh", ["diffuse", "gloss", "height"]),
+            "diffuse_only": nw_headless.make_texture_set(os.path.join(folder, "diffuse_only"), "d", ["diffuse"])
+        }
+        bench = Bench(textures)
+        bench.collect()
+        results = [ bench.measure(name, setup, run, args.repeat) for name, setup, run in bench.variants if args.filter in name ]
+
+    print("%-48s %6s %6s %7s %6s %6s %6s %9s" % ("setup", "nodes", "links", "sockets", "images", "groups", "calls", "ms"))
+    for r in results:
+        print("%-48s %6d %6d %7d %6d %6d %6d %9.3f" % (r["name"], r["nodes"], r["links"], r["sockets"],
+            r["images"], r["groups"], r["calls"], r["ms_median"]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({ "benchmark": "build", "results": results }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Render cost benchmark. Builds every setup (and its option combinations) on a
+standard test object and renders fixed-sample Cycles CPU frames, render time,
+peak memory and node count go to a JSON results file.
+
+    blender -b --factory-startup -P tools/nw_bench_render.py -- --output results.json
+        [--samples 32] [--resolution 256] [--repeat 3] [--texture-size 1024] [--filter text]
+
+Compare two result files (no Blender required), exit code 1 on regressions:
+
+    python tools/nw_bench_render.py --compare old.json new.json [--threshold 0.10]
+"""
+
+import sys, os, re, json, time, types, tempfile, argparse, itertools
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import nw_headless
+
+#########################################
+# Scene and setups (Blender only).
+
+class RenderBench:
+    def __init__(self, args, textures):
+        import bpy
+        self.bpy = bpy
+        self.args = args
+        self.textures = textures
+        self.variants = []
+        self.peak = 0.0
+
+        self.generate = nw_headless.module("nw_generate_op")
+        self.tools = nw_headless.module("nw_tools_op")
+        self.spec = nw_headless.module("nw_node_spec")
+        self.cost = nw_headless.module("nw_render_cost")
+
+        bpy.app.handlers.render_stats.append(self.on_stats)
+        self.setup_scene()
+
+    def on_stats(self, stats, *args):
+        """
+        Cycles reports the peak memory in its status line ("Peak: 123.45M").
+        """
+        m = re.search(r"Peak:?\s*([\d.]+)\s*([KMG])", str(stats))
+        if m:
+            value = float(m.group(1)) * { "K": 1.0 / 1024.0, "M": 1.0, "G": 1024.0 }[m.group(2)]
+            self.peak = max(self.peak, value)
+
+    def setup_scene(self):
+        """
+        Standard test scene: UV sphere, camera and sun, fixed Cycles CPU settings.
+        """
+        bpy = self.bpy
+        for o in list(bpy.data.objects):
+            bpy.data.objects.remove(o, do_unlink=True)
+
+        scene = bpy.context.scene
+        bpy.ops.mesh.primitive_uv_sphere_add(segments=64, ring_count=32, location=(0, 0, 0))
+        self.object = bpy.context.active_object
+        bpy.ops.object.shade_smooth()
+
+        bpy.ops.object.camera_add(location=(0, -4, 0), rotation=(1.5708, 0, 0))
+        scene.camera = bpy.context.active_object
+        bpy.ops.object.light_add(type="SUN", location=(2, -2, 3))
+
+        scene.render.engine = "CYCLES"
+        scene.cycles.device = "CPU"
+        scene.cycles.samples = self.args.samples
+        scene.cycles.use_denoising = False
+        scene.render.resolution_x = scene.render.resolution_y = self.args.resolution
+        scene.render.resolution_percentage = 100
+        scene.render.filepath = os.path.join(tempfile.gettempdir(), "nw_bench_render")
+        self.scene = scene
+
+    def new_material(self, name):
+        bpy = self.bpy
+        mat = bpy.data.materials.new(name)
+        mat.use_nodes = True
+        tree = mat.node_tree
+        for n in list(tree.nodes):
+            if n.type != "OUTPUT_MATERIAL":
+                tree.nodes.remove(n)
+        self.object.data.materials.clear()
+        self.object.data.materials.append(mat)
+        return mat, tree, [ n for n in tree.nodes if n.type == "OUTPUT_MATERIAL" ][0]
+
+    def context(self, tree):
+        return types.SimpleNamespace(space_data = types.SimpleNamespace(edit_tree = tree), preferences = self.bpy.context.preferences)
+
+    def pbr(self, tree, maps, **options):
+        """
+        Run the generate operator into tree, returns the new group node.
+        """
+        before = set(tree.nodes)
+        props = { "add_hslbc": False, "add_uv": False, "decal": False, "height_normal": False, "normal_strength": 1.0 }
+        props.update(options)
+        nw_headless.run_operator(self.generate.NW_GenerateOperator, self.context(tree), filepath = self.textures[maps]["diffuse"], **props)
+        return [ n for n in tree.nodes if n not in before and n.type == "GROUP" ][0]
+
+    def add(self, name, build):
+        self.variants.append((name, build))
+
+    def collect(self):
+        flags = [ dict(zip(("add_hslbc", "add_uv", "decal"), f)) for f in itertools.product([False, True], repeat=3) ]
+
+        def suffix(f):
+            return "".join("+" + k for k, v in f.items() if v)
+
+        for maps in sorted(self.textures):
+            for f in flags:
+                self.add("PBR[%s]%s" % (maps, suffix(f)), lambda tree, out, maps=maps, f=f:
+                    tree.links.new(self.pbr(tree, maps, mode = "PBR", **f).outputs["Shader"], out.inputs["Surface"]))
+
+        for f in flags:
+            self.add("Image%s" % suffix(f), lambda tree, out, f=f:
+                tree.links.new(self.pbr(tree, "full", mode = "Image", **f).outputs["Shader"], out.inputs["Surface"]))
+
+        # Height map through a derived normal map instead of a bump node.
+        self.add("PBR[gloss_height]+height_normal", lambda tree, out:
+            tree.links.new(self.pbr(tree, "gloss_height", mode = "PBR", height_normal = True).outputs["Shader"], out.inputs["Surface"]))
+        self.add("Image+height_normal", lambda tree, out:
+            tree.links.new(self.pbr(tree, "full", mode = "Image", height_normal = True).outputs["Shader"], out.inputs["Surface"]))
+
+        def two_layers(cls, shaderBased):
+            def build(tree, out):
+                groups = [ self.pbr(tree, "full", mode = "PBR"), self.pbr(tree, "gloss_height", mode = "PBR") ]
+                groups[1].location.y -= 600
+                for n in tree.nodes:
+                    n.select = n in groups
+                before = set(tree.nodes)
+                nw_headless.run_operator(cls, self.context(tree))
+                kind = "GROUP" if shaderBased else "BSDF_PRINCIPLED"
+                result = [ n for n in tree.nodes if n not in before and n.type == kind ][0]
+                tree.links.new(result.outputs[0], out.inputs["Surface"])
+            return build
+
+        self.add("Two Layers, Texture based", two_layers(self.tools.NW_GenerateTwoLayerTextureBasedSetupOperator, False))
+        self.add("Two Layers, Shader based", two_layers(self.tools.NW_GenerateTwoLayerShaderBasedSetupOperator, True))
+
+        def layer_stack(count):
+            def build(tree, out):
+                groups = [ self.pbr(tree, [ "full", "gloss_height" ][index % 2], mode = "PBR") for index in range(count) ]
+                for index, g in enumerate(groups):
+                    g.location.y -= 600 * index
+                for n in tree.nodes:
+                    n.select = n in groups
+                before = set(tree.nodes)
+                nw_headless.run_operator(self.tools.NW_GenerateLayerStackOperator, self.context(tree))
+                shader = [ n for n in tree.nodes if n not in before and n.type == "BSDF_PRINCIPLED" ][0]
+                tree.links.new(shader.outputs[0], out.inputs["Surface"])
+            return build
+
+        for count in [ 2, 4, 8 ]:
+            self.add("Layer Stack, %d layers" % count, layer_stack(count))
+
+        def vector_group(specFunction, tier):
+            def build(tree, out):
+                group = self.pbr(tree, "full", mode = "PBR", add_uv = True)
+                tree.links.new(group.outputs["Shader"], out.inputs["Surface"])
+                compiler = self.spec.NW_SpecCompiler()
+                vector = compiler.instance(tree, compiler.compile(specFunction(tier)))
+                vector.inputs["Intensity"].default_value = 0.5
+                mapping = group.inputs["Vector"].links[0].from_socket
+                tree.links.new(mapping, vector.inputs["Vector"])
+                tree.links.new(vector.outputs["Vector"], group.inputs["Vector"])
+            return build
+
+        for tier, _, _ in self.tools.vector_tiers:
+            self.add("Vector Distortion [%s]" % tier, vector_group(self.tools.NW_GenerateDistortionOperator.distortion_spec, tier))
+            self.add("Vector Blur [%s]" % tier, vector_group(self.tools.NW_GenerateBlurOperator.blur_spec, tier))
+
+    def count_nodes(self, tree, seen):
+        """
+        Nodes in tree and (once per tree) all nested groups.
+        """
+        count = 0
+        for n in tree.nodes:
+            count += 1
+            if n.type == "GROUP" and n.node_tree and n.node_tree not in seen:
+                seen.add(n.node_tree)
+                count += self.count_nodes(n.node_tree, seen)
+        return count
+
+    def render(self):
+        start = time.perf_counter()
+        self.bpy.ops.render.render(write_still=False)
+        return time.perf_counter() - start
+
+    def measure(self, name, build):
+        mat, tree, out = self.new_material(name)
+        build(tree, out)
+
+        # First frame includes kernel and image loading, measured separately.
+        self.peak = 0.0
+        first = self.render()
+        times = [ self.render() for _ in range(self.args.repeat) ]
+
+        result = {
+            "name": name,
+            "render_s": min(times),
+            "render_s_all": times,
+            "first_render_s": first,
+            "peak_mb": self.peak,
+            "nodes": self.count_nodes(tree, set()),
+            "images": len([ i for i in self.bpy.data.images if i.users > 0 and i.type == "IMAGE" ]),
+            # Input of tools/nw_cost_calibrate.py.
+            "cost_counts": self.cost.NW_RenderCost().material_cost(mat)["counts"]
+        }
+        self.bpy.data.materials.remove(mat)
+        for i in list(self.bpy.data.images):
+            if i.users == 0:
+                self.bpy.data.images.remove(i)
+        return result
+
+def run(args):
+    import bpy
+    addon = nw_headless.load_addon(register = True)
+
+    with tempfile.TemporaryDirectory() as folder:
+        size = args.texture_size
+        textures = {
+            "full": nw_headless.make_texture_set(os.path.join(folder, "full"), "full", ["diffuse", "metal", "specular", "roughness", "normal"], size),
+            "gloss_height": nw_headless.make_texture_set(os.path.join(folder, "gloss_height"), "gh", ["diffuse", "gloss", "height"], size),
+            "diffuse_only": nw_headless.make_texture_set(os.path.join(folder, "diffuse_only"), "d", ["diffuse"], size)
+        }
+        bench = RenderBench(args, textures)
+        bench.collect()
+
+        results = []
+        for name, build in bench.variants:
+            if args.filter in name:
+                r = bench.measure(name, build)
+                print("%-48s %8.3fs %8.1fMB %5d nodes" % (name, r["render_s"], r["peak_mb"], r["nodes"]))
+                results.append(r)
+
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    except ImportError:
+        rss = None
+
+    data = {
+        "benchmark": "render",
+        "addon_version": ".".join(str(v) for v in addon.bl_info["version"]),
+        "blender": bpy.app.version_string,
+        "samples": args.samples,
+        "resolution": args.resolution,
+        "texture_size": args.texture_size,
+        "process_peak_rss_mb": rss,
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(data, f, indent=2)
+
+#########################################
+# Comparison (plain Python).
+
+def compare(baseFile, newFile, threshold):
+    """
+    Print time/memory change per setup, returns the number of regressions.
+    """
+    with open(baseFile) as f:
+        base = json.load(f)
+    with open(newFile) as f:
+        new = json.load(f)
+
+    if (base.get("samples"), base.get("resolution")) != (new.get("samples"), new.get("resolution")):
+        print("Warning: results were rendered with different samples/resolution.")
+
+    baseResults = { r["name"]: r for r in base["results"] }
+    regressions = 0
+    print("%s -> %s (threshold %d%%)" % (base.get("addon_version"), new.get("addon_version"), threshold * 100))
+    print("%-48s %9s %9s %7s %9s %9s %6s" % ("setup", "old s", "new s", "time", "old MB", "new MB", "nodes"))
+    for r in new["results"]:
+        b = baseResults.get(r["name"])
+        if not b:
+            print("%-48s (new)" % r["name"])
+            continue
+
+        dt = r["render_s"] / b["render_s"] - 1.0 if b["render_s"] else 0.0
+        dm = r["peak_mb"] / b["peak_mb"] - 1.0 if b["peak_mb"] else 0.0
+        flag = ""
+        if dt > threshold or dm > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print("%-48s %9.3f %9.3f %+6.1f%% %9.1f %9.1f %+6d%s" % (r["name"], b["render_s"], r["render_s"], dt * 100,
+            b["peak_mb"], r["peak_mb"], r["nodes"] - b["nodes"], flag))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Node Wizard Cycles CPU render cost benchmark.")
+    parser.add_argument("--output", default="nw_bench_render.json")
+    parser.add_argument("--samples", type=int, default=32)
+    parser.add_argument("--resolution", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--texture-size", type=int, default=1024)
+    parser.add_argument("--filter", default="", help="Only run setups containing this text.")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown counted as regression.")
+    args = parser.parse_args(nw_headless.script_args())
+
+    if args.compare:
+        sys.exit(1 if compare(args.compare[0], args.compare[1], args.threshold) else 0)
+    run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+UDIM benchmark, compares the PBR setup with one tiled image per map against
+a hand-built setup with one image node per tile (offset and added up).
+Without Blender it runs against the recording stand-in (node count, build
+time), inside Blender the first Cycles frame of a plane using tile 1001 is
+timed as well (image loading).
+
+    python tools/nw_bench_udim.py [--tiles 1 10 20 60] [--texture-size 64] [--json results.json]
+    blender -b --factory-startup -P tools/nw_bench_udim.py -- [--tiles ..] [--texture-size 1024]
+"""
+
+import sys, os, time, json, types, tempfile, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import bpy
+    standIn = False
+except ImportError:
+    import nw_recording_bpy
+    nw_recording_bpy.install()
+    import bpy
+    standIn = True
+
+import nw_headless
+
+MAPS = [ "diffuse", "roughness", "metal", "normal" ]
+
+# Principled input per map type (normal goes through a Normal Map node).
+INPUTS = { "diffuse": "Base Color", "roughness": "Roughness", "metal": "Metallic", "normal": "Normal" }
+
+class PerTileBuilder:
+    """
+    The setup built by hand: per tile an image node (clipped), its UV offset and
+    an add node summing up all tiles of a map.
+    """
+    def build(self, tree, files):
+        uv = tree.nodes.new("ShaderNodeTexCoord")
+        shader = tree.nodes.new("ShaderNodeBsdfPrincipled")
+        for key, tiles in files.items():
+            total = None
+            for fileName in tiles:
+                tile = int(fileName.split(".")[-2]) - 1001
+                offset = tree.nodes.new("ShaderNodeVectorMath")
+                offset.operation = "SUBTRACT"
+                offset.inputs[1].default_value = (tile % 10, tile // 10, 0.0)
+                tree.links.new(uv.outputs["UV"], offset.inputs[0])
+
+                image = tree.nodes.new("ShaderNodeTexImage")
+                image.image = bpy.data.images.load(fileName)
+                image.extension = "CLIP"
+                tree.links.new(offset.outputs["Vector"], image.inputs["Vector"])
+
+                if total is None:
+                    total = image.outputs["Color"]
+                else:
+                    add = tree.nodes.new("ShaderNodeMixRGB")
+                    add.blend_type = "ADD"
+                    add.inputs["Fac"].default_value = 1.0
+                    tree.links.new(total, add.inputs["Color1"])
+                    tree.links.new(image.outputs["Color"], add.inputs["Color2"])
+                    total = add.outputs["Color"]
+
+            if key == "normal":
+                normal = tree.nodes.new("ShaderNodeNormalMap")
+                tree.links.new(total, normal.inputs["Color"])
+                total = normal.outputs["Normal"]
+            tree.links.new(total, shader.inputs[INPUTS[key]])
+        return shader.outputs["BSDF"]
+
+def count(tree, seen):
+    """
+    Nodes in tree and (once per tree) all nested groups.
+    """
+    n = 0
+    for node in tree.nodes:
+        n += 1
+        if getattr(node, "node_tree", None) and node.node_tree not in seen:
+            seen.add(node.node_tree)
+            n += count(node.node_tree, seen)
+    return n
+
+class Scene:
+    """
+    Blender only: plane (UVs in tile 1001), camera, fixed Cycles settings.
+    """
+    def __init__(self):
+        for o in list(bpy.data.objects):
+            bpy.data.objects.remove(o, do_unlink=True)
+        bpy.ops.mesh.primitive_plane_add()
+        self.object = bpy.context.active_object
+        bpy.ops.object.camera_add(location=(0, 0, 3))
+        scene = bpy.context.scene
+        scene.camera = bpy.context.active_object
+        scene.render.engine = "CYCLES"
+        scene.cycles.device = "CPU"
+        scene.cycles.samples = 1
+        scene.render.resolution_x = scene.render.resolution_y = 64
+        scene.render.filepath = os.path.join(tempfile.gettempdir(), "nw_bench_udim")
+
+    def render(self, tree, shaderOutput):
+        out = tree.nodes.new("ShaderNodeOutputMaterial")
+        tree.links.new(shaderOutput, out.inputs["Surface"])
+        start = time.perf_counter()
+        bpy.ops.render.render(write_still=False)
+        return time.perf_counter() - start
+
+def clear():
+    if standIn:
+        nw_recording_bpy.reset()
+        return
+    for collection in [ bpy.data.materials, bpy.data.node_groups, bpy.data.images ]:
+        for i in list(collection):
+            collection.remove(i)
+
+def material_tree(scene):
+    mat = bpy.data.materials.new("UDIM Bench")
+    mat.use_nodes = True
+    tree = mat.node_tree
+    for n in list(tree.nodes):
+        tree.nodes.remove(n)
+    if scene:
+        scene.object.data.materials.clear()
+        scene.object.data.materials.append(mat)
+    return tree
+
+def measure(name, tiles, build, scene):
+    clear()
+    tree = material_tree(scene)
+    start = time.perf_counter()
+    shaderOutput = build(tree)
+    result = {
+        "setup": name,
+        "tiles": tiles,
+        "build_ms": (time.perf_counter() - start) * 1000.0,
+        "nodes": count(tree, set()),
+        "images": len(bpy.data.images)
+    }
+    if scene:
+        result["first_render_s"] = scene.render(tree, shaderOutput)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Node Wizard UDIM benchmark.")
+    parser.add_argument("--tiles", type=int, nargs="+", default=[ 1, 10, 20, 60 ])
+    parser.add_argument("--texture-size", type=int, default=64)
+    parser.add_argument("--json", help="Write results to this file.")
+    args = parser.parse_args(nw_headless.script_args())
+
+    generate = nw_headless.module("nw_generate_op")
+    scene = None if standIn else Scene()
+
+    def tiled(files):
+        def build(tree):
+            context = types.SimpleNamespace(space_data = types.SimpleNamespace(edit_tree = tree), preferences = bpy.context.preferences)
+            nw_headless.run_operator(generate.NW_GenerateOperator, context, mode = "PBR", filepath = files["diffuse"][0],
+                add_hslbc = False, add_uv = False, decal = False, height_normal = False, normal_strength = 1.0)
+            return [ n for n in tree.nodes if n.type == "GROUP" ][0].outputs["Shader"]
+        return build
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for tiles in args.tiles:
+            files = nw_headless.make_udim_set(os.path.join(folder, str(tiles)), "hero", MAPS, tiles, args.texture_size)
+            results.append(measure("Tiled image per map", tiles, tiled(files), scene))
+            results.append(measure("Image node per tile", tiles, lambda tree: PerTileBuilder().build(tree, files), scene))
+
+    print("%-24s %6s %6s %7s %10s %10s" % ("setup", "tiles", "nodes", "images", "build ms", "render s"))
+    for r in results:
+        render = "%10.3f" % r["first_render_s"] if "first_render_s" in r else "%10s" % "-"
+        print("%-24s %6d %6d %7d %10.2f %s" % (r["setup"], r["tiles"], r["nodes"], r["images"], r["build_ms"], render))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({ "benchmark": "udim", "stand_in": standIn, "results": results }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Texture cache maintenance, e.g. by cron on render nodes: usage statistics,
+verification (broken and stale files are removed) and pruning to a size
+limit (least recently used first). Runs without Blender against the
+recording stand-in as well, the cache code doesn't need a scene.
+
+    NW_CACHE_DIR=/ssd/nw_cache python tools/nw_cache_admin.py stats|verify|prune [--size-gb 10]
+"""
+
+import sys, os, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import bpy
+except ImportError:
+    import nw_recording_bpy
+    nw_recording_bpy.install()
+
+import nw_headless
+
+def main():
+    parser = argparse.ArgumentParser(description="Node Wizard texture cache maintenance.")
+    parser.add_argument("command", choices=[ "stats", "verify", "prune" ])
+    parser.add_argument("--size-gb", type=float, help="Size limit for prune, default from the preferences (10 GB).")
+    args = parser.parse_args(nw_headless.script_args())
+
+    cache = nw_headless.module("nw_cache").NW_Cache
+    gb = 1024.0 ** 3
+
+    if args.command == "verify":
+        checked, removed = cache.verify()
+        for fileName in removed:
+            print("removed %s" % fileName)
+        print("%d files checked, %d removed" % (checked, len(removed)))
+    elif args.command == "prune":
+        count, freed = cache.enforce(args.size_gb * gb if args.size_gb else None)
+        print("%d files evicted, %.2f GB freed" % (count, freed / gb))
+
+    entries = cache.entries()
+    print("%s: %d files, %.2f GB" % (cache.directory(), len(entries), sum(e[1] for e in entries) / gb))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Fit the render cost table to measured Cycles CPU renders (result files of
+tools/nw_bench_render.py, no Blender required). Select the written table in
+the add-on preferences (Render Cost) to get estimates in seconds per frame
+of the benchmark scene.
+
+    python tools/nw_cost_calibrate.py results.json [more.json ..] --output cost_table.json
+"""
+
+import sys, os, json, argparse
+
+# The add-on modules used here don't import bpy, load them standalone.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nw_cost_table import NW_CostTable
+
+def main():
+    parser = argparse.ArgumentParser(description="Node Wizard render cost calibration.")
+    parser.add_argument("results", nargs="+")
+    parser.add_argument("--output", required=True, help="Cost table to write.")
+    args = parser.parse_args()
+
+    samples, names = [], []
+    for fileName in args.results:
+        with open(fileName) as f:
+            for r in json.load(f)["results"]:
+                if "cost_counts" in r:
+                    samples.append((r["cost_counts"], r["render_s"]))
+                    names.append(r["name"])
+    if not samples:
+        sys.exit("No results with cost counts, run tools/nw_bench_render.py first.")
+
+    table = NW_CostTable.fit(samples)
+    table.save(args.output)
+
+    print("%-20s %12s" % ("category", "s / unit"))
+    for key, value in sorted(table.costs.items()):
+        print("%-20s %12.6f" % (key, value))
+    print()
+    print("%-48s %10s %10s" % ("setup", "measured", "estimate"))
+    for name, (counts, seconds) in zip(names, samples):
+        print("%-48s %10.3f %10.3f" % (name, seconds, table.score(counts) + table.costs["base"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Flatten the PBR groups of all materials into baked images (Base Color,
+Roughness, Metallic, Specular, Normal, Alpha if used) and a plain Principled
+BSDF, per object with Cycles CPU, same as "Flatten Selected Objects" in the
+panel. For final renders and exports, the group controls are frozen. Folders
+are searched recursively for .blend files.
+
+    blender -b --factory-startup -P tools/nw_flatten.py -- [--resolution 2048]
+        [--samples 16] [--output textures/] [--save] file.blend folder ...
+"""
+
+import sys, os, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import nw_headless
+from nw_gc_batch import blend_files
+
+def main():
+    parser = argparse.ArgumentParser(description="Node Wizard flattening of PBR groups over .blend files.")
+    parser.add_argument("paths", nargs="+", help=".blend files or folders")
+    parser.add_argument("--resolution", type=int, default=2048)
+    parser.add_argument("--samples", type=int, default=16)
+    parser.add_argument("--output", help="Save the images as PNG files in this folder (packed otherwise).")
+    parser.add_argument("--save", action="store_true", help="Save the files after flattening.")
+    args = parser.parse_args(nw_headless.script_args())
+
+    import bpy
+    flattener = nw_headless.module("nw_flatten").NW_Flattener()
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    for fileName in blend_files(args.paths):
+        bpy.ops.wm.open_mainfile(filepath=fileName, load_ui=False)
+        groups = baked = 0
+        for obj, material, nodes in flattener.work(bpy.context.scene.objects):
+            for node in nodes:
+                baked += flattener.flatten(bpy.context, obj, material, node, args.resolution, args.samples,
+                    os.path.abspath(args.output) if args.output else None)
+                groups += 1
+
+        if args.save and groups:
+            bpy.ops.wm.save_mainfile(filepath=fileName)
+        print("%s: %d groups flattened into %d images" % (fileName, groups, baked))
+
+if __name__ == "__main__":
+    main()
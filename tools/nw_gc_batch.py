@@ -0,0 +1,75 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Report (default) or remove unused Node Wizard groups and images in many .blend
+files. Folders are searched recursively for .blend files.
+
+    blender -b --factory-startup -P tools/nw_gc_batch.py -- [--purge] [--json report.json] file.blend folder ...
+"""
+
+import sys, os, json, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import nw_headless
+
+def blend_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.endswith(".blend"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def main():
+    parser = argparse.ArgumentParser(description="Node Wizard garbage collection over .blend files.")
+    parser.add_argument("paths", nargs="+", help=".blend files or folders")
+    parser.add_argument("--purge", action="store_true", help="Remove the unused data and save the files.")
+    parser.add_argument("--json", help="Write the per file report to this file.")
+    args = parser.parse_args(nw_headless.script_args())
+
+    import bpy
+    gc = nw_headless.module("nw_gc").NW_GarbageCollector
+
+    report = []
+    for fileName in blend_files(args.paths):
+        before = os.path.getsize(fileName)
+        bpy.ops.wm.open_mainfile(filepath=fileName, load_ui=False)
+        summary = gc.collect(args.purge)
+        summary["file"] = fileName
+        summary["file_bytes"] = before
+
+        if args.purge and (summary["groups"] or summary["images"]):
+            bpy.ops.wm.save_mainfile(filepath=fileName)
+            summary["file_bytes_after"] = os.path.getsize(fileName)
+
+        print("%s: %s" % (fileName, gc.text(summary, args.purge)))
+        report.append(summary)
+
+    mb = 1024.0 * 1024.0
+    print("Total: %d files, %d groups, %d images, %.1f MB packed, %.1f MB image memory" % (len(report),
+        sum(len(r["groups"]) for r in report), sum(len(r["images"]) for r in report),
+        sum(r["packed_bytes"] for r in report) / mb, sum(r["memory_bytes"] for r in report) / mb))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Helpers shared by the headless scripts in this folder. They either run
+inside Blender (blender -b -P tools/xxx.py -- args) or, for the build
+benchmarks, against the recording stand-in (nw_recording_bpy).
+"""
+
+import sys, os, struct, zlib, importlib, importlib.util
+
+PACKAGE = "material_node_wizard"
+
+def addon_root():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_addon(register = False):
+    """
+    Import the add-on package from this checkout (independent of the folder
+    name) and optionally register it. Returns the package module.
+    """
+    if PACKAGE in sys.modules:
+        return sys.modules[PACKAGE]
+
+    spec = importlib.util.spec_from_file_location(PACKAGE, os.path.join(addon_root(), "__init__.py"),
+        submodule_search_locations=[addon_root()])
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = addon
+    spec.loader.exec_module(addon)
+
+    if register:
+        addon.register()
+    return addon
+
+def module(name):
+    """
+    Return a sub module of the add-on, e.g. module("nw_generate_op").
+    """
+    load_addon()
+    return importlib.import_module(PACKAGE + "." + name)
+
+def script_args():
+    """
+    Arguments after '--' (Blender passes its own arguments before).
+    """
+    return sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+
+# File name endings used for synthetic texture sets, see NW_TextureMapper.
+MAP_SUFFIX = {
+    "diffuse": "basecolor",
+    "metal": "metallic",
+    "specular": "specular",
+    "roughness": "roughness",
+    "gloss": "gloss",
+    "normal": "normal",
+    "height": "height"
+}
+
+def write_png(fileName, width, height, channels = 3, bitDepth = 8, pixel = None):
+    """
+    Write a PNG with constant content (pixel is a tuple of channel values in 0..1).
+    """
+    colorType = { 1: 0, 2: 4, 3: 2, 4: 6 }[channels]
+    pixel = pixel or (0.5,) * channels
+    if bitDepth == 8:
+        sample = bytes(int(v * 255) for v in pixel)
+    else:
+        sample = b"".join(struct.pack(">H", int(v * 65535)) for v in pixel)
+    raw = (b"\0" + sample * width) * height
+
+    def chunk(tag, payload):
+        return struct.pack(">I", len(payload)) + tag + payload + struct.pack(">I", zlib.crc32(tag + payload) & 0xffffffff)
+
+    with open(fileName, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bitDepth, colorType, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw)))
+        f.write(chunk(b"IEND", b""))
+
+def make_texture_set(directory, name, maps, size = 64):
+    """
+    Write a synthetic texture set (one PNG per map type), returns dict map type -> file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    for key in maps:
+        fileName = os.path.join(directory, "%s_%s.png" % (name, MAP_SUFFIX[key]))
+        if key == "normal":
+            write_png(fileName, size, size, 3, 8, (0.5, 0.5, 1.0))
+        elif key == "diffuse":
+            write_png(fileName, size, size, 4, 8, (0.8, 0.4, 0.2, 1.0))
+        else:
+            write_png(fileName, size, size, 1, 8)
+        files[key] = fileName
+    return files
+
+def make_udim_set(directory, name, maps, tiles, size = 64):
+    """
+    Write a synthetic UDIM texture set (name_map.1001.png ..), returns dict map type -> list of files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    for key in maps:
+        files[key] = []
+        for tile in range(1001, 1001 + tiles):
+            fileName = os.path.join(directory, "%s_%s.%d.png" % (name, MAP_SUFFIX[key], tile))
+            write_png(fileName, size, size, 4 if key == "diffuse" else 3, 8)
+            files[key].append(fileName)
+    return files
+
+def run_operator(cls, context, **props):
+    """
+    Run execute() of an operator class outside of bpy.ops (e.g. with a tree that
+    isn't shown in any editor). Registered operators can't be instantiated, so
+    a plain class with the same methods and mixins is used. Returns (result, reports).
+    """
+    bases = tuple(b for b in cls.__bases__ if b.__name__ != "Operator")
+    members = { k: v for k, v in cls.__dict__.items() if k not in ("__dict__", "__weakref__") }
+    reports = []
+    members["report"] = lambda self, type, message: reports.append((set(type), message))
+    runner = type(cls.__name__ + "Runner", bases, members)()
+    for name, value in props.items():
+        setattr(runner, name, value)
+    return runner.execute(context), reports
@@ -0,0 +1,145 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Stand-in texture library server: serves a folder over HTTP/1.1 (keep-alive,
+byte ranges) with the JSON index NW_HttpSource expects (<url>/index.json).
+With --check it downloads the folder's texture sets through NW_HttpSource
+twice (second run from the local cache) and reports connections, requests
+and bytes, no Blender required.
+
+    python tools/nw_http_server.py textures/ [--port 8765] [--no-ranges]
+    python tools/nw_http_server.py textures/ --check [--chunk-kb 256]
+"""
+
+import sys, os, json, time, tempfile, argparse, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nw_texture_source import NW_HttpSource
+from nw_texture_mapper import NW_TextureMapper
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    root = None
+    ranges = True
+    stats = { "connections": 0, "requests": 0, "bytes": 0 }
+
+    def setup(self):
+        super().setup()
+        Handler.stats["connections"] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body, headers = {}):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        Handler.stats["bytes"] += len(body)
+
+    def index(self):
+        files = []
+        for path, _, names in os.walk(Handler.root):
+            for name in names:
+                fileName = os.path.join(path, name)
+                st = os.stat(fileName)
+                files.append({ "path": os.path.relpath(fileName, Handler.root).replace(os.sep, "/"), "size": st.st_size, "mtime": st.st_mtime })
+        return json.dumps({ "files": files }).encode("utf-8")
+
+    def do_GET(self):
+        Handler.stats["requests"] += 1
+        path = unquote(self.path.split("?")[0]).lstrip("/")
+        if path == "index.json":
+            self.send(200, self.index(), { "Content-Type": "application/json" })
+            return
+
+        fileName = os.path.realpath(os.path.join(Handler.root, path))
+        if not fileName.startswith(os.path.realpath(Handler.root) + os.sep) or not os.path.isfile(fileName):
+            self.send(404, b"")
+            return
+        with open(fileName, "rb") as f:
+            data = f.read()
+
+        value = self.headers.get("Range", "")
+        if Handler.ranges and value.startswith("bytes="):
+            first, last = value[6:].split("-")
+            first, last = int(first), min(int(last or len(data) - 1), len(data) - 1)
+            self.send(206, data[first:last + 1], { "Content-Range": "bytes %d-%d/%d" % (first, last, len(data)), "Accept-Ranges": "bytes" })
+        else:
+            self.send(200, data)
+
+def serve(folder, port, ranges):
+    Handler.root = os.path.abspath(folder)
+    Handler.ranges = ranges
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    return server
+
+def check(server, chunk):
+    """
+    Download all sets twice, the second run must be served by the cache.
+    """
+    url = "http://127.0.0.1:%d" % server.server_address[1]
+    NW_HttpSource.chunk = chunk
+    with tempfile.TemporaryDirectory() as folder:
+        source = NW_HttpSource(url, os.path.join(folder, "remote"))
+        NW_TextureMapper.sources = [ source ]
+        for run in [ "first", "second" ]:
+            before = dict(Handler.stats)
+            start = time.perf_counter()
+            mappers = NW_TextureMapper.scanSets(source.walk(url))
+            NW_TextureMapper.localize(mappers)
+            elapsed = time.perf_counter() - start
+            delta = { k: Handler.stats[k] - before[k] for k in before }
+            print("%s run: %d sets, %d maps local, %.3f s, %d connections, %d requests, %.1f MB" % (run, len(mappers),
+                sum(len(m.maps()) for m in mappers if m.valid), elapsed, delta["connections"], delta["requests"], delta["bytes"] / 1024.0 ** 2))
+
+        # Downloads must match the served files.
+        for m in mappers:
+            for key, fileName in m.maps().items():
+                remote = [ f for f in source.index() if source.local(f) == fileName ][0]
+                with open(fileName, "rb") as a, open(os.path.join(server.RequestHandlerClass.root, remote[len(url) + 1:]), "rb") as b:
+                    if a.read() != b.read():
+                        print("MISMATCH %s" % fileName)
+        source.pool.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in HTTP texture library.")
+    parser.add_argument("folder")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-ranges", action="store_true", help="Ignore Range headers (full responses only).")
+    parser.add_argument("--check", action="store_true", help="Download the sets through NW_HttpSource and exit.")
+    parser.add_argument("--chunk-kb", type=int, default=8192, help="Range size for --check.")
+    args = parser.parse_args()
+
+    server = serve(args.folder, 0 if args.check else args.port, not args.no_ranges)
+    if not args.check:
+        print("Serving %s at http://127.0.0.1:%d" % (Handler.root, server.server_address[1]))
+        server.serve_forever()
+        return
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    check(server, args.chunk_kb * 1024)
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Report (default) or merge duplicate Node Wizard groups in many .blend files:
+generated groups with the same structure, i.e. generated from the same
+sources and options (with or without fingerprint). Same as "Merge Duplicate
+Groups" in the panel. Folders are searched recursively.
+
+    blender -b --factory-startup -P tools/nw_merge_groups.py -- [--merge] file.blend folder ...
+"""
+
+import sys, os, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import nw_headless
+from nw_gc_batch import blend_files
+
+def main():
+    parser = argparse.ArgumentParser(description="Node Wizard duplicate group merging over .blend files.")
+    parser.add_argument("paths", nargs="+", help=".blend files or folders")
+    parser.add_argument("--merge", action="store_true", help="Merge the duplicates and save the files.")
+    args = parser.parse_args(nw_headless.script_args())
+
+    import bpy
+    registry = nw_headless.module("nw_group_registry").NW_GroupRegistry
+
+    total = 0
+    for fileName in blend_files(args.paths):
+        bpy.ops.wm.open_mainfile(filepath=fileName, load_ui=False)
+        sets = registry.duplicates()
+        for keep, *others in sets:
+            print("%s: %s <- %s" % (fileName, keep.name, ", ".join(t.name for t in others)))
+        count = sum(len(trees) - 1 for trees in sets)
+        if args.merge and count:
+            registry.merge()
+            bpy.ops.wm.save_mainfile(filepath=fileName)
+        print("%s: %d duplicate groups%s" % (fileName, count, " merged" if args.merge else ""))
+        total += count
+    print("Total: %d duplicate groups" % total)
+
+if __name__ == "__main__":
+    main()
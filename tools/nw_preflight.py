@@ -0,0 +1,74 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+Header-only validation of all texture sets below the given folders (no
+Blender required), same checks as done before generating a setup. Exit
+code 1 if any set has errors.
+
+    python tools/nw_preflight.py [--workers 32] [--json report.json] [--warnings] folder ...
+"""
+
+import sys, os, json, time, argparse
+
+# The add-on modules used here don't import bpy, load them standalone.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nw_texture_mapper import NW_TextureMapper
+from nw_preflight import NW_Preflight
+
+def main():
+    parser = argparse.ArgumentParser(description="Node Wizard texture set pre-flight check.")
+    parser.add_argument("folders", nargs="+")
+    parser.add_argument("--workers", type=int, default=NW_Preflight.workers, help="Parallel header reads.")
+    parser.add_argument("--json", help="Write the report to this file.")
+    parser.add_argument("--warnings", action="store_true", help="Print warnings as well.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    files = []
+    for folder in args.folders:
+        for root, _, names in os.walk(folder):
+            files += [ os.path.join(root, n) for n in names ]
+
+    NW_Preflight.workers = args.workers
+    mappers = NW_TextureMapper.scanSets(files)
+    sets = [ m.files() for m in mappers ]
+    results = NW_Preflight.check_sets(sets)
+    elapsed = time.perf_counter() - start
+
+    report = []
+    errors = 0
+    for mapper, maps, issues in zip(mappers, sets, results):
+        shown = [ i for i in issues if args.warnings or i[0] == "ERROR" ]
+        if shown:
+            print(os.path.join(mapper.path, mapper.baseName))
+            for level, message in shown:
+                print("    %-7s %s" % (level, message))
+        if any(level == "ERROR" for level, _ in issues):
+            errors += 1
+        report.append({ "path": mapper.path, "set": mapper.baseName, "maps": maps, "issues": issues })
+
+    print("%d sets, %d files checked in %.2fs, %d sets with errors" % (len(mappers),
+        sum(len(f) for maps in sets for f in maps.values()), elapsed, errors))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if errors else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,768 @@
+# Copyright (C) 2019 h0bB1T
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+#
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""
+In-memory stand-in for the small part of bpy used by Node Wizard. Every call
+that would be an RNA round-trip in Blender is recorded, so the real builders
+can be run, measured and compared without a running Blender.
+
+    import nw_recording_bpy
+    recorder = nw_recording_bpy.install()   # before the add-on is imported
+
+Node sockets are created on first access (by name or index), only group
+nodes derive their sockets from the interface of their tree.
+"""
+
+import sys, os, re, types
+from collections import Counter
+
+class Recorder:
+    """
+    Collects all calls, reset between measurements.
+    """
+    def __init__(self):
+        self.calls = []
+        self.counts = Counter()
+
+    def record(self, name, *args):
+        self.calls.append((name, args))
+        self.counts[name] += 1
+
+    def reset(self):
+        self.calls.clear()
+        self.counts.clear()
+
+recorder = Recorder()
+
+#########################################
+# ID data blocks and collections.
+
+class ID:
+    """
+    Base of all data blocks, supports custom properties like bpy ID.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.users = 0
+        self.use_fake_user = False
+        self.props = {}
+
+    def __getitem__(self, key):
+        return self.props[key]
+
+    def __setitem__(self, key, value):
+        recorder.record("id.custom_property", self.name, key)
+        self.props[key] = value
+
+    def __delitem__(self, key):
+        del self.props[key]
+
+    def __contains__(self, key):
+        return key in self.props
+
+    def get(self, key, default = None):
+        return self.props.get(key, default)
+
+    def keys(self):
+        return self.props.keys()
+
+    def as_pointer(self):
+        return id(self)
+
+    def user_remap(self, other):
+        recorder.record("id.user_remap", self.name, other.name)
+        for tree in data.node_groups.items + data.materials_trees():
+            for node in tree.nodes:
+                if getattr(node, "node_tree", None) is self:
+                    node.node_tree = other
+                if getattr(node, "image", None) is self:
+                    node.image = other
+
+class IDCollection:
+    """
+    bpy.data.xxx collection, names are made unique like in Blender.
+    """
+    def __init__(self, kind, factory):
+        self.kind = kind
+        self.factory = factory
+        self.items = []
+
+    def unique_name(self, name):
+        names = set(i.name for i in self.items)
+        if name not in names:
+            return name
+        n = 1
+        while "%s.%03d" % (name, n) in names:
+            n += 1
+        return "%s.%03d" % (name, n)
+
+    def new(self, name, *args):
+        recorder.record(self.kind + ".new", name)
+        item = self.factory(self.unique_name(name), *args)
+        self.items.append(item)
+        return item
+
+    def load(self, filepath, check_existing = False):
+        recorder.record(self.kind + ".load", filepath)
+        if check_existing:
+            for i in self.items:
+                if i.filepath == filepath:
+                    return i
+        item = self.factory(self.unique_name(os.path.basename(filepath)))
+        item.filepath = filepath
+        self.items.append(item)
+        return item
+
+    def remove(self, item, do_unlink = True):
+        recorder.record(self.kind + ".remove", item.name)
+        self.items.remove(item)
+
+    def find(self, name):
+        for n, i in enumerate(self.items):
+            if i.name == name:
+                return n
+        return -1
+
+    def get(self, name, default = None):
+        index = self.find(name)
+        return self.items[index] if index >= 0 else default
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.items[key]
+        index = self.find(key)
+        if index < 0:
+            raise KeyError(key)
+        return self.items[index]
+
+    def __contains__(self, name):
+        return self.find(name) >= 0
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def __len__(self):
+        return len(self.items)
+
+    def clear(self):
+        self.items.clear()
+
+#########################################
+# Node trees.
+
+class Vector:
+    def __init__(self, x = 0.0, y = 0.0):
+        self.x, self.y = x, y
+
+    def __iter__(self):
+        return iter((self.x, self.y))
+
+    def __getitem__(self, index):
+        return (self.x, self.y)[index]
+
+class Socket:
+    def __init__(self, node, name, identifier):
+        self.node = node
+        self.name = name
+        self.identifier = identifier
+        self.default_value = 0.0
+        self.links = []
+        self.hide = False
+
+    @property
+    def is_linked(self):
+        return len(self.links) > 0
+
+class SocketCollection:
+    """
+    Sockets of a node, created on first access.
+    """
+    def __init__(self, node, isOutput):
+        self.node = node
+        self.isOutput = isOutput
+        self.sockets = []
+
+    def create(self, name):
+        socket = Socket(self.node, name, "%s_%d" % (name, len(self.sockets)))
+        self.sockets.append(socket)
+        return socket
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            while len(self.sockets) <= key:
+                self.create("Socket%d" % len(self.sockets))
+            return self.sockets[key]
+        for s in self.sockets:
+            if s.name == key:
+                return s
+        return self.create(key)
+
+    def find(self, name):
+        for n, s in enumerate(self.sockets):
+            if s.name == name:
+                return n
+        return -1
+
+    def get(self, name, default = None):
+        index = self.find(name)
+        return self.sockets[index] if index >= 0 else default
+
+    def __iter__(self):
+        return iter(list(self.sockets))
+
+    def __len__(self):
+        return len(self.sockets)
+
+class InterfaceSocketCollection(SocketCollection):
+    """
+    Sockets mirrored from a group interface (group nodes, group input/output nodes).
+    """
+    def __init__(self, node, interface):
+        SocketCollection.__init__(self, node, False)
+        self.interface = interface
+
+    def sync(self):
+        for n in range(len(self.sockets), len(self.interface)):
+            socket = self.create(self.interface[n].name)
+            socket.default_value = self.interface[n].default_value
+
+    def __getitem__(self, key):
+        self.sync()
+        if isinstance(key, int):
+            return self.sockets[key]
+        for s in self.sockets:
+            if s.name == key:
+                return s
+        raise KeyError(key)
+
+    def find(self, name):
+        self.sync()
+        return SocketCollection.find(self, name)
+
+    def __iter__(self):
+        self.sync()
+        return SocketCollection.__iter__(self)
+
+    def __len__(self):
+        self.sync()
+        return len(self.sockets)
+
+class InterfaceSocket:
+    def __init__(self, type, name):
+        self.bl_socket_idname = type
+        self.name = name
+        self.default_value = 0.0
+        self.min_value = 0.0
+        self.max_value = 1.0
+
+class Interface:
+    """
+    tree.inputs / tree.outputs.
+    """
+    def __init__(self, kind):
+        self.kind = kind
+        self.sockets = []
+
+    def new(self, type, name):
+        recorder.record("tree." + self.kind + ".new", type, name)
+        socket = InterfaceSocket(type, name)
+        self.sockets.append(socket)
+        return socket
+
+    def remove(self, socket):
+        recorder.record("tree." + self.kind + ".remove", socket.name)
+        self.sockets.remove(socket)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.sockets[key]
+        for s in self.sockets:
+            if s.name == key:
+                return s
+        raise KeyError(key)
+
+    def find(self, name):
+        for n, s in enumerate(self.sockets):
+            if s.name == name:
+                return n
+        return -1
+
+    def __iter__(self):
+        return iter(list(self.sockets))
+
+    def __len__(self):
+        return len(self.sockets)
+
+class ColorRampElement:
+    def __init__(self, position):
+        self.position = position
+        self.color = (0, 0, 0, 1)
+
+class ColorRamp:
+    def __init__(self):
+        self.elements = [ ColorRampElement(0.0), ColorRampElement(1.0) ]
+
+class ColorSpace:
+    def __init__(self):
+        self.name = "sRGB"
+
+# Node.type as seen by the add-on, everything else is derived from the idname.
+NODE_TYPES = {
+    "ShaderNodeBsdfPrincipled": "BSDF_PRINCIPLED",
+    "ShaderNodeTexImage": "TEX_IMAGE",
+    "ShaderNodeTexNoise": "TEX_NOISE",
+    "ShaderNodeTexWhiteNoise": "TEX_WHITE_NOISE",
+    "ShaderNodeGroup": "GROUP",
+    "NodeGroupInput": "GROUP_INPUT",
+    "NodeGroupOutput": "GROUP_OUTPUT",
+    "ShaderNodeOutputMaterial": "OUTPUT_MATERIAL",
+    "ShaderNodeMixShader": "MIX_SHADER",
+    "ShaderNodeMixRGB": "MIX_RGB",
+    "ShaderNodeNormalMap": "NORMAL_MAP",
+    "ShaderNodeBump": "BUMP",
+    "ShaderNodeMath": "MATH",
+    "ShaderNodeVectorMath": "VECT_MATH",
+    "ShaderNodeValToRGB": "VALTORGB",
+    "ShaderNodeAmbientOcclusion": "AMBIENT_OCCLUSION",
+    "ShaderNodeBevel": "BEVEL",
+    "ShaderNodeEmission": "EMISSION",
+    "ShaderNodeAttribute": "ATTRIBUTE",
+    "ShaderNodeObjectInfo": "OBJECT_INFO",
+    "NodeReroute": "REROUTE",
+}
+
+class Node:
+    def __init__(self, tree, bl_idname, name):
+        object.__setattr__(self, "location", Vector())
+        self.id_data = tree
+        self.bl_idname = bl_idname
+        self.type = NODE_TYPES.get(bl_idname, bl_idname.upper())
+        self.name = name
+        self.label = ""
+        self.select = False
+        self.mute = False
+        self.parent = None
+        self.width = 140.0
+        self.image = None
+        self.node_tree = None
+        if bl_idname == "ShaderNodeValToRGB":
+            self.color_ramp = ColorRamp()
+        self.inputs = SocketCollection(self, False)
+        self.outputs = SocketCollection(self, True)
+        object.__setattr__(self, "props", {})
+
+    # Custom properties like bpy nodes.
+    def __getitem__(self, key):
+        return self.props[key]
+
+    def __setitem__(self, key, value):
+        self.props[key] = value
+
+    def __contains__(self, key):
+        return key in self.props
+
+    def get(self, key, default = None):
+        return self.props.get(key, default)
+
+    def as_pointer(self):
+        return id(self)
+
+    def __setattr__(self, name, value):
+        if name == "location":
+            self.location.x, self.location.y = value[0], value[1]
+            return
+        if name == "node_tree" and value is not None:
+            recorder.record("node.node_tree", value.name)
+            object.__setattr__(self, "inputs", InterfaceSocketCollection(self, value.inputs))
+            object.__setattr__(self, "outputs", InterfaceSocketCollection(self, value.outputs))
+        elif name == "image" and value is not None:
+            recorder.record("node.image", value.name)
+
+        # Nodes are users of their group tree/image.
+        if name in ("node_tree", "image"):
+            old = getattr(self, name, None)
+            if old is not None:
+                old.users -= 1
+            if value is not None:
+                value.users += 1
+        object.__setattr__(self, name, value)
+
+class NodeCollection:
+    def __init__(self, tree):
+        self.tree = tree
+        self.nodes = []
+
+    def new(self, type):
+        recorder.record("nodes.new", type)
+        names = set(n.name for n in self.nodes)
+        base = type.replace("ShaderNode", "").replace("Node", "")
+        name, n = base, 1
+        while name in names:
+            name = "%s.%03d" % (base, n)
+            n += 1
+        node = Node(self.tree, type, name)
+        if type == "NodeGroupInput":
+            node.outputs = InterfaceSocketCollection(node, self.tree.inputs)
+        elif type == "NodeGroupOutput":
+            node.inputs = InterfaceSocketCollection(node, self.tree.outputs)
+        self.nodes.append(node)
+        return node
+
+    def remove(self, node):
+        recorder.record("nodes.remove", node.bl_idname)
+        for l in list(self.tree.links):
+            if l.from_node is node or l.to_node is node:
+                self.tree.links.remove(l)
+        node.node_tree = node.image = None
+        self.nodes.remove(node)
+
+    def find(self, name):
+        for n, node in enumerate(self.nodes):
+            if node.name == name:
+                return n
+        return -1
+
+    def get(self, name, default = None):
+        index = self.find(name)
+        return self.nodes[index] if index >= 0 else default
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.nodes[key]
+        index = self.find(key)
+        if index < 0:
+            raise KeyError(key)
+        return self.nodes[index]
+
+    def __iter__(self):
+        return iter(list(self.nodes))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def active(self):
+        return self.nodes[-1] if self.nodes else None
+
+class Link:
+    def __init__(self, fromSocket, toSocket):
+        self.from_socket = fromSocket
+        self.to_socket = toSocket
+        self.from_node = fromSocket.node
+        self.to_node = toSocket.node
+        self.is_valid = True
+
+class LinkCollection:
+    def __init__(self, tree):
+        self.tree = tree
+        self.links = []
+
+    def new(self, fromSocket, toSocket):
+        recorder.record("links.new", fromSocket.name, toSocket.name)
+        # Inputs take a single link, like in Blender.
+        for l in list(toSocket.links):
+            self.remove(l)
+        link = Link(fromSocket, toSocket)
+        fromSocket.links.append(link)
+        toSocket.links.append(link)
+        self.links.append(link)
+        return link
+
+    def remove(self, link):
+        recorder.record("links.remove")
+        link.from_socket.links.remove(link)
+        link.to_socket.links.remove(link)
+        self.links.remove(link)
+
+    def __iter__(self):
+        return iter(list(self.links))
+
+    def __len__(self):
+        return len(self.links)
+
+class NodeTree(ID):
+    def __init__(self, name, type = "ShaderNodeTree"):
+        ID.__init__(self, name)
+        self.bl_idname = type
+        self.nodes = NodeCollection(self)
+        self.links = LinkCollection(self)
+        self.inputs = Interface("inputs")
+        self.outputs = Interface("outputs")
+
+    def update_tag(self):
+        recorder.record("tree.update_tag", self.name)
+
+class Material(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self.use_nodes = False
+        self.node_tree = NodeTree(name)
+        self.node_tree.nodes.new("ShaderNodeOutputMaterial")
+
+class ImageTile:
+    def __init__(self, number):
+        self.number = number
+
+class ImageTiles:
+    def __init__(self):
+        self.tiles = [ ImageTile(1001) ]
+
+    def new(self, tile_number = 1002, label = ""):
+        recorder.record("image.tiles.new", tile_number)
+        tile = ImageTile(tile_number)
+        self.tiles.append(tile)
+        return tile
+
+    def __getitem__(self, index):
+        return self.tiles[index]
+
+    def __iter__(self):
+        return iter(self.tiles)
+
+    def __len__(self):
+        return len(self.tiles)
+
+class Image(ID):
+    def __init__(self, name, width = 0, height = 0, alpha = False, float_buffer = False):
+        ID.__init__(self, name)
+        self.filepath = ""
+        self.filepath_raw = ""
+        self.source = "FILE"
+        self.file_format = "PNG"
+        self.size = (width, height)
+        self.is_float = float_buffer
+        self.colorspace_settings = ColorSpace()
+        self.packed_file = None
+        self.has_data = False
+        self.tiles = ImageTiles()
+        self.depth = 128 if float_buffer else 8 * (4 if alpha else 3)
+
+    def reload(self):
+        recorder.record("image.reload", self.name)
+
+    def save(self):
+        recorder.record("image.save", self.name)
+
+    def pack(self):
+        recorder.record("image.pack", self.name)
+        self.packed_file = types.SimpleNamespace(data=b"", size=0)
+
+class LibraryData:
+    def __init__(self):
+        self.node_groups = []
+        self.materials = []
+        self.images = []
+
+class LibraryLoader:
+    """
+    bpy.data.libraries.load(), nothing is found in any library.
+    """
+    def __init__(self, filepath, link):
+        recorder.record("libraries.load", filepath, link)
+
+    def __enter__(self):
+        return (LibraryData(), LibraryData())
+
+    def __exit__(self, *args):
+        return False
+
+class Libraries:
+    def load(self, filepath, link = False, relative = False):
+        return LibraryLoader(filepath, link)
+
+    def write(self, filepath, datablocks, fake_user = False, path_remap = "NONE", compress = False):
+        recorder.record("libraries.write", filepath, len(datablocks))
+        with open(filepath, "wb") as f:
+            f.write(b"BLENDER")
+
+class Data:
+    def __init__(self):
+        self.node_groups = IDCollection("node_groups", NodeTree)
+        self.images = IDCollection("images", Image)
+        self.materials = IDCollection("materials", Material)
+        self.objects = IDCollection("objects", ID)
+        self.libraries = Libraries()
+        self.filepath = ""
+
+    def materials_trees(self):
+        return [ m.node_tree for m in self.materials.items ]
+
+    def reset(self):
+        self.node_groups.clear()
+        self.images.clear()
+        self.materials.clear()
+        self.objects.clear()
+
+data = Data()
+
+#########################################
+# Types, properties, utils, app, ops.
+
+class _Property:
+    """
+    Result of bpy.props.XxxProperty(), operators get the default on creation.
+    """
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        self.kwargs = kwargs
+
+    def default(self):
+        if "default" in self.kwargs:
+            return self.kwargs["default"]
+        return { "BoolProperty": False, "IntProperty": 0, "FloatProperty": 0.0,
+            "StringProperty": "", "CollectionProperty": [] }.get(self.kind)
+
+def _property(kind):
+    return lambda **kwargs: _Property(kind, **kwargs)
+
+class bpy_struct:
+    def __init__(self):
+        super().__init__()
+        for cls in reversed(type(self).__mro__):
+            for name, value in getattr(cls, "__annotations__", {}).items():
+                if isinstance(value, _Property) and not hasattr(self, name):
+                    setattr(self, name, value.default())
+        self.reports = []
+
+    def report(self, type, message):
+        recorder.record("operator.report", tuple(type), message)
+        self.reports.append((tuple(type), message))
+
+class Operator(bpy_struct):
+    pass
+
+class Panel(bpy_struct):
+    pass
+
+class PropertyGroup(bpy_struct):
+    pass
+
+class AddonPreferences(bpy_struct):
+    pass
+
+class UIList(bpy_struct):
+    pass
+
+class OperatorFileListElement(bpy_struct):
+    pass
+
+class WindowManager(bpy_struct):
+    pass
+
+class Previews:
+    """
+    bpy.utils.previews collection.
+    """
+    def __init__(self):
+        self.icons = {}
+
+    def load(self, name, path, type):
+        icon = types.SimpleNamespace(icon_id = len(self.icons) + 1)
+        self.icons[name] = icon
+        return icon
+
+    def __getitem__(self, name):
+        return self.icons[name]
+
+    def __contains__(self, name):
+        return name in self.icons
+
+class Timers:
+    def __init__(self):
+        self.functions = {}
+
+    def register(self, function, first_interval = 0.0, persistent = False):
+        self.functions[function] = first_interval
+
+    def unregister(self, function):
+        del self.functions[function]
+
+    def is_registered(self, function):
+        return function in self.functions
+
+class _OpsNamespace:
+    """
+    bpy.ops.xxx.yyy(), every operator call just gets recorded.
+    """
+    def __init__(self, path = "ops"):
+        self.path = path
+
+    def __getattr__(self, name):
+        return _OpsNamespace(self.path + "." + name)
+
+    def __call__(self, *args, **kwargs):
+        recorder.record(self.path, args, tuple(sorted(kwargs)))
+        return { "FINISHED" }
+
+def install():
+    """
+    Register the stand-in as bpy (and sub modules) in sys.modules, returns the recorder.
+    """
+    bpy = types.ModuleType("bpy")
+    bpy.data = data
+    bpy.ops = _OpsNamespace()
+
+    bpy.types = types.ModuleType("bpy.types")
+    for cls in [ bpy_struct, Operator, Panel, PropertyGroup, AddonPreferences, UIList,
+        OperatorFileListElement, WindowManager, ID, NodeTree, Node, Image, Material ]:
+        setattr(bpy.types, cls.__name__, cls)
+
+    bpy.props = types.ModuleType("bpy.props")
+    for kind in [ "BoolProperty", "IntProperty", "FloatProperty", "StringProperty", "EnumProperty",
+        "PointerProperty", "CollectionProperty", "FloatVectorProperty", "IntVectorProperty" ]:
+        setattr(bpy.props, kind, _property(kind))
+    bpy.props.__all__ = [ k for k in dir(bpy.props) if k.endswith("Property") ]
+
+    bpy.utils = types.ModuleType("bpy.utils")
+    bpy.utils.register_class = lambda cls: recorder.record("utils.register_class", cls.__name__)
+    bpy.utils.unregister_class = lambda cls: recorder.record("utils.unregister_class", cls.__name__)
+    bpy.utils.user_resource = lambda type, path = "", create = False: os.path.join(os.path.expanduser("~"), ".nw_recording", path)
+    bpy.utils.previews = types.ModuleType("bpy.utils.previews")
+    bpy.utils.previews.new = Previews
+    bpy.utils.previews.remove = lambda collection: None
+
+    bpy.app = types.ModuleType("bpy.app")
+    bpy.app.version = (2, 90, 0)
+    bpy.app.version_string = "2.90.0 (recording stand-in)"
+    bpy.app.background = True
+    bpy.app.binary_path = ""
+    bpy.app.timers = Timers()
+    bpy.app.handlers = types.SimpleNamespace(load_post = [], save_pre = [], render_stats = [], persistent = lambda f: f)
+
+    bpy.path = types.ModuleType("bpy.path")
+    bpy.path.abspath = lambda path, start = None, library = None: path
+    bpy.path.basename = os.path.basename
+    bpy.path.clean_name = lambda name, replace = "_": re.sub(r"[^A-Za-z0-9_]", replace, name)
+
+    bpy.context = types.SimpleNamespace(
+        preferences = types.SimpleNamespace(addons = {}, filepaths = types.SimpleNamespace(texture_directory = "")),
+        window_manager = WindowManager(),
+        space_data = None,
+        scene = None
+    )
+
+    sys.modules["bpy"] = bpy
+    for name in [ "types", "props", "utils", "app", "path" ]:
+        sys.modules["bpy." + name] = getattr(bpy, name)
+    sys.modules["bpy.utils.previews"] = bpy.utils.previews
+    return recorder
+
+def reset():
+    """
+    Drop all data blocks and recorded calls.
+    """
+    data.reset()
+    recorder.reset()